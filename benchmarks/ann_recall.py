@@ -0,0 +1,82 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 14:40
+@Description:  Recall@k and search latency of the memory index kinds, to pick `AnnConfig` per deployment
+
+    python benchmarks/ann_recall.py --sizes 10000 100000 --dim 256 --k 3 --nprobe 8 16 --ef 32 64
+
+Vectors are drawn around random centers so neighbourhoods look more like embeddings than
+uniform noise. Recall is measured against exact `IndexFlatL2` results.
+"""
+import sys
+import time
+import argparse
+import faiss
+import numpy as np
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.db.ann import AnnConfig  # noqa: E402
+
+
+def _dataset(size: int, queries: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.random((max(size // 100, 1), dim), dtype='float32')
+
+    def sample(n):
+        return centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.05, (n, dim)).astype('float32')
+    return sample(size), sample(queries)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def _row(name: str, index: faiss.Index, build: float, queries: np.ndarray, truth: np.ndarray, k: int):
+    start = time.perf_counter()
+    for query in queries:  # one query at a time, as Memory.search issues them
+        index.search(query.reshape(1, -1), k)
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    _, found = index.search(queries, k)
+    print(f'{name:<22} | {build:>8.2f} | {_recall(found, truth):>8.3f} | {latency:>8.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--ef', type=int, nargs='+', default=[32, 64, 128], help='HNSW efSearch values')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[8, 16, 32], help='IVF nprobe values')
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--pq-m', type=int, default=16)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        vectors, queries = _dataset(size, args.queries, args.dim)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+
+        print(f'\n{size:,} vectors, dim={args.dim}, recall@{args.k}')
+        print(f'{"index":<22} | {"build s":>8} | {"recall":>8} | {"ms/query":>8}')
+        for kind, knob, values in (('flat', None, [None]), ('hnsw', 'ef', args.ef),
+                                   ('ivf_flat', 'nprobe', args.nprobe), ('ivf_pq', 'nprobe', args.nprobe)):
+            ann = AnnConfig(hnsw_m=args.hnsw_m, pq_m=args.pq_m)
+            start = time.perf_counter()
+            index = ann.build(kind, vectors)
+            build = time.perf_counter() - start
+            for value in values:
+                if knob == 'ef':
+                    index = AnnConfig(hnsw_ef_search=value).tune(index)
+                elif knob == 'nprobe':
+                    index = AnnConfig(nprobe=value).tune(index)
+                name = kind if knob is None else f'{kind} {knob}={value}'
+                _row(name, index, build, queries, truth, args.k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 18:00
+@Description:  FaissIndex search latency over the real corpus, preloaded id -> text map vs json + pandas per search
+
+    python benchmarks/faiss_lookup.py --corpus data/cz_filtered.json --queries 500
+
+The index holds random vectors under the corpus ids and queries are pre-embedded, so the numbers
+cover the index search plus the id -> text lookup and nothing of the network.
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import faiss
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.db.faisss import FaissIndex  # noqa: E402
+from benchmarks.fakes import HashEmbeddingNode  # noqa: E402
+
+
+def _legacy_lookup(corpus: Path, ids: np.ndarray):
+    """ What `get_origin_by_ids` did before: reload the corpus and filter a DataFrame """
+    with open(str(corpus), 'r') as f:
+        origin = json.load(f)
+    df = pd.DataFrame(origin)
+    origin = df.loc[df['id'].isin(ids[0]), 'text'].tolist()
+    return np.unique(origin, return_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', type=Path, default=Path(__file__).resolve().parent.parent / 'data' / 'cz_filtered.json')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.corpus, 'r', encoding='utf-8') as f:
+        ids = np.array([int(item['id']) for item in json.load(f)], dtype=np.int64)
+    rng = np.random.default_rng(0)
+    index = faiss.IndexIDMap(faiss.IndexFlatL2(args.dim))
+    index.add_with_ids(rng.random((len(ids), args.dim), dtype='float32'), ids)
+    queries = rng.random((args.queries, args.dim), dtype='float32')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        to_file = Path(tmp) / 'corpus.index'
+        faiss.write_index(index, str(to_file))
+        start = time.perf_counter()
+        db = FaissIndex(node=HashEmbeddingNode(dim=args.dim), from_file=args.corpus, to_file=to_file)
+        load = time.perf_counter() - start
+
+    print(f'\n{len(ids)} records, {args.queries} queries, k={args.k}, index + map load {load * 1000:.1f} ms')
+    print(f'{"lookup":<22} | {"ms/search":>9}')
+    for name, lookup in (('json + pandas', lambda found: _legacy_lookup(args.corpus, found)),
+                         ('preloaded map', lambda found: db._unique(np.zeros(args.k), found[0]))):
+        start = time.perf_counter()
+        for query in queries:
+            _, found = db.index.search(query.reshape(1, -1), args.k)
+            lookup(found)
+        print(f'{name:<22} | {(time.perf_counter() - start) / args.queries * 1000:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 12:05
+@Description:  Offline stand-ins shared by the benchmarks
+"""
+import json
+import asyncio
+import hashlib
+import numpy as np
+
+from typing import List
+from puti.llm.nodes import LLMNode
+from puti.llm.cost import CostManager
+
+
+class HashEmbeddingNode(LLMNode):
+    """ Embeds text into a fixed random vector seeded by its hash, no network involved """
+    llm_name: str = 'hash'
+    dim: int = 256
+    latency: float = 0  # seconds per request, stands in for the network round trip
+    embedding_calls: int = 0
+    batch_calls: int = 0
+
+    async def chat(self, msg, *args, **kwargs):
+        raise NotImplementedError
+
+    async def stream_chat(self, message, **kwargs):
+        raise NotImplementedError
+
+    async def embedding(self, text: str, **kwargs) -> List[float]:
+        self.embedding_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+    async def embeddings(self, texts: List[str], **kwargs) -> List[List[float]]:
+        self.batch_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).random(self.dim, dtype='float32').tolist()
+
+    async def get_embedding_dim(self) -> int:
+        return self.dim
+
+    async def parse_chat_result(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class WordCostManager(CostManager):
+    """ Counts tokens as words, tiktoken needs its encodings downloaded """
+
+    @staticmethod
+    def count_gpt_message_tokens(messages, model: str) -> int:
+        return sum(len(str(m.get('content') or '').split()) for m in messages if isinstance(m, dict))
+
+
+class FakeLLMServer:
+    """
+    An OpenAI compatible `/chat/completions` and `/embeddings` endpoint on localhost, answering
+    after `latency` seconds like a remote model would; keeps connections alive as the real api does.
+    Streamed completions send `stream_words` words after that, one every `token_latency` seconds.
+
+        async with FakeLLMServer(latency=0.2) as server:
+            node = OpenAINode(conf=OpenaiConfig(BASE_URL=server.base_url, ...))
+    """
+
+    def __init__(
+            self, latency: float = 0.2, embedding_latency: float = 0.02, dim: int = 64,
+            token_latency: float = 0.01, stream_words: int = 60,
+    ):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.stream_words = stream_words
+        self.embedding_latency = embedding_latency
+        self.dim = dim
+        self.requests = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}/v1'
+
+    async def __aenter__(self) -> 'FakeLLMServer':
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _answer(self, path: str, body: dict) -> dict:
+        self.requests += 1
+        if path.endswith('/embeddings'):
+            await asyncio.sleep(self.embedding_latency)
+            texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+            node = HashEmbeddingNode(dim=self.dim)
+            return {
+                'object': 'list', 'model': body.get('model') or 'fake',
+                'data': [{'object': 'embedding', 'index': i, 'embedding': node._vector(text)} for i, text in enumerate(texts)],
+                'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+            }
+        await asyncio.sleep(self.latency)
+        prompt = str(body['messages'][-1].get('content') or '')
+        content = json.dumps({'FINAL_ANSWER': f'answer to: {prompt[:60]}'})
+        return {
+            'id': f'fake-{self.requests}', 'object': 'chat.completion', 'created': 0, 'model': body.get('model') or 'fake',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+
+    async def _stream(self, body: dict, writer: asyncio.StreamWriter):
+        """ A streamed completion as server-sent events, in chunked transfer encoding to keep the connection """
+        self.requests += 1
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n')
+        await asyncio.sleep(self.latency)
+        for i in range(self.stream_words):
+            # sentences of ten words
+            word = f'{"" if i == 0 else " "}word{i}{"." if i % 10 == 9 else ""}'
+            chunk = {
+                'id': f'fake-{self.requests}', 'object': 'chat.completion.chunk', 'created': 0,
+                'model': body.get('model') or 'fake',
+                'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}],
+            }
+            data = b'data: %s\n\n' % json.dumps(chunk).encode('utf-8')
+            writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            await writer.drain()
+            await asyncio.sleep(self.token_latency)
+        data = b'data: [DONE]\n\n'
+        writer.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(data), data))
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+                path = head[0].split(' ')[1]
+                headers = {k.strip().lower(): v.strip() for k, v in (line.split(':', 1) for line in head[1:] if ':' in line)}
+                raw = await reader.readexactly(int(headers.get('content-length', 0)))
+                body = json.loads(raw or b'{}')
+                if body.get('stream'):
+                    await self._stream(body, writer)
+                    continue
+                data = json.dumps(await self._answer(path, body)).encode('utf-8')
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n' % len(data) + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):  # client gone or server closing
+            pass
+        finally:
+            writer.close()
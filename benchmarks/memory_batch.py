@@ -0,0 +1,56 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 16:20
+@Description:  Import throughput of long-term memory, `add_one` per message vs `add_batch`
+
+    python benchmarks/memory_batch.py --messages 2000 --latency 0.02
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import HashEmbeddingNode  # noqa: E402
+from puti.llm.memory import Memory  # noqa: E402
+from puti.llm.messages import UserMessage  # noqa: E402
+
+
+async def _bench(messages: int, latency: float, fsync: bool):
+    history = [UserMessage(content=f'imported message {i}') for i in range(messages)]
+    for name in ('add_one', 'add_batch'):
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = Memory(
+                llm=HashEmbeddingNode(latency=latency),
+                data_dir=Path(tmp),
+                namespace=name,
+                wal_fsync=fsync,
+                checkpoint_every=10 ** 9,
+            )
+            start = time.perf_counter()
+            if name == 'add_one':
+                for message in history:
+                    await memory.add_one(message)
+            else:
+                await memory.add_batch(history)
+            elapsed = time.perf_counter() - start
+            memory.shard.join()
+            print(f'{name:<10} | {elapsed:>8.2f} s | {messages / elapsed:>10,.0f} msg/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per embedding request')
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+    print(f'{args.messages} messages, {args.latency * 1000:.0f} ms per embedding request')
+    asyncio.run(_bench(args.messages, args.latency, not args.no_fsync))
+
+
+if __name__ == '__main__':
+    main()
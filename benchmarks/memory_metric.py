@@ -0,0 +1,77 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 16:50
+@Description:  L2 on raw embeddings vs cosine on normalized ones for memory search, quality and latency
+
+    python benchmarks/memory_metric.py --size 50000 --dim 256
+
+Embeddings get random norms, as models that do not normalize their output produce. Ground truth
+is the cosine top-k; `agree` is how often the relevance filter (score >= 0.75) keeps exactly the
+results the cosine definition keeps.
+"""
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.db.memory_shard import MemoryShard  # noqa: E402
+
+
+def _dataset(size: int, queries: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(size // 50, 1), dim)).astype('float32')
+
+    def sample(n):
+        directions = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.6, (n, dim)).astype('float32')
+        return directions * rng.uniform(0.5, 2.0, (n, 1)).astype('float32')
+    return sample(size), sample(queries)
+
+
+def _cosine_truth(vectors: np.ndarray, queries: np.ndarray, k: int):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    sims = q @ v.T
+    ids = np.argsort(-sims, axis=1)[:, :k]
+    return ids, np.take_along_axis(sims, ids, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=50_000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--min-score', type=float, default=0.75)
+    args = parser.parse_args()
+
+    vectors, queries = _dataset(args.size, args.queries, args.dim)
+    truth, truth_scores = _cosine_truth(vectors, queries, args.k)
+    print(f'{args.size:,} vectors, dim={args.dim}, recall@{args.k} against cosine')
+    print(f'{"metric":<8} | {"recall":>8} | {"agree":>8} | {"ms/query":>8}')
+    for metric in ('l2', 'cosine'):
+        with tempfile.TemporaryDirectory() as tmp:
+            shard = MemoryShard(tmp, metric=metric, wal_fsync=False, checkpoint_every=10 ** 9)
+            shard.open(args.dim)
+            shard.append(vectors, [str(i) for i in range(args.size)])
+
+            start = time.perf_counter()
+            for query in queries:
+                shard.search(query.reshape(1, -1), args.k)
+            latency = (time.perf_counter() - start) / len(queries) * 1000
+
+            scores, ids, _ = shard.search(queries, args.k)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(ids, truth)])
+            kept = [set(i[s >= args.min_score]) for i, s in zip(ids, scores)]
+            wanted = [set(i[s >= args.min_score]) for i, s in zip(truth, truth_scores)]
+            agree = np.mean([a == b for a, b in zip(kept, wanted)])
+            print(f'{metric:<8} | {recall:>8.3f} | {agree:>8.3f} | {latency:>8.3f}')
+            shard.close()
+
+
+if __name__ == '__main__':
+    main()
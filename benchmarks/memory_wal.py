@@ -0,0 +1,83 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 12:10
+@Description:  Per-add cost of long-term memory, full index rewrite vs write-ahead log
+
+    python benchmarks/memory_wal.py --sizes 1000 10000 100000
+
+`persist` is the durable write alone, `total` also includes the in-memory `index.add`.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import faiss
+import numpy as np
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import HashEmbeddingNode  # noqa: E402
+from puti.db.memory_shard import MemoryShard  # noqa: E402
+
+
+def _preloaded(tmp: Path, size: int, dim: int) -> MemoryShard:
+    memory = MemoryShard(tmp, checkpoint_every=10 ** 9, checkpoint_interval=float('inf'))
+    memory.open(dim)
+    memory.index.add(np.random.default_rng(0).random((size, dim), dtype='float32'))
+    memory.texts.extend(f'User asked: history {i}' for i in range(size))
+    memory.checkpoint(wait=True)
+    return memory
+
+
+def _rewrite(memory: MemoryShard, vector: np.ndarray, text: str):
+    """ The previous write path: whole index and text file rewritten on every add """
+    faiss.write_index(memory.index, str(memory.index_file))
+    with open(memory.text_file, 'w', encoding='utf-8') as f:
+        f.writelines(f'{text}\n' for text in memory.texts)
+
+
+def _wal(memory: MemoryShard, vector: np.ndarray, text: str):
+    memory.wal.append(memory.index.ntotal - 1, vector, text)
+
+
+async def _bench(size: int, dim: int, adds: int):
+    llm = HashEmbeddingNode(dim=dim)
+    row = []
+    for persist in (_rewrite, _wal):
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = _preloaded(Path(tmp), size, dim)
+            persist_time = total_time = 0
+            for i in range(adds):
+                text = f'User asked: new {i}'
+                vector = np.array([await llm.embedding(text=text)], dtype='float32')
+                start = time.perf_counter()
+                memory.index.add(vector)
+                memory.texts.append(text)
+                mid = time.perf_counter()
+                persist(memory, vector, text)
+                end = time.perf_counter()
+                persist_time += end - mid
+                total_time += end - start
+            row += [persist_time / adds * 1000, total_time / adds * 1000]
+    print(f'{size:>9,} | {row[0]:>10.3f} | {row[1]:>10.3f} | {row[2]:>10.3f} | {row[3]:>10.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--adds', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'ms per add, dim={args.dim}')
+    print(f'{"entries":>9} | {"rewrite":>10} | {"":>10} | {"wal":>10} | {"":>10}')
+    print(f'{"":>9} | {"persist":>10} | {"total":>10} | {"persist":>10} | {"total":>10}')
+    for size in args.sizes:
+        asyncio.run(_bench(size, args.dim, args.adds))
+
+
+if __name__ == '__main__':
+    main()
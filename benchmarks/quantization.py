@@ -0,0 +1,82 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 17:40
+@Description:  Memory per vector, recall@k and latency of the memory index codecs, with and without exact re-rank
+
+    python benchmarks/quantization.py --size 100000 --dim 256 --k 3 --rerank 4
+
+Recall is measured against exact `IndexFlatIP` results on normalized vectors, as cosine memories search.
+"""
+import sys
+import time
+import argparse
+import faiss
+import numpy as np
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.db.ann import AnnConfig, bytes_per_vector, exact_scores  # noqa: E402
+
+
+def _dataset(size: int, queries: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.random((max(size // 100, 1), dim), dtype='float32')
+
+    def sample(n):
+        vectors = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.05, (n, dim)).astype('float32')
+        faiss.normalize_L2(vectors)
+        return vectors
+    return sample(size), sample(queries)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def _search(index: faiss.Index, vectors: np.ndarray, queries: np.ndarray, k: int, rerank: int) -> np.ndarray:
+    if not rerank:
+        return index.search(queries, k)[1]
+    _, candidates = index.search(queries, k * rerank)
+    scores = exact_scores(queries, vectors[np.maximum(candidates, 0)], faiss.METRIC_INNER_PRODUCT)
+    scores[candidates < 0] = -np.inf
+    return np.take_along_axis(candidates, np.argsort(-scores, axis=1)[:, :k], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--rerank', type=int, default=4)
+    parser.add_argument('--pq-m', type=int, default=32)
+    args = parser.parse_args()
+
+    vectors, queries = _dataset(args.size, args.queries, args.dim)
+    exact = faiss.IndexFlatIP(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    flat_bytes = bytes_per_vector(exact)
+
+    print(f'\n{args.size:,} vectors, dim={args.dim}, recall@{args.k}, rerank x{args.rerank}')
+    print(f'{"index":<14} | {"B/vector":>8} | {"smaller":>7} | {"recall":>7} | {"reranked":>8} | {"ms/query":>8} | {"reranked":>8}')
+    for kind in ('flat', 'hnsw'):
+        for codec in ('flat', 'fp16', 'int8', 'pq'):
+            index = AnnConfig(codec=codec, pq_m=args.pq_m).build(kind, vectors, faiss.METRIC_INNER_PRODUCT)
+            size = bytes_per_vector(index)
+            row = [f'{kind + "/" + codec:<14}', f'{size:>8.0f}', f'{flat_bytes / size:>6.1f}x']
+            recalls, latencies = [], []
+            for rerank in (0, args.rerank):
+                start = time.perf_counter()
+                for query in queries:  # one query at a time, as Memory.search issues them
+                    _search(index, vectors, query.reshape(1, -1), args.k, rerank)
+                latencies.append((time.perf_counter() - start) / len(queries) * 1000)
+                recalls.append(_recall(_search(index, vectors, queries, args.k, rerank), truth))
+            print(' | '.join(row + [f'{recalls[0]:>7.3f}', f'{recalls[1]:>8.3f}',
+                                    f'{latencies[0]:>8.3f}', f'{latencies[1]:>8.3f}']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 23:00
+@Description:  End-to-end latency of a long generation followed by per-sentence work, with and without a streaming edge
+
+    python benchmarks/streaming_edges.py --words 60 --token-latency 0.02 --latency 0.2
+
+`write` streams a completion from a local fake OpenAI server through the real OpenAINode, `translate`
+sends one request per sentence in order. Over a plain edge translating starts when writing is done;
+over a streaming edge each sentence is translated as soon as it is complete.
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.conf.llm_config import OpenaiConfig  # noqa: E402
+from puti.llm.nodes import OpenAINode  # noqa: E402
+from puti.llm.actions import Action  # noqa: E402
+from puti.llm.graph import Graph, Vertex  # noqa: E402
+from puti.llm.stream import iter_chunks  # noqa: E402
+from benchmarks.fakes import FakeLLMServer, WordCostManager  # noqa: E402
+
+
+class WriteAction(Action):
+    node: OpenAINode
+
+    async def run(self, role, *args, **kwargs):
+        return await self.node.chat([{'role': 'user', 'content': 'write a long thread'}])
+
+    async def stream(self, role, *args, **kwargs):
+        async for chunk in self.node.chat_chunks([{'role': 'user', 'content': 'write a long thread'}]):
+            yield chunk
+
+
+class TranslateAction(Action):
+    consumes_stream = True
+    node: OpenAINode
+
+    async def run(self, role, *args, **kwargs):
+        translated, pending = [], ''
+        async for chunk in iter_chunks(kwargs.get('previous_result')):
+            pending += chunk
+            *sentences, pending = pending.split('.')
+            for sentence in sentences:
+                translated.append(await self.node.chat([{'role': 'user', 'content': f'translate: {sentence}'}]))
+        return str(len(translated))
+
+
+def _graph(server: FakeLLMServer, stream: bool) -> Graph:
+    def node(streamed: bool) -> OpenAINode:
+        conf = OpenaiConfig(API_KEY='fake', BASE_URL=server.base_url, MODEL='gpt-4o-mini', LLM_API_TIMEOUT=30)
+        # set after init, which replaces falsy values with the config file's
+        conf.STREAM = streamed
+        return OpenAINode(conf=conf, cost=WordCostManager())
+
+    graph = Graph()
+    graph.add_vertices(
+        Vertex(id='write', action=WriteAction(name='write', node=node(True))),
+        Vertex(id='translate', action=TranslateAction(name='translate', node=node(False))),
+    )
+    graph.add_edge('write', 'translate', stream=stream)
+    graph.set_start_vertex('write')
+    return graph
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--words', type=int, default=60, help='Words generated, ten per sentence')
+    parser.add_argument('--token-latency', type=float, default=0.02, help='Seconds per streamed word')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds before a completion starts')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    async with FakeLLMServer(latency=args.latency, token_latency=args.token_latency, stream_words=args.words) as server:
+        print(f'\n{args.words} words at {args.token_latency}s, {args.words // 10} sentences, {args.latency}s per request')
+        print(f'{"edge":<10} | {"sentences":>9} | {"seconds":>7}')
+        for stream in (False, True):
+            graph = _graph(server, stream)
+            await graph.run()  # warm up the connections
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                results = await graph.run()
+            seconds = (time.perf_counter() - start) / args.rounds
+            print(f'{"streaming" if stream else "plain":<10} | {results["translate"]:>9} | {seconds:>7.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
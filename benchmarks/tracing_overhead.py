@@ -0,0 +1,58 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 20:30
+@Description:  Cost of the tracing instrumentation per vertex, with tracing off and on
+
+    python benchmarks/tracing_overhead.py --vertices 2000
+
+Each vertex runs a no-op action through `Vertex.run`, so the numbers are the bookkeeping of a
+vertex run plus its span and nothing else; a real vertex waits milliseconds to seconds on an LLM.
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from puti.utils import tracing  # noqa: E402
+from puti.llm.graph import Vertex  # noqa: E402
+from puti.llm.actions import Action  # noqa: E402
+
+
+class NoopAction(Action):
+    async def run(self, role, *args, **kwargs):
+        return self.name
+
+
+async def _run(vertices, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for vertex in vertices:
+            await vertex.run()
+    return (time.perf_counter() - start) / (rounds * len(vertices)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vertices', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    vertices = [Vertex(id=f'v{i}', action=NoopAction(name=f'v{i}')) for i in range(args.vertices)]
+    asyncio.run(_run(vertices, 1))  # warm up
+
+    print(f'\n{args.vertices} vertices x {args.rounds} rounds')
+    print(f'{"tracing":<8} | {"us/vertex":>9} | {"spans":>6}')
+    for enabled in (False, True):
+        tracing.clear()
+        tracing.enable() if enabled else tracing.disable()
+        cost = asyncio.run(_run(vertices, args.rounds))
+        print(f'{"on" if enabled else "off":<8} | {cost:>9.2f} | {len(tracing.spans()):>6}')
+    tracing.disable()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 22:00
+@Description:  Workflow throughput over many inputs, one `Workflow.run` per input vs `Workflow.run_batch`
+
+    python benchmarks/workflow_batch.py --inputs 40 --latency 0.2 --concurrency 1 4 8
+
+A draft -> review workflow whose roles talk to a local fake OpenAI server through the real
+OpenAINode, so request handling, memory writes and graph bookkeeping are all measured and only
+the model is replaced by a fixed latency. The loop rebuilds node, role and graph per input, as
+the bulk jobs did; the batch builds them once.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jinja2 import Template  # noqa: E402
+from puti.conf.llm_config import OpenaiConfig  # noqa: E402
+from puti.llm.nodes import OpenAINode  # noqa: E402
+from puti.llm.roles import Role  # noqa: E402
+from puti.llm.actions import Action  # noqa: E402
+from puti.llm.graph import Graph, Vertex  # noqa: E402
+from puti.llm.workflow import Workflow  # noqa: E402
+from benchmarks.fakes import FakeLLMServer, WordCostManager  # noqa: E402
+
+
+def _workflow(server: FakeLLMServer, data_dir: Path) -> Workflow:
+    conf = OpenaiConfig(
+        API_KEY='fake', BASE_URL=server.base_url, MODEL='gpt-4o-mini', STREAM=False, LLM_API_TIMEOUT=30,
+        EMBEDDING_MODEL='fake', EMBEDDING_DIM=server.dim,
+    )
+    role = Role(name='writer', agent_node=OpenAINode(conf=conf, cost=WordCostManager()))
+    role.rc.memory.data_dir = data_dir
+    graph = Graph()
+    graph.add_vertices(
+        Vertex(id='draft', role=role, action=Action(name='draft', prompt=Template('Draft a tweet about {{ prompt }}'))),
+        Vertex(id='review', role=role, action=Action(name='review', prompt='Review the draft and return the final tweet')),
+    )
+    graph.add_edge('draft', 'review')
+    graph.set_start_vertex('draft')
+    return Workflow(graph=graph)
+
+
+async def _loop(server: FakeLLMServer, data_dir: Path, topics) -> int:
+    done = 0
+    for topic in topics:
+        results = await _workflow(server, data_dir).run(prompt=topic)
+        done += not any(isinstance(result, Exception) for result in results.values())
+    return done
+
+
+async def _batch(server: FakeLLMServer, data_dir: Path, topics, concurrency: int) -> int:
+    return sum([result.ok async for result in _workflow(server, data_dir).run_batch(topics, concurrency=concurrency)])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--inputs', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per chat completion')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    topics = [f'topic {i}' for i in range(args.inputs)]
+    async with FakeLLMServer(latency=args.latency) as server:
+        print(f'\n{args.inputs} inputs, draft -> review, {args.latency}s per completion')
+        print(f'{"runner":<22} | {"ok":>4} | {"seconds":>7} | {"items/min":>9} | {"requests":>8}')
+        runs = [('run per input', lambda d: _loop(server, d, topics))]
+        runs += [(f'run_batch x{n}', lambda d, n=n: _batch(server, d, topics, n)) for n in args.concurrency]
+        for name, run in runs:
+            with tempfile.TemporaryDirectory() as tmp:
+                requests = server.requests
+                start = time.perf_counter()
+                ok = await run(Path(tmp))
+                seconds = time.perf_counter() - start
+            print(f'{name:<22} | {ok:>4} | {seconds:>7.2f} | {ok / seconds * 60:>9.1f} | {server.requests - requests:>8}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
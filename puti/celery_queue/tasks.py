@@ -19,17 +19,19 @@ from puti.llm.roles.agents import CZ
 from puti.llm.roles.x_bot import TwitWhiz
 from puti.db.sqlite_operator import SQLiteOperator
 from puti.db.model.task.bot_task import TweetSchedule
-from puti.llm.actions.x_bot import GenerateTweetAction, PublishTweetAction
-from puti.llm.roles.agents import Ethan
 from puti.llm.workflow import Workflow
-from puti.llm.graph import Graph, Vertex
+from puti.llm.graph.plan import load_plan, WORKFLOW_DIR
 from croniter import croniter
 
 lgr = logger_factory.default
 cz = CZ()
 x_conf = TwitterConfig()
 twit_whiz = TwitWhiz()
-ethan = Ethan()
+# checkpoints of runs whose worker died mid-run are kept this long, in case the broker redelivers the task
+CHECKPOINT_RETENTION = 7 * 24 * 3600
+# a failed tweet run is retried under the same task id, resuming after its last successful vertex
+TWEET_MAX_RETRIES = 2
+TWEET_RETRY_DELAY = 60
 
 
 # @celery_app.task(task_always_eager=True)
@@ -215,7 +217,7 @@ def check_dynamic_schedules():
     return 'ok'
 
 
-@shared_task(bind=True)
+@shared_task(bind=True, max_retries=TWEET_MAX_RETRIES, default_retry_delay=TWEET_RETRY_DELAY)
 def generate_tweet_task(self, topic: str = None):
     """
     Task that uses the test_generate_tweet_graph function to generate and post tweets.
@@ -223,6 +225,7 @@ def generate_tweet_task(self, topic: str = None):
     """
     start_time = datetime.now()
     task_id = self.request.id
+    graph = None
     
     try:
         # Find the schedule associated with this task
@@ -245,20 +248,21 @@ def generate_tweet_task(self, topic: str = None):
         
         lgr.info(f'[Task {task_id}] generate_tweet_task started, topic: {topic}')
         
-        generate_tweet_action = GenerateTweetAction()
-        post_tweet_action = PublishTweetAction()
-
-        # Pass the topic to the action
-        generate_tweet_vertex = Vertex(id='generate_tweet', action=generate_tweet_action, topic=topic)
-        post_tweet_vertex = Vertex(id='post_tweet', action=post_tweet_action, role=ethan)
-
-        graph = Graph()
-        graph.add_vertices(generate_tweet_vertex, post_tweet_vertex)
-        graph.add_edge(generate_tweet_vertex.id, post_tweet_vertex.id)
-        graph.set_start_vertex(generate_tweet_vertex.id)
+        # compiled once per worker, see `puti/conf/workflows/generate_tweet.yaml`; runs are checkpointed
+        # under the task id, so a retry of this task neither regenerates nor re-posts
+        graph = load_plan(WORKFLOW_DIR / 'generate_tweet.yaml').graph()
 
         workflow = Workflow(graph=graph)
-        resp = asyncio.run(workflow.run_until_vertex(post_tweet_vertex.id))
+        if graph.checkpoints.latest(task_id) is not None:
+            lgr.info(f'[Task {task_id}] Resuming from its last checkpoint')
+            resp = asyncio.run(workflow.resume(task_id, topic=topic))
+        else:
+            resp = asyncio.run(workflow.run_until_vertex('post_tweet', run_id=task_id, topic=topic))
+
+        # a failed vertex does not raise out of the run, fail the task so it is retried
+        if not graph.vertices['post_tweet'].is_successful:
+            failed = next((vertex for vertex in graph.vertices.values() if vertex.error is not None), None)
+            raise RuntimeError(f"Vertex '{failed.id}' failed: {failed.error}" if failed else 'Tweet was not posted')
         
         # Task completed successfully
         try:
@@ -269,12 +273,26 @@ def generate_tweet_task(self, topic: str = None):
                 lgr.info(f'[Task {task_id}] Completed schedule {schedule.name} successfully')
         except Exception as e:
             lgr.warning(f'Could not update status for task {task_id}: {str(e)}')
+
+        # a posted run is never resumed, drop its checkpoints and the stale ones of abandoned runs
+        try:
+            graph.checkpoints.delete(task_id)
+            graph.checkpoints.prune(CHECKPOINT_RETENTION)
+        except Exception as e:
+            lgr.warning(f'Could not clean up checkpoints for task {task_id}: {str(e)}')
         
         execution_time = (datetime.now() - start_time).total_seconds()
         lgr.info(f'[Task {task_id}] Completed in {execution_time:.2f} seconds')
         return resp
         
     except Exception as e:
+        if self.request.retries < self.max_retries:
+            lgr.warning(
+                f'[Task {task_id}] Failed, retry {self.request.retries + 1}/{self.max_retries} '
+                f'in {self.default_retry_delay}s resumes from its last checkpoint: {str(e)}'
+            )
+            raise self.retry(exc=e)
+
         # Task failed
         try:
             from puti.db.schedule_manager import ScheduleManager
@@ -288,6 +306,12 @@ def generate_tweet_task(self, topic: str = None):
             lgr.warning(f'Could not update status for task {task_id}: {str(inner_e)}')
             
         lgr.error(f'[Task {task_id}] Failed: {str(e)}. {traceback.format_exc()}')
+        # out of retries, nothing resumes this run any more
+        if graph is not None:
+            try:
+                graph.checkpoints.delete(task_id)
+            except Exception as inner_e:
+                lgr.warning(f'Could not clean up checkpoints for task {task_id}: {str(inner_e)}')
     finally:
         lgr.info(f'[Task {task_id}] Execution finished')
     return 'ok'
@@ -23,6 +23,7 @@ from puti.db.schedule_manager import ScheduleManager
 from puti.scheduler import ensure_worker_running, ensure_beat_running, WorkerDaemon, BeatDaemon
 from puti.llm.roles.agents import Alex, Ethan
 from puti.constant.base import Pathh
+from puti.utils.path import root_dir
 
 # Create a global console instance
 console = Console()
@@ -245,6 +246,82 @@ def reply_to_mentions(days, hours, depth, max):
     asyncio.run(run_reply_to_mentions())
 
 
+@main.group()
+def index():
+    """Vector index of the reply corpus used for context retrieval."""
+    pass
+
+
+@index.command('build')
+@click.option('--from-file', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=lambda: str(root_dir() / 'data' / 'cz_filtered.json'),
+              help='Corpus of {"id", "text"} records, .json or streamed .jsonl.')
+@click.option('--to-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=lambda: str(root_dir() / 'db' / 'cz_filtered.index'), help='Index file to write.')
+@click.option('--batch-size', default=256, help='Records per embedding request and per checkpoint.')
+@click.option('--concurrency', default=4, help='Embedding requests in flight.')
+@click.option('--codec', type=click.Choice(['flat', 'fp16', 'int8', 'pq']), default='flat',
+              help='How the index stores vectors.')
+def build_index(from_file, to_file, batch_size, concurrency, codec):
+    """Embed the corpus into an index file, resuming an interrupted build."""
+    from rich.progress import Progress
+    from puti.db.index_build import CorpusIndexBuilder
+
+    builder = CorpusIndexBuilder(
+        from_file=from_file, to_file=to_file, batch_size=batch_size, concurrency=concurrency, codec=codec
+    )
+    if builder.checkpoint_dir.exists():
+        console.print(f"[yellow]Resuming from checkpoints in {builder.checkpoint_dir}[/yellow]")
+
+    with Progress(console=console) as progress:
+        task = progress.add_task("Embedding corpus", total=None)
+
+        def update(done, total):
+            progress.update(task, completed=done, total=total)
+
+        try:
+            built = asyncio.run(builder.run(progress=update))
+        except Exception as e:
+            console.print(f"[red]✗ Build stopped: {e}. Run the command again to resume.[/red]")
+            raise SystemExit(1)
+    console.print(f"[green]✓ Indexed {built.ntotal} records into {to_file}[/green]")
+
+
+@index.command('refresh')
+@click.option('--from-file', type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              default=lambda: str(root_dir() / 'data' / 'cz_filtered.json'),
+              help='Corpus of {"id", "text"} records, .json or streamed .jsonl.')
+@click.option('--to-file', type=click.Path(dir_okay=False, path_type=Path),
+              default=lambda: str(root_dir() / 'db' / 'cz_filtered.index'), help='Index file to update.')
+@click.option('--batch-size', default=256, help='Records per embedding request and per checkpoint.')
+@click.option('--concurrency', default=4, help='Embedding requests in flight.')
+@click.option('--codec', type=click.Choice(['flat', 'fp16', 'int8', 'pq']), default='flat',
+              help='How the index stores vectors when it has to be built from scratch.')
+def refresh_index(from_file, to_file, batch_size, concurrency, codec):
+    """Embed only the records added or changed since the index was written."""
+    from rich.progress import Progress
+    from puti.db.index_build import CorpusIndexBuilder
+
+    builder = CorpusIndexBuilder(
+        from_file=from_file, to_file=to_file, batch_size=batch_size, concurrency=concurrency, codec=codec
+    )
+    with Progress(console=console) as progress:
+        task = progress.add_task("Embedding changes", total=None)
+
+        def update(done, total):
+            progress.update(task, completed=done, total=total)
+
+        try:
+            refreshed, stats = asyncio.run(builder.refresh(progress=update))
+        except Exception as e:
+            console.print(f"[red]✗ Refresh stopped: {e}. Run the command again to resume.[/red]")
+            raise SystemExit(1)
+    console.print(
+        f"[green]✓ {to_file} holds {refreshed.ntotal} records: {stats.added} added, {stats.updated} updated, "
+        f"{stats.removed} removed, {stats.unchanged} unchanged[/green]"
+    )
+
+
 @main.group()
 @click.pass_context
 def scheduler(ctx):
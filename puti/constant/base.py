@@ -81,10 +81,13 @@ class Pathh(Base):
 
     CONFIG_FILE = (str(Path(config_dir) / '.env'), 'PuTi config file')
 
-    INDEX_FILE = (str(Path(config_dir) / 'index.faiss'), 'PuTi index file')
-    INDEX_TEXT = (str(Path(config_dir) / 'index.txt'), 'PuTi index text file')  # long-term memory retrieval
+    # long-term memory before namespaces, only read to import it into MEMORY_DIR, see `migrate_legacy_store`
+    INDEX_FILE = (str(Path(config_dir) / 'index.faiss'), 'PuTi legacy index file')
+    INDEX_TEXT = (str(Path(config_dir) / 'index.txt'), 'PuTi legacy index text file')
+    MEMORY_DIR = (str(Path(config_dir) / 'memory'), 'PuTi long-term memory dir, one shard per namespace')
 
     SQLITE_FILE = (str(Path(config_dir) / 'puti.sqlite'), 'PuTi sqlite file')
+    GRAPH_DB = (str(Path(config_dir) / 'graph.sqlite'), 'Graph vertex result cache and run checkpoints')
 
     # celery beat - use the same path as the current running process
     BEAT_PID = (str(Path(config_dir) / 'run' / 'beat.pid'), 'celery beat pid file')
@@ -46,6 +46,8 @@ class VertexState(Base):
     RUNNING = ("RUNNING", 'running state')
     SUCCESS = ("SUCCESS", 'success state')
     FAILED = ("FAILED", 'failed state')
+    SKIPPED = ("SKIPPED", 'skipped state, no incoming edge was taken')
+    CANCELLED = ("CANCELLED", 'cancelled state, stopped by a failed sibling or the run deadline')
 
 
 TOKEN_COSTS = {
@@ -0,0 +1,151 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 14:00
+@Description:  Faiss index factory for long-term memory: Flat, HNSW, IVF-Flat and IVF-PQ with size based promotion,
+               optionally storing fp16, int8 or PQ codes instead of float32 vectors
+"""
+import math
+import faiss
+import numpy as np
+
+from typing import Literal, List, Tuple, Optional
+from pydantic import BaseModel, Field
+
+IndexKind = Literal['flat', 'hnsw', 'ivf_flat', 'ivf_pq']
+Codec = Literal['flat', 'fp16', 'int8', 'pq']
+
+_SQ_FACTORY = {'flat': 'Flat', 'fp16': 'SQfp16', 'int8': 'SQ8'}
+
+# order in which a growing shard may move between kinds, never backwards
+_RANK = {'flat': 0, 'hnsw': 1, 'ivf_flat': 2, 'ivf_pq': 3}
+
+
+class AnnConfig(BaseModel):
+    """ Which faiss index a memory shard uses, and when it moves from exact search to an approximate one """
+
+    promotions: List[Tuple[int, IndexKind]] = Field(
+        default_factory=lambda: [(50_000, 'hnsw')],
+        description='(ntotal, kind) steps; a shard is rebuilt as `kind` once it holds at least `ntotal` vectors'
+    )
+    hnsw_m: int = Field(default=32, description='HNSW graph degree')
+    hnsw_ef_construction: int = 40
+    hnsw_ef_search: int = Field(default=64, description='HNSW search breadth, higher is slower with better recall')
+    nlist: Optional[int] = Field(default=None, description='IVF inverted lists, 4 * sqrt(ntotal) when unset')
+    nprobe: int = Field(default=16, description='IVF lists visited per query')
+    pq_m: int = Field(default=16, description='PQ sub-quantizers, lowered to a divisor of the dim if needed')
+    pq_nbits: int = 8
+    codec: Codec = Field(
+        default='flat',
+        description='How promoted indexes store vectors: float32, fp16 (2x smaller), int8 (4x) or PQ codes'
+    )
+    rerank: int = Field(
+        default=4,
+        description='With a lossy codec, candidates re-scored against the exact vectors per wanted result; 0 disables'
+    )
+
+    def target_kind(self, ntotal: int) -> Optional[IndexKind]:
+        """ Kind of the last promotion step `ntotal` reached, None before the first one """
+        kind = None
+        for threshold, step in sorted(self.promotions):
+            if ntotal >= threshold and (kind is None or _RANK[step] > _RANK[kind]):
+                kind = step
+        return kind
+
+    def should_promote(self, index: faiss.Index) -> Optional[IndexKind]:
+        """ The kind `index` should be rebuilt as, None while it is the right one """
+        target = self.target_kind(index.ntotal)
+        if target is None:
+            return None
+        wanted = (_RANK[target], target == 'ivf_pq' or self.codec != 'flat')
+        current = (_RANK[index_kind(index)], index_codec(index) != 'flat')
+        return target if wanted > current else None
+
+    @property
+    def lossy(self) -> bool:
+        return self.codec != 'flat' or any(kind == 'ivf_pq' for _, kind in self.promotions)
+
+    def _nlist(self, ntotal: int) -> int:
+        nlist = self.nlist or int(4 * math.sqrt(ntotal))
+        # k-means wants ~39 training points per centroid
+        return max(1, min(nlist, ntotal // 39))
+
+    def _pq_m(self, dim: int) -> int:
+        return max(m for m in range(1, min(self.pq_m, dim) + 1) if dim % m == 0)
+
+    def factory_string(self, kind: IndexKind, dim: int, ntotal: int) -> str:
+        # fewer bits per code on small shards, each of the 2 ** nbits centroids wants ~39 training points
+        nbits = max(4, min(self.pq_nbits, int(math.log2(max(ntotal // 39, 1)))))
+        pq = f'PQ{self._pq_m(dim)}x{nbits}'
+        if kind == 'ivf_pq' or (kind == 'ivf_flat' and self.codec == 'pq'):
+            return f'IVF{self._nlist(ntotal)},{pq}'
+        if kind == 'ivf_flat':
+            return f'IVF{self._nlist(ntotal)},{_SQ_FACTORY[self.codec]}'
+        if kind == 'hnsw':
+            if self.codec == 'pq':
+                return f'HNSW{self.hnsw_m}_PQ{self._pq_m(dim)}'
+            return f'HNSW{self.hnsw_m},{_SQ_FACTORY[self.codec]}'
+        return pq if self.codec == 'pq' else _SQ_FACTORY[self.codec]
+
+    def tune(self, index: faiss.Index) -> faiss.Index:
+        """ Apply the search time parameters, which faiss does not keep in every index file """
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.hnsw_ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.nprobe
+        return index
+
+    def build(self, kind: IndexKind, vectors: np.ndarray, metric: int = faiss.METRIC_L2) -> faiss.Index:
+        """ A trained index of `kind` holding `vectors` """
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        ntotal, dim = vectors.shape
+        index = faiss.index_factory(dim, self.factory_string(kind, dim, ntotal), metric)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+        if not index.is_trained:
+            index.train(vectors)
+        if isinstance(index, faiss.IndexIVF):
+            # keeps vectors reconstructable by id for later rebuilds
+            index.make_direct_map()
+        index.add(vectors)
+        return self.tune(index)
+
+
+def index_codec(index: faiss.Index) -> Codec:
+    """ How `index` stores its vectors """
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return 'pq'
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return 'fp16' if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'int8'
+    return 'flat'
+
+
+def bytes_per_vector(index: faiss.Index) -> float:
+    """ Serialized size of `index` per stored vector, close to what it takes in RAM """
+    return faiss.serialize_index(index).nbytes / max(index.ntotal, 1)
+
+
+def exact_scores(queries: np.ndarray, vectors: np.ndarray, metric: int) -> np.ndarray:
+    """ Scores of each query against its own candidate rows, `vectors` is (queries, candidates, dim) """
+    if metric == faiss.METRIC_INNER_PRODUCT:
+        return np.einsum('qd,qcd->qc', queries, vectors)
+    return ((vectors - queries[:, None, :]) ** 2).sum(axis=2)
+
+
+def index_kind(index: faiss.Index) -> IndexKind:
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+
+def reconstruct(index: faiss.Index, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """ Stored vectors `start:stop`, approximate for PQ """
+    stop = index.ntotal if stop is None else stop
+    if stop <= start:
+        return np.empty((0, index.d), dtype='float32')
+    return index.reconstruct_n(start, stop - start)
@@ -3,18 +3,21 @@
 @Time:  2025-04-07 17:48
 @Description:  
 """
-from typing import Any, Tuple
+from typing import Any, Tuple, Optional, Dict, List
 
 import faiss
 from faiss import IndexIDMap
 import openai
 import numpy as np
-import json
-import pandas as pd
+import asyncio
 
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
 from puti.llm.nodes import OpenAINode, LLMNode
+from puti.db.ann import Codec, index_codec, bytes_per_vector, exact_scores
+from puti.db.index_build import CorpusIndexBuilder, RefreshStats, iter_corpus
+from puti.db.vector_store import VectorStore
 from puti.utils.path import root_dir
 from puti.conf.llm_config import LLMConfig, OpenaiConfig
 
@@ -27,6 +30,24 @@ class FaissIndex(BaseModel):
     from_file: Path = Field(default=root_dir() / 'data' / 'cz_filtered.json', validate_default=True, description='create db.index from current file if to_file not existed')
     to_file: Path = Field(default=root_dir() / 'db' / 'cz_filtered.index', validate_default=True, description='destination file')
     conf: LLMConfig = Field(default_factory=OpenaiConfig, validate_default=True)
+    codec: Codec = Field(default='flat', description='Store float32, fp16, int8 or PQ codes in the index file')
+    rerank: int = Field(
+        default=4,
+        description='With a lossy codec, candidates re-scored against the exact vectors per wanted result; 0 disables'
+    )
+
+    _vectors: Optional[VectorStore] = PrivateAttr(default=None)
+    _rows: dict = PrivateAttr(default_factory=dict)
+    _texts: Dict[int, str] = PrivateAttr(default_factory=dict)
+
+    @property
+    def vector_file(self) -> Path:
+        """ Exact float32 vectors next to a quantized index, rows in the order of `index.id_map` """
+        return self.to_file.with_suffix('.vectors.npy')
+
+    @property
+    def bytes_per_vector(self) -> float:
+        return bytes_per_vector(self.index)
 
     def get_embeddings(self, texts) -> np.array:
         response = self.node.cli.embeddings.create(
@@ -35,37 +56,92 @@ class FaissIndex(BaseModel):
         )
         return np.array([e.embedding for e in response.data]).astype("float32")
 
-    def get_origin_by_ids(self, ids: np.array):
-        with open(str(self.from_file), 'r') as f:
-            origin = json.load(f)
-        df = pd.DataFrame(origin)
-        origin = df.loc[df['id'].isin(ids[0]), 'text'].tolist()
-        return origin
+    def _load_texts(self, data: Optional[List[Dict]] = None):
+        """ id -> text of the corpus, read once so a search is a pure in-memory lookup """
+        if data is None:
+            data, _ = iter_corpus(self.from_file)
+        self._texts = {int(item['id']): item['text'] for item in data}
+
+    def get_origin_by_ids(self, ids: np.array) -> List[str]:
+        """ Texts of the first query's result ids in rank order, unknown ids (faiss pads with -1) skipped """
+        return [self._texts[i] for i in map(int, ids[0]) if i in self._texts]
+
+    def _unique(self, distance: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ One query's results with repeated texts dropped, keeping the best ranked occurrence """
+        seen, texts, columns = set(), [], []
+        for column, i in enumerate(ids):
+            text = self._texts.get(int(i))
+            if text is None or text in seen:
+                continue
+            seen.add(text)
+            texts.append(text)
+            columns.append(column)
+        return distance[columns], np.array(texts)
+
+    def _search(self, embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._vectors is None or not self.rerank:
+            return self.index.search(embeddings, k)
+        # a quantized index only shortlists, the exact vectors pick the final k
+        _, candidates = self.index.search(embeddings, min(k * self.rerank, self.index.ntotal))
+        valid = candidates >= 0
+        rows = np.array([[self._rows.get(int(i), 0) for i in row] for row in candidates], dtype=np.int64)
+        distance = exact_scores(embeddings, self._vectors.rows(rows), faiss.METRIC_L2)
+        distance[~valid] = np.inf
+        order = np.argsort(distance, axis=1)[:, :k]
+        return np.take_along_axis(distance, order, axis=1), np.take_along_axis(candidates, order, axis=1)
 
     def search(self, query) -> Tuple:
-        embeddings = self.get_embeddings(query)
-        distance, indices = self.index.search(embeddings, self.conf.FAISS_SEARCH_TOP_K)
-        origin = self.get_origin_by_ids(indices)
-        # drop duplicates
-        unique_texts, unique_indices = np.unique(origin, return_index=True)
-        dis_drop_dup = distance[:, unique_indices]
-        return dis_drop_dup, unique_texts
+        return self.search_many([query])[0]
 
-    def model_post_init(self, __context: Any) -> None:
-        if not self.to_file.exists():
-            with open(str(self.from_file), 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    def search_many(self, queries: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """ `search` for several queries with one embedding request and one index search over the query matrix """
+        if not queries:
+            return []
+        embeddings = self.get_embeddings(list(queries))
+        distance, indices = self._search(embeddings, self.conf.FAISS_SEARCH_TOP_K)
+        results = []
+        for query_distance, query_ids in zip(distance, indices):
+            dis_drop_dup, unique_texts = self._unique(query_distance, query_ids)
+            results.append((dis_drop_dup.reshape(1, -1), unique_texts))
+        return results
+
+    def _builder(self, **options) -> CorpusIndexBuilder:
+        return CorpusIndexBuilder(
+            node=self.node, from_file=self.from_file, to_file=self.to_file, codec=self.codec, **options
+        )
 
-            texts = [item['text'] for item in data]
-            ids = [int(item['id']) for item in data]
+    @staticmethod
+    def _run(coro):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # called inside a running loop, e.g. while a role is constructed, so run on a loop of our own
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coro).result()
 
-            vectors = self.get_embeddings(texts)
+    def build(self, **options) -> IndexIDMap:
+        """ Embed the corpus into `to_file` through `CorpusIndexBuilder`, resuming an interrupted build """
+        return self._run(self._builder(**options).run())
 
-            d = vectors.shape[1]
-            index = faiss.IndexIDMap(faiss.IndexFlatL2(d))
-            index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+    def refresh(self, **options) -> RefreshStats:
+        """ Re-embed only the records added or changed in `from_file` since the index was written """
+        self.index, stats = self._run(self._builder(**options).refresh())
+        self._load()
+        return stats
 
-            self.index = index
-            faiss.write_index(index, str(self.to_file))
+    def _load(self):
+        self._load_texts()
+        self._vectors, self._rows = None, {}
+        if index_codec(faiss.downcast_index(self.index.index)) != 'flat' and self.vector_file.exists():
+            vectors = VectorStore.load(self.vector_file, self.index.d)
+            if len(vectors) == self.index.ntotal:
+                self._vectors = vectors
+                self._rows = {int(i): row for row, i in enumerate(faiss.vector_to_array(self.index.id_map))}
+
+    def model_post_init(self, __context: Any) -> None:
+        if not self.to_file.exists():
+            self.index = self.build()
         else:
             self.index = faiss.read_index(str(self.to_file))
+        self._load()
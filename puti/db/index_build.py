@@ -0,0 +1,261 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 18:20
+@Description:  Chunked, resumable and concurrent embedding of a corpus file into a FaissIndex index file,
+               and incremental refresh of that file from a manifest of content hashes
+"""
+import json
+import shutil
+import asyncio
+import hashlib
+import faiss
+import numpy as np
+
+from pathlib import Path
+from typing import Optional, Iterator, Iterable, List, Dict, Tuple, Callable, NamedTuple
+from pydantic import BaseModel, Field, ConfigDict
+from puti.llm.nodes import LLMNode, OpenAINode
+from puti.db.ann import AnnConfig, Codec
+from puti.db.vector_store import VectorStore
+from puti.db.memory_shard import content_hash
+from puti.utils.files import atomic_path
+from puti.logs import logger_factory
+
+lgr = logger_factory.db
+
+Progress = Callable[[int, Optional[int]], None]
+
+
+class RefreshStats(NamedTuple):
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+def iter_corpus(path: Path) -> Tuple[Iterator[Dict], Optional[int]]:
+    """ Records of a corpus file and their count; `.jsonl` is streamed line by line and its count is unknown """
+    path = Path(path)
+    if path.suffix == '.jsonl':
+        def lines():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        return lines(), None
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return iter(data), len(data)
+
+
+def build_id_index(vectors: np.ndarray, ids: np.ndarray, codec: Codec = 'flat') -> faiss.IndexIDMap:
+    """ An L2 `IndexIDMap` over `vectors`, storing them as `codec` """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    n, d = vectors.shape
+    quantized = faiss.index_factory(d, AnnConfig(codec=codec).factory_string('flat', d, n), faiss.METRIC_L2)
+    if not quantized.is_trained:
+        quantized.train(vectors)
+    index = faiss.IndexIDMap(quantized)
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return index
+
+
+class CorpusIndexBuilder(BaseModel):
+    """
+    Embeds `from_file` in batches of `batch_size` records with up to `concurrency` requests in flight.
+
+    Every embedded batch is checkpointed under `checkpoint_dir`, named by a hash of its ids, texts
+    and embedding model, so a failed or interrupted build picks up where it stopped. The index is
+    written to `to_file` atomically once every batch is in, then the checkpoints are removed.
+
+    A manifest of (id, content hash) is kept next to the index so `refresh` only embeds records
+    that are new or changed since and drops deleted ones with `remove_ids`.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    node: LLMNode = Field(default_factory=OpenAINode, validate_default=True)
+    from_file: Path
+    to_file: Path
+    batch_size: int = Field(default=256, description='Records per embedding request and per checkpoint')
+    concurrency: int = Field(default=4, description='Embedding requests in flight')
+    retries: int = Field(default=3, description='Attempts per batch before the build gives up')
+    codec: Codec = 'flat'
+
+    @property
+    def checkpoint_dir(self) -> Path:
+        return self.to_file.with_name(f'{self.to_file.name}.build')
+
+    @property
+    def vector_file(self) -> Path:
+        return self.to_file.with_suffix('.vectors.npy')
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.to_file.with_suffix('.manifest.npz')
+
+    def _batches(self, records: Iterable[Dict]) -> Iterator[List[Dict]]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def load_manifest(self) -> Dict[int, int]:
+        """ id -> content hash of what the index holds, empty without a manifest """
+        if not self.manifest_file.exists():
+            return {}
+        with np.load(self.manifest_file) as manifest:
+            return dict(zip(manifest['ids'].tolist(), manifest['hashes'].tolist()))
+
+    def _write_manifest(self, manifest: Dict[int, int]):
+        with atomic_path(self.manifest_file) as tmp, open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.fromiter(manifest.keys(), dtype=np.int64, count=len(manifest)),
+                hashes=np.fromiter(manifest.values(), dtype=np.uint64, count=len(manifest)),
+            )
+
+    def _write(self, index: faiss.IndexIDMap, vectors: Optional[np.ndarray], manifest: Dict[int, int]):
+        """ Replace the index files, the manifest last so an interrupted write is redone by the next refresh """
+        self.to_file.parent.mkdir(parents=True, exist_ok=True)
+        if vectors is not None:
+            VectorStore.write(self.vector_file, None, vectors)
+        else:
+            self.vector_file.unlink(missing_ok=True)
+        with atomic_path(self.to_file) as tmp:
+            faiss.write_index(index, str(tmp))
+        self._write_manifest(manifest)
+
+    def _checkpoint_file(self, batch: List[Dict]) -> Path:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(getattr(self.node.conf, 'EMBEDDING_MODEL', self.node.llm_name)).encode('utf-8'))
+        for record in batch:
+            digest.update(f"{record['id']}\0{record['text']}\0".encode('utf-8'))
+        return self.checkpoint_dir / f'{digest.hexdigest()}.npz'
+
+    async def _embed(self, batch: List[Dict]) -> Path:
+        checkpoint = self._checkpoint_file(batch)
+        if checkpoint.exists():
+            return checkpoint
+        for attempt in range(self.retries):
+            try:
+                vectors = await self.node.embeddings([record['text'] for record in batch])
+                break
+            except Exception as e:
+                if attempt == self.retries - 1:
+                    raise
+                lgr.warning(f'Embedding {len(batch)} records failed ({e}), retry {attempt + 1} of {self.retries - 1}')
+                await asyncio.sleep(2 ** attempt)
+        with atomic_path(checkpoint) as tmp, open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array([int(record['id']) for record in batch], dtype=np.int64),
+                vectors=np.asarray(vectors, dtype='float32'),
+            )
+        return checkpoint
+
+    async def _embed_all(
+            self, records: Iterable[Dict], total: Optional[int], progress: Optional[Progress]
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """ Ids and vectors of `records` in corpus order, from checkpoints where they exist """
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        checkpoints: Dict[int, Path] = {}
+        queue = enumerate(self._batches(records))  # shared by the workers, each pulls the next batch when it is free
+        done = 0
+
+        async def worker():
+            nonlocal done
+            for position, batch in queue:
+                checkpoints[position] = await self._embed(batch)
+                done += len(batch)
+                if progress is not None:
+                    progress(done, total)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(self.concurrency, 1))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            lgr.error(f'Index build of {self.from_file} stopped at {done} records, run it again to resume')
+            raise
+
+        ids, vectors = [], []
+        for position in sorted(checkpoints):
+            with np.load(checkpoints[position]) as chunk:
+                ids.append(chunk['ids'])
+                vectors.append(chunk['vectors'])
+        if not checkpoints:
+            return np.empty(0, dtype=np.int64), None
+        return np.concatenate(ids), np.concatenate(vectors)
+
+    async def run(self, progress: Optional[Progress] = None) -> faiss.IndexIDMap:
+        """ Embed what is not checkpointed yet, write the index and return it """
+        records, total = iter_corpus(self.from_file)
+        manifest = {}
+
+        def hashed():
+            for record in records:
+                manifest[int(record['id'])] = content_hash(record['text'])
+                yield record
+
+        ids, vectors = await self._embed_all(hashed(), total, progress)
+        if vectors is None:
+            raise ValueError(f'{self.from_file} holds no records to index')
+        index = build_id_index(vectors, ids, self.codec)
+        self._write(index, vectors if self.codec != 'flat' else None, manifest)
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        lgr.info(f'Indexed {index.ntotal} records of {self.from_file} into {self.to_file}')
+        return index
+
+    async def refresh(self, progress: Optional[Progress] = None) -> Tuple[faiss.IndexIDMap, RefreshStats]:
+        """
+        Bring `to_file` in line with the corpus, embedding only new and changed records.
+        Without an index or manifest to start from this is a full `run`.
+        """
+        if not self.to_file.exists() or not self.manifest_file.exists():
+            index = await self.run(progress)
+            return index, RefreshStats(added=index.ntotal)
+
+        previous = self.load_manifest()
+        manifest, delta, updated = {}, [], 0
+        records, _ = iter_corpus(self.from_file)
+        for record in records:
+            record_id, digest = int(record['id']), content_hash(record['text'])
+            manifest[record_id] = digest
+            if previous.get(record_id) != digest:
+                updated += record_id in previous
+                delta.append(record)
+        deleted = previous.keys() - manifest.keys()
+        stats = RefreshStats(
+            added=len(delta) - updated, updated=updated, removed=len(deleted),
+            unchanged=len(manifest) - len(delta),
+        )
+        if not delta and not deleted:
+            return faiss.read_index(str(self.to_file)), stats
+
+        ids, vectors = await self._embed_all(delta, len(delta), progress)
+        index = faiss.read_index(str(self.to_file))
+        # every delta id is removed, not only the changed ones, in case an interrupted refresh already added it
+        stale = np.fromiter([*deleted, *(int(record['id']) for record in delta)], dtype=np.int64)
+        exact = None
+        if self.codec != 'flat' or self.vector_file.exists():
+            kept = ~np.isin(faiss.vector_to_array(index.id_map), stale)
+            exact = VectorStore.load(self.vector_file, index.d)
+            exact = exact.rows(np.flatnonzero(kept)) if len(exact) == len(kept) else None
+        index.remove_ids(faiss.IDSelectorBatch(stale))
+        if vectors is not None:
+            index.add_with_ids(vectors, ids)
+            if exact is not None:
+                exact = np.concatenate([exact, vectors])
+        self._write(index, exact, manifest)
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        lgr.info(
+            f'Refreshed {self.to_file}: {stats.added} added, {stats.updated} updated, '
+            f'{stats.removed} removed, {stats.unchanged} unchanged'
+        )
+        return index, stats
@@ -0,0 +1,601 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 13:10
+@Description:  On-disk shard of long-term vector memory, one per namespace
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import faiss
+import numpy as np
+
+from pathlib import Path
+from typing import Optional, List, Set, Iterable, Union, Dict, Literal
+from puti.db.wal import VectorWAL, WalRecord
+from puti.db.ann import AnnConfig, index_kind, index_codec, reconstruct, bytes_per_vector, exact_scores
+from puti.db.retention import RetentionConfig, cosine_similarity
+from puti.db.text_store import TextStore, TextMeta
+from puti.db.vector_store import VectorStore
+from puti.utils.files import atomic_path, file_lock, load_texts_from_file
+from puti.logs import logger_factory
+
+lgr = logger_factory.db
+
+DEFAULT_NAMESPACE = 'default'
+
+Metric = Literal['l2', 'cosine']
+
+# process-wide shards by directory, shared by every Memory of the namespace
+_shards: Dict[Path, 'MemoryShard'] = {}
+_shard_refs: Dict[Path, int] = {}
+_shards_lock = threading.Lock()
+
+
+def content_hash(text: str) -> int:
+    """ 64-bit digest used to de-duplicate long-term memory texts """
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def namespace_dir(data_dir: Union[str, Path], namespace: str) -> Path:
+    """ Directory of a namespace such as `tenant/role/session`, one sub directory per segment """
+    segments = []
+    for segment in namespace.split('/'):
+        segment = re.sub(r'[^\w.-]', '_', segment.strip())
+        if segment in ('.', '..'):
+            segment = '_'
+        if segment:
+            segments.append(segment)
+    return Path(data_dir).joinpath(*(segments or [DEFAULT_NAMESPACE]))
+
+
+def _inode(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class MemoryShard:
+    """
+    Index, texts, content hashes and write-ahead log of one memory namespace.
+
+    Several processes may share a shard directory. Appends and checkpoints hold an exclusive
+    lock on `.lock` and first catch up with whatever the other writers logged, so vector ids
+    stay consecutive across processes; searches refresh under a shared lock.
+
+    Shards start as an exact flat index and are rebuilt in a background thread as the kinds
+    `ann` promotes them to once they grow; writes keep going to the old index meanwhile.
+
+    A `cosine` shard normalizes vectors once at insert and searches by inner product; an `l2`
+    shard keeps raw vectors. Either way `search` reports cosine-like scores, higher is closer.
+
+    When `ann` may store lossy codes (fp16, int8, PQ) the exact vectors are kept in a
+    memory-mapped `VectorStore` beside the index, to re-rank candidates and to rebuild from.
+
+    `retention` hides expired and over-capacity entries from search and removes them with a
+    compaction, which renumbers vector ids and bumps the checkpoint generation so the other
+    writers reload.
+    """
+
+    def __init__(
+            self,
+            directory: Union[str, Path],
+            namespace: str = DEFAULT_NAMESPACE,
+            checkpoint_every: int = 1000,
+            checkpoint_interval: float = 300,
+            wal_fsync: bool = True,
+            ann: Optional[AnnConfig] = None,
+            retention: Optional[RetentionConfig] = None,
+            metric: Metric = 'cosine',
+    ):
+        self.directory = Path(directory)
+        self.namespace = namespace
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.ann = ann or AnnConfig()
+        self.retention = retention or RetentionConfig()
+        self.metric = metric
+        self.index: Optional[faiss.Index] = None
+        self.texts = TextStore(self.text_file)
+        self.vectors: Optional[VectorStore] = None
+        self.wal = VectorWAL(self.wal_file, fsync=wal_fsync)
+        self._hashes: Set[int] = set()
+        self._mutex = threading.RLock()
+        self._pending = 0
+        self._last_checkpoint = 0.0
+        self._checkpoint_inode = None
+        self._generation = 0
+        self._checkpoint_thread: Optional[threading.Thread] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+    @property
+    def index_file(self) -> Path:
+        return self.directory / 'index.faiss'
+
+    @property
+    def text_file(self) -> Path:
+        return self.directory / 'index.texts'
+
+    @property
+    def wal_file(self) -> Path:
+        return self.directory / 'index.wal'
+
+    @property
+    def hash_file(self) -> Path:
+        return self.directory / 'index.hashes'
+
+    @property
+    def vector_file(self) -> Path:
+        return self.directory / 'index.vectors.npy'
+
+    @property
+    def lock_file(self) -> Path:
+        return self.directory / '.lock'
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def exists(self) -> bool:
+        return self.index_file.exists() or self.wal_file.exists()
+
+    def open(self, dim: Optional[int] = None) -> bool:
+        """
+        Load the shard from disk. When there is nothing on disk an empty shard of `dim` is created,
+        or False is returned if no `dim` is given.
+        """
+        with self._mutex, file_lock(self.lock_file):
+            if self.index is not None:
+                return True
+            records = self.wal.replay()
+            if self.index_file.exists():
+                self.index = self._adopt(faiss.read_index(str(self.index_file)))
+                self.texts = TextStore.load(self.text_file)
+            elif records:
+                self.index = self._new_index(records[0].vector.shape[0])
+            elif dim is not None:
+                self.index = self._new_index(dim)
+                faiss.write_index(self.index, str(self.index_file))
+                TextStore.write(self.text_file, None, [])
+            else:
+                return False
+            self._load_vectors()
+            self._load_hashes()
+            self._recover(records)
+            self._pending = len(records)
+            self._last_checkpoint = time.monotonic()
+            return True
+
+    @property
+    def faiss_metric(self) -> int:
+        return faiss.METRIC_INNER_PRODUCT if self.metric == 'cosine' else faiss.METRIC_L2
+
+    def _new_index(self, dim: int) -> faiss.Index:
+        return faiss.IndexFlatIP(dim) if self.metric == 'cosine' else faiss.IndexFlatL2(dim)
+
+    def _adopt(self, index: faiss.Index) -> faiss.Index:
+        """ Tune a loaded index; its stored metric wins over the configured one """
+        metric = 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+        if metric != self.metric:
+            lgr.warning(f'Memory namespace `{self.namespace}` was built with {metric}, keeping it over {self.metric}')
+            self.metric = metric
+        return self.ann.tune(index)
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """ Contiguous float32 copy, L2-normalized in place for cosine shards """
+        vectors = np.array(vectors, dtype='float32', order='C', copy=True)
+        if self.metric == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _load_vectors(self):
+        """ Exact vectors when the index may hold lossy codes, backfilled from the index if missing """
+        if not self.ann.lossy:
+            self.vectors = None
+            return
+        self.vectors = VectorStore.load(self.vector_file, self.index.d)
+        if len(self.vectors) > self.ntotal:
+            self.vectors.truncate(self.ntotal)
+        elif len(self.vectors) < self.ntotal:
+            if index_codec(self.index) != 'flat':
+                lgr.warning(f'Memory namespace `{self.namespace}` lacks exact vectors, re-ranking with decoded ones')
+            self.vectors.append(reconstruct(self.index, len(self.vectors)))
+
+    def _exact(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        return self.vectors.range(start, stop) if self.vectors is not None else reconstruct(self.index, start, stop)
+
+    def _read_checkpoint(self):
+        """ (count, generation) of the checkpoint on disk, count is None without one """
+        if not self.hash_file.exists():
+            return None, 0
+        with np.load(self.hash_file) as saved:
+            return int(saved['count']), int(saved['generation']) if 'generation' in saved else 0
+
+    def _load_hashes(self):
+        """ Load the hash set saved with the checkpoint, rebuilding it when it does not match the texts """
+        self._checkpoint_inode = _inode(self.hash_file)
+        count, self._generation = self._read_checkpoint()
+        if count == len(self.texts):
+            with np.load(self.hash_file) as saved:
+                self._hashes = set(saved['hashes'].tolist())
+                return
+        self._hashes = {content_hash(text) for text in self.texts}
+
+    def _recover(self, records: List[WalRecord]) -> bool:
+        """
+        Re-apply WAL records the index does not cover yet; index and texts are checked separately.
+        False when a record is ahead of the index, meaning a checkpoint we never loaded dropped its predecessors.
+        """
+        for record in records:
+            if record.seq > self.index.ntotal:
+                return False
+            if record.seq == self.index.ntotal:
+                self.index.add(record.vector.reshape(1, -1))
+            if self.vectors is not None and record.seq == len(self.vectors):
+                self.vectors.append(record.vector)
+            if record.seq == len(self.texts):
+                self.texts.append(record.text, record.meta)
+                self._hashes.add(content_hash(record.text))
+        if records:
+            lgr.debug(f'Applied {len(records)} memory records from {self.wal_file}')
+        return True
+
+    def _reload(self):
+        self.index, self.texts = None, TextStore(self.text_file)
+        self._hashes = set()
+        records = self.wal.replay()
+        self.index = self._adopt(faiss.read_index(str(self.index_file)))
+        self.texts = TextStore.load(self.text_file)
+        self._load_vectors()
+        self._load_hashes()
+        self._recover(records)
+
+    def _catch_up(self):
+        """ Apply what other writers persisted since we last looked, caller holds the file lock """
+        if _inode(self.hash_file) != self._checkpoint_inode:
+            count, generation = self._read_checkpoint()
+            self._checkpoint_inode = _inode(self.hash_file)
+            if count is not None and (count > self.ntotal or generation != self._generation):
+                lgr.info(f'Reloading memory namespace `{self.namespace}` checkpointed by another writer')
+                self._reload()
+                return
+        if not self._recover(self.wal.read_new()):
+            self._reload()
+
+    def refresh(self):
+        """ Pick up records appended by other processes before reading """
+        with self._mutex, file_lock(self.lock_file, shared=True):
+            self._catch_up()
+
+    def contains(self, text: str) -> bool:
+        """ Whether `text` is already stored, O(1) through the content-hash set """
+        return content_hash(text) in self._hashes
+
+    def claim(self, text: str) -> bool:
+        """ Reserve `text` before its embedding is awaited so concurrent adds of the same text are skipped """
+        digest = content_hash(text)
+        with self._mutex:
+            if digest in self._hashes:
+                return False
+            self._hashes.add(digest)
+            return True
+
+    def release(self, text: str):
+        self._hashes.discard(content_hash(text))
+
+    def append(
+            self,
+            vectors: np.ndarray,
+            texts: Iterable[str],
+            metas: Optional[Iterable[Optional[TextMeta]]] = None
+    ) -> int:
+        """ Durably append claimed texts and their vectors, returns how many were new across all writers """
+        texts = list(texts)
+        metas = list(metas) if metas is not None else [None] * len(texts)
+        vectors = self._prepare(vectors)
+        with self._mutex, file_lock(self.lock_file):
+            before = self.ntotal
+            self._catch_up()
+            foreign = {content_hash(text) for text in self.texts[before:]}
+            keep = [i for i, text in enumerate(texts) if content_hash(text) not in foreign]
+            if keep and self.retention.dedup_threshold is not None:
+                keep = [i for i, dup in zip(keep, self._near_duplicates(vectors[keep])) if not dup]
+            if keep:
+                vectors = np.ascontiguousarray(vectors[keep])
+                texts = [texts[i] for i in keep]
+                metas = [metas[i] for i in keep]
+                self.wal.append_many(self.ntotal, vectors, texts, metas)
+                self.index.add(vectors)
+                if self.vectors is not None:
+                    self.vectors.append(vectors)
+                self.texts.extend(texts, metas)
+                self._hashes.update(content_hash(text) for text in texts)
+            self._pending += len(keep)
+        self._maybe_promote()
+        if (self._pending >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint()
+        return len(keep)
+
+    def _near_duplicates(self, vectors: np.ndarray) -> np.ndarray:
+        """ Which vectors collapse into a visible stored entry under `retention.dedup_threshold` """
+        duplicates = np.zeros(len(vectors), dtype=bool)
+        if not self.ntotal:
+            return duplicates
+        _, ids = self.index.search(vectors, 1)
+        ids = ids[:, 0]
+        found = (ids >= 0) & self._visible(ids)
+        if found.any():
+            nearest = self.vectors.rows(ids[found]) if self.vectors is not None else \
+                np.stack([self.index.reconstruct(int(i)) for i in ids[found]])
+            duplicates[found] = cosine_similarity(vectors[found], nearest) >= self.retention.dedup_threshold
+        return duplicates
+
+    def _visible(self, ids: np.ndarray) -> np.ndarray:
+        """ Mask of `ids` retention does not hide yet """
+        visible = np.ones(len(ids), dtype=bool)
+        if self.retention.max_entries is not None:
+            visible &= ids >= self.ntotal - self.retention.max_entries
+        if self.retention.ttl is not None:
+            stamps = self.texts.timestamps(np.clip(ids, 0, None))
+            visible &= (stamps == 0) | (stamps >= time.time() - self.retention.ttl)
+        return visible
+
+    def compact(self) -> int:
+        """
+        Physically remove what retention hides and persist the result right away.
+        Returns how many entries were removed.
+        """
+        with self._mutex, file_lock(self.lock_file):
+            self._catch_up()
+            keep = self.retention.keep_mask(self.texts.timestamps(), time.time())
+            removed = int((~keep).sum())
+            if not removed:
+                return 0
+            kept_ids = np.flatnonzero(keep)
+            kind = index_kind(self.index)
+            if kind == 'flat':  # shifts the following ids down, like the texts below
+                self.index.remove_ids(faiss.IDSelectorBatch(np.flatnonzero(~keep).astype('int64')))
+            else:  # HNSW cannot remove and IVF keeps sparse ids, rebuild from what stays
+                self.index = self.ann.build(kind, self._exact()[kept_ids], self.index.metric_type)
+            if self.vectors is not None:
+                VectorStore.write(self.vector_file, None, self.vectors.rows(kept_ids))
+                self.vectors = VectorStore.load(self.vector_file, self.index.d)
+            TextStore.write(self.text_file, None, self.texts.select(kept_ids))
+            self.texts = TextStore.load(self.text_file)
+            self._hashes = {content_hash(text) for text in self.texts}
+            self._generation += 1
+            hash_bytes = io.BytesIO()
+            hashes = np.fromiter(self._hashes, dtype=np.uint64, count=len(self._hashes))
+            np.savez(hash_bytes, hashes=hashes, count=self.ntotal, generation=self._generation)
+            with atomic_path(self.hash_file) as tmp:
+                tmp.write_bytes(hash_bytes.getvalue())
+            with atomic_path(self.index_file) as tmp:
+                faiss.write_index(self.index, str(tmp))
+            self._checkpoint_inode = _inode(self.hash_file)
+            self.wal.clear()
+            self._pending = 0
+            self._last_checkpoint = time.monotonic()
+        lgr.info(f'Compacted memory namespace `{self.namespace}`: removed {removed}, kept {len(kept_ids)}')
+        return removed
+
+    def _maybe_promote(self):
+        kind = self.ann.should_promote(self.index)
+        running = self._rebuild_thread
+        if kind is None or (running is not None and running.is_alive()):
+            return
+        self._rebuild_thread = threading.Thread(target=self._rebuild, args=(kind,), daemon=True)
+        self._rebuild_thread.start()
+
+    def _rebuild(self, kind: str):
+        """ Train and fill a `kind` index from a copy of the vectors, then swap it in with what was added meanwhile """
+        try:
+            with self._mutex:
+                source, generation = self.index, self._generation
+                vectors = self._exact()
+            start = time.perf_counter()
+            rebuilt = self.ann.build(kind, vectors, source.metric_type)
+            with self._mutex:
+                # replaced by another writer's checkpoint, or compacted (flat compaction removes ids
+                # in place) meanwhile, the rebuilt ids no longer match, the next append retries
+                if self.index is not source or self._generation != generation:
+                    return
+                rebuilt.add(self._exact(rebuilt.ntotal))
+                self.index = rebuilt
+            lgr.info(
+                f'Memory namespace `{self.namespace}` promoted from {index_kind(source)} to {kind} '
+                f'({index_codec(rebuilt)}, {bytes_per_vector(rebuilt):.0f} bytes per vector) '
+                f'at {rebuilt.ntotal} vectors in {time.perf_counter() - start:.2f}s'
+            )
+            self.checkpoint()
+        except Exception as e:
+            lgr.error(f'Rebuilding memory namespace `{self.namespace}` as {kind} failed, keeping the current index: {e}')
+
+    def checkpoint(self, wait: bool = False):
+        """
+        Persist the index and texts in a background thread, then drop the covered WAL records.
+        Adds keep going to the live index and WAL meanwhile.
+        """
+        if self.index is None:
+            return
+        running = self._checkpoint_thread
+        if running is None or not running.is_alive():
+            with self._mutex:
+                snapshot = faiss.clone_index(self.index)
+                texts = self.texts.snapshot(snapshot.ntotal)
+                vectors = self.vectors.snapshot(snapshot.ntotal) if self.vectors is not None else None
+                hashes = np.fromiter(self._hashes, dtype=np.uint64, count=len(self._hashes))
+                self._pending = 0
+                self._last_checkpoint = time.monotonic()
+            running = threading.Thread(
+                target=self._write_checkpoint, args=(snapshot, texts, vectors, hashes), daemon=True
+            )
+            self._checkpoint_thread = running
+            running.start()
+        if wait:
+            running.join()
+
+    def _write_checkpoint(self, snapshot: faiss.Index, texts, vectors, hashes: np.ndarray):
+        try:
+            # serialize outside the lock so writers are only held up by the file I/O
+            index_bytes = faiss.serialize_index(snapshot)
+            if self.retention.enabled:
+                with self._mutex:
+                    removable = int((~self.retention.keep_mask(self.texts.timestamps(), time.time())).sum())
+                if self.retention.should_compact(removable, snapshot.ntotal):
+                    self.compact()
+                    return
+            hash_bytes = io.BytesIO()
+            np.savez(hash_bytes, hashes=hashes, count=snapshot.ntotal, generation=self._generation)
+            store, vector_store = self.texts, self.vectors
+            with file_lock(self.lock_file):
+                count, generation = self._read_checkpoint()
+                if count is not None and generation == self._generation and count >= snapshot.ntotal:
+                    return  # another writer already persisted at least as much
+                TextStore.write(self.text_file, *texts)
+                if vectors is not None:
+                    VectorStore.write(self.vector_file, *vectors)
+                with atomic_path(self.hash_file) as tmp:
+                    tmp.write_bytes(hash_bytes.getvalue())
+                with atomic_path(self.index_file) as tmp:
+                    tmp.write_bytes(index_bytes.tobytes())
+                self._checkpoint_inode = _inode(self.hash_file)
+                self.wal.compact(keep_from_seq=snapshot.ntotal)
+            with self._mutex:
+                if self.texts is store:
+                    store.rebase(snapshot.ntotal)
+                if vector_store is not None and self.vectors is vector_store:
+                    vector_store.rebase(snapshot.ntotal)
+        except Exception as e:
+            lgr.error(f'Memory checkpoint failed, records stay in {self.wal_file}: {e}')
+
+    def join(self):
+        """ Wait for a running index rebuild and checkpoint """
+        if self._rebuild_thread is not None:
+            self._rebuild_thread.join()
+        if self._checkpoint_thread is not None:
+            self._checkpoint_thread.join()
+
+    def search(self, vectors: np.ndarray, k: int):
+        """
+        (scores, ids, texts) of the `k` nearest entries per query, ids hidden by retention come back
+        as -1 with a None text. Texts are looked up under the lock, since a concurrent `compact()`
+        renumbers ids. Scores are cosine similarities for cosine shards and `1 - d / 2` for l2 shards,
+        which is the cosine similarity too when the stored vectors happen to be normalized.
+        """
+        queries = self._prepare(vectors)
+        with self._mutex:
+            fetch = min(k if not self.retention.enabled else 2 * k, self.index.ntotal)
+            if self.vectors is not None and self.ann.rerank and index_codec(self.index) != 'flat':
+                scores, ids = self._rerank(queries, fetch)
+            else:
+                scores, ids = self.index.search(queries, k=fetch)
+            if self.retention.enabled:
+                ids[~self._visible(ids.reshape(-1)).reshape(ids.shape)] = -1
+            texts = [[self.texts[i] if i >= 0 else None for i in row] for row in ids.tolist()]
+        if self.metric == 'l2':
+            scores = 1 - scores / 2
+        return scores, ids, texts
+
+    def _rerank(self, queries: np.ndarray, k: int):
+        """ Search `rerank` times more candidates in the compressed index, then order them by exact score """
+        _, candidates = self.index.search(queries, k=min(k * self.ann.rerank, self.index.ntotal))
+        valid = candidates >= 0
+        scores = exact_scores(queries, self.vectors.rows(np.where(valid, candidates, 0)), self.index.metric_type)
+        ascending = self.index.metric_type != faiss.METRIC_INNER_PRODUCT
+        scores[~valid] = np.inf if ascending else -np.inf
+        order = np.argsort(scores if ascending else -scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+    def close(self):
+        """ Finish background work and free the index, the shard can be opened again """
+        self.join()
+        with self._mutex:
+            self.index = None
+            self.texts = TextStore(self.text_file)
+            self.vectors = None
+            self._hashes = set()
+            self.wal.close()
+
+    def clear(self):
+        """ Drop the shard from memory and disk """
+        self.join()
+        with self._mutex, file_lock(self.lock_file):
+            self.index = None
+            self.texts = TextStore(self.text_file)
+            self.vectors = None
+            self._hashes.clear()
+            self._pending = 0
+            self.wal.clear()
+            for path in (self.index_file, self.text_file, self.vector_file, self.hash_file):
+                path.unlink(missing_ok=True)
+            self._checkpoint_inode = None
+
+
+def acquire_shard(directory: Union[str, Path], namespace: str = DEFAULT_NAMESPACE, **options) -> MemoryShard:
+    """
+    The process-wide shard of `directory`, created unloaded on first use; pair with `release_shard`.
+    `options` only apply to the instance that creates it.
+    """
+    directory = Path(directory).resolve()
+    with _shards_lock:
+        shard = _shards.get(directory)
+        if shard is None:
+            shard = _shards[directory] = MemoryShard(directory, namespace=namespace, **options)
+        _shard_refs[directory] = _shard_refs.get(directory, 0) + 1
+        return shard
+
+
+def release_shard(shard: MemoryShard):
+    """ Drop one reference, the last one lets pending work finish and frees the index """
+    with _shards_lock:
+        refs = _shard_refs.get(shard.directory, 0) - 1
+        if refs > 0:
+            _shard_refs[shard.directory] = refs
+            return
+        _shard_refs.pop(shard.directory, None)
+        if _shards.get(shard.directory) is shard:
+            del _shards[shard.directory]
+    shard.close()
+
+
+def migrate_legacy_store(shard: MemoryShard, index_file: Union[str, Path], text_file: Union[str, Path]) -> int:
+    """
+    Import the single flat index and line-per-text file long-term memory lived in before namespaces
+    into `shard`, returns how many texts were new. The legacy files are renamed with a `.migrated`
+    suffix once imported, so this runs once; texts the shard already holds are skipped. A store whose
+    vector and text counts differ cannot be paired up and is left in place, with an error logged.
+    """
+    index_file, text_file = Path(index_file), Path(text_file)
+    if not index_file.exists():
+        return 0
+    legacy = faiss.read_index(str(index_file))
+    texts = load_texts_from_file(text_file)
+    if len(texts) != legacy.ntotal:
+        # e.g. texts holding line breaks were split over several lines by the legacy store
+        lgr.error(
+            f'Legacy memory {index_file} has {legacy.ntotal} vectors but {len(texts)} texts in {text_file}, '
+            f'not imported'
+        )
+        return 0
+    count = legacy.ntotal
+    shard.open(legacy.d)
+    if shard.index.d != legacy.d:
+        lgr.warning(f'Legacy memory of dim {legacy.d} not imported into a shard of dim {shard.index.d}')
+        return 0
+    keep = [i for i in range(count) if shard.claim(texts[i])]
+    added = 0
+    if keep:
+        vectors = legacy.reconstruct_n(0, count)[keep]
+        added = shard.append(vectors, [texts[i] for i in keep])
+    shard.checkpoint(wait=True)
+    for path in (index_file, text_file):
+        try:
+            path.rename(path.with_name(path.name + '.migrated'))
+        except FileNotFoundError:  # another process migrated it meanwhile
+            pass
+    lgr.info(f'Imported {added} legacy long-term memories into namespace {shard.namespace}')
+    return added
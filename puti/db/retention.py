@@ -0,0 +1,49 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 15:40
+@Description:  Retention policy of a long-term memory namespace: capacity, age and near-duplicate collapse
+"""
+import numpy as np
+
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class RetentionConfig(BaseModel):
+    """
+    Entries past `max_entries` (oldest first) or older than `ttl` are hidden from search right
+    away and physically removed by the next compaction.
+    """
+
+    max_entries: Optional[int] = Field(default=None, description='Keep at most this many newest entries')
+    ttl: Optional[float] = Field(default=None, description='Drop entries older than this many seconds')
+    dedup_threshold: Optional[float] = Field(
+        default=None,
+        description='Skip inserts whose cosine similarity to their nearest stored entry is at least this, e.g. 0.97'
+    )
+    compact_ratio: float = Field(
+        default=0.1,
+        description='Compact at checkpoint time once this fraction of the entries is removable'
+    )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries is not None or self.ttl is not None
+
+    def keep_mask(self, timestamps: np.ndarray, now: float) -> np.ndarray:
+        """ Entries to keep, by vector id; a zero timestamp (unknown) never expires """
+        keep = np.ones(len(timestamps), dtype=bool)
+        if self.ttl is not None:
+            keep &= (timestamps == 0) | (timestamps >= now - self.ttl)
+        if self.max_entries is not None and len(timestamps) > self.max_entries:
+            keep[:len(timestamps) - self.max_entries] = False
+        return keep
+
+    def should_compact(self, removable: int, ntotal: int) -> bool:
+        return removable > 0 and removable >= self.compact_ratio * ntotal
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """ Row-wise cosine similarity of two equally shaped matrices """
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.einsum('ij,ij->i', a, b) / np.maximum(norms, 1e-12)
@@ -0,0 +1,190 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 15:00
+@Description:  Columnar, memory-mapped store of memory texts and their metadata keyed by vector id
+"""
+import mmap
+import struct
+import numpy as np
+
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union, Iterable, Tuple
+from puti.utils.files import atomic_path
+
+# magic, count, then the byte length of the text, role and message id blobs
+_HEADER = struct.Struct('<8sQQQQ')
+_MAGIC = b'PUTITXT1'
+_STR_COLUMNS = ('text', 'role', 'msg_id')
+
+
+class TextMeta(NamedTuple):
+    role: str = ''
+    timestamp: float = 0.0
+    msg_id: str = ''
+
+
+class _Segment:
+    """
+    Read-only view of a store file:
+    header | text, role, msg_id offsets (count + 1 uint64 each) | timestamps (count float64) | the three blobs
+    """
+
+    def __init__(self, path: Path, limit: Optional[int] = None):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, *blob_sizes = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a memory text store')
+        self.stored = count
+        self.count = count if limit is None else min(limit, count)
+        position = _HEADER.size
+        self.offsets = {}
+        for column in _STR_COLUMNS:
+            self.offsets[column] = np.frombuffer(self._mm, dtype='<u8', count=count + 1, offset=position)
+            position += (count + 1) * 8
+        self.timestamps = np.frombuffer(self._mm, dtype='<f8', count=count, offset=position)
+        position += count * 8
+        self.blob_start = {}
+        for column, size in zip(_STR_COLUMNS, blob_sizes):
+            self.blob_start[column] = position
+            position += size
+
+    def limited(self, limit: int) -> '_Segment':
+        return _Segment(self.path, limit) if limit != self.count else self
+
+    def string(self, column: str, i: int) -> str:
+        offsets, start = self.offsets[column], self.blob_start[column]
+        return self._mm[start + int(offsets[i]): start + int(offsets[i + 1])].decode('utf-8')
+
+    def blob(self, column: str, stop: int) -> memoryview:
+        start = self.blob_start[column]
+        return memoryview(self._mm)[start: start + int(self.offsets[column][stop])]
+
+    def meta(self, i: int) -> TextMeta:
+        return TextMeta(self.string('role', i), float(self.timestamps[i]), self.string('msg_id', i))
+
+
+class TextStore:
+    """
+    Texts of a memory shard indexed by vector id, with optional role, timestamp and message id.
+
+    The checkpoint is one file of offset arrays plus UTF-8 blobs which is memory-mapped, so a
+    lookup decodes only the requested text and nothing is loaded up front. Texts appended since
+    the checkpoint are kept in a small in-memory tail until the next checkpoint absorbs them.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._base: Optional[_Segment] = None
+        self._tail: List[Tuple[str, TextMeta]] = []
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'TextStore':
+        store = cls(path)
+        if store.path.exists():
+            store._base = _Segment(store.path)
+        return store
+
+    @property
+    def base_count(self) -> int:
+        return self._base.count if self._base is not None else 0
+
+    def __len__(self) -> int:
+        return self.base_count + len(self._tail)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i < self.base_count:
+            return self._base.string('text', i)
+        return self._tail[i - self.base_count][0]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def meta(self, i: int) -> TextMeta:
+        if i < self.base_count:
+            return self._base.meta(i)
+        return self._tail[i - self.base_count][1]
+
+    def timestamps(self, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Timestamps of `ids`, or of every entry, without decoding any text """
+        base = self._base.timestamps[:self.base_count] if self._base is not None else np.empty(0, dtype='<f8')
+        tail = np.fromiter((meta.timestamp for _, meta in self._tail), dtype='<f8', count=len(self._tail))
+        if ids is None:
+            return np.concatenate([base, tail])
+        ids = np.asarray(ids, dtype=np.int64)
+        in_base = ids < self.base_count
+        found = np.empty(len(ids), dtype='<f8')
+        found[in_base] = base[ids[in_base]]
+        found[~in_base] = tail[ids[~in_base] - self.base_count]
+        return found
+
+    def append(self, text: str, meta: Optional[TextMeta] = None):
+        self._tail.append((text, meta or TextMeta()))
+
+    def extend(self, texts: Iterable[str], metas: Optional[Iterable[Optional[TextMeta]]] = None):
+        texts = list(texts)
+        metas = list(metas) if metas is not None else [None] * len(texts)
+        self._tail.extend((text, meta or TextMeta()) for text, meta in zip(texts, metas))
+
+    def snapshot(self, count: int) -> Tuple[Optional[_Segment], List[Tuple[str, TextMeta]]]:
+        """ The first `count` entries in a form `write` can persist from another thread """
+        count = min(count, len(self))
+        if count <= self.base_count:
+            return (self._base.limited(count) if self._base is not None else None), []
+        return self._base, self._tail[:count - self.base_count]
+
+    @staticmethod
+    def write(path: Union[str, Path], base: Optional[_Segment], tail: List[Tuple[str, TextMeta]]):
+        """ Atomically write `base` followed by `tail`, copying the base blobs without decoding them """
+        base_count = base.count if base is not None else 0
+        count = base_count + len(tail)
+        columns = {
+            'text': [text.encode('utf-8') for text, _ in tail],
+            'role': [meta.role.encode('utf-8') for _, meta in tail],
+            'msg_id': [meta.msg_id.encode('utf-8') for _, meta in tail],
+        }
+        offsets, blob_sizes = {}, []
+        for column in _STR_COLUMNS:
+            base_offsets = base.offsets[column][:base_count + 1] if base is not None else np.zeros(1, dtype='<u8')
+            lengths = np.fromiter((len(b) for b in columns[column]), dtype='<u8', count=len(tail))
+            offsets[column] = np.concatenate([base_offsets, base_offsets[-1] + np.cumsum(lengths, dtype='<u8')])
+            blob_sizes.append(int(offsets[column][-1]))
+        timestamps = np.concatenate([
+            base.timestamps[:base_count] if base is not None else np.empty(0, dtype='<f8'),
+            np.fromiter((meta.timestamp for _, meta in tail), dtype='<f8', count=len(tail)),
+        ])
+
+        with atomic_path(Path(path)) as tmp:
+            with open(tmp, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, count, *blob_sizes))
+                for column in _STR_COLUMNS:
+                    f.write(offsets[column].astype('<u8').tobytes())
+                f.write(timestamps.astype('<f8').tobytes())
+                for column in _STR_COLUMNS:
+                    if base is not None:
+                        f.write(base.blob(column, base_count))
+                    f.write(b''.join(columns[column]))
+
+    def select(self, ids: Iterable[int]) -> List[Tuple[str, TextMeta]]:
+        """ Decoded entries of `ids`, e.g. to write what a compaction keeps """
+        return [(self[i], self.meta(i)) for i in ids]
+
+    def rebase(self, count: int):
+        """ Swap the first `count` entries for the checkpoint just written, freeing their tail strings """
+        if count <= self.base_count or not self.path.exists():
+            return
+        segment = _Segment(self.path)
+        if segment.stored < count:
+            return  # overwritten by an older checkpoint of another writer
+        self._tail = self._tail[count - self.base_count:]
+        self._base = segment.limited(count)
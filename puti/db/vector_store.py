@@ -0,0 +1,108 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 17:20
+@Description:  Memory-mapped float32 vectors keyed by vector id, the exact copy behind a quantized index
+"""
+import numpy as np
+
+from pathlib import Path
+from typing import Optional, List, Union, Tuple
+from puti.utils.files import atomic_path
+
+
+class VectorStore:
+    """
+    Exact vectors of a memory shard whose index only keeps compressed codes, used to re-rank
+    candidates and to rebuild the index without compounding quantization error.
+
+    The checkpoint is a `.npy` file that is memory-mapped, so only the rows a re-rank touches
+    are paged in; rows appended since live in an in-memory tail like `TextStore`.
+    """
+
+    def __init__(self, path: Union[str, Path], dim: int):
+        self.path = Path(path)
+        self.dim = dim
+        self._base: Optional[np.ndarray] = None
+        self._tail: List[np.ndarray] = []
+        self._tail_count = 0
+
+    @classmethod
+    def load(cls, path: Union[str, Path], dim: int) -> 'VectorStore':
+        store = cls(path, dim)
+        if store.path.exists():
+            base = np.load(store.path, mmap_mode='r')
+            if base.ndim == 2 and base.shape[1] == dim:
+                store._base = base
+        return store
+
+    @property
+    def base_count(self) -> int:
+        return len(self._base) if self._base is not None else 0
+
+    def __len__(self) -> int:
+        return self.base_count + self._tail_count
+
+    def _tail_matrix(self) -> np.ndarray:
+        if len(self._tail) > 1:
+            self._tail = [np.concatenate(self._tail)]
+        return self._tail[0] if self._tail else np.empty((0, self.dim), dtype='float32')
+
+    def append(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, self.dim)
+        self._tail.append(vectors)
+        self._tail_count += len(vectors)
+
+    def truncate(self, count: int):
+        """ Forget rows past `count`, e.g. exact vectors checkpointed ahead of a stale index """
+        if count <= self.base_count:
+            self._base = self._base[:count] if self._base is not None else None
+            self._tail, self._tail_count = [], 0
+        else:
+            self._tail = [self._tail_matrix()[:count - self.base_count]]
+            self._tail_count = count - self.base_count
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """ Vectors of `ids` (any shape), touching only those rows of the mapped file """
+        ids = np.asarray(ids, dtype=np.int64)
+        flat = ids.reshape(-1)
+        found = np.empty((len(flat), self.dim), dtype='float32')
+        in_base = flat < self.base_count
+        if in_base.any():
+            found[in_base] = self._base[flat[in_base]]
+        if (~in_base).any():
+            found[~in_base] = self._tail_matrix()[flat[~in_base] - self.base_count]
+        return found.reshape(*ids.shape, self.dim)
+
+    def range(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        stop = len(self) if stop is None else stop
+        return self.rows(np.arange(start, stop))
+
+    def snapshot(self, count: int) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """ The first `count` rows in a form `write` can persist from another thread """
+        count = min(count, len(self))
+        base = self._base[:min(count, self.base_count)] if self._base is not None else None
+        return base, self._tail_matrix()[:max(count - self.base_count, 0)].copy()
+
+    @staticmethod
+    def write(path: Union[str, Path], base: Optional[np.ndarray], tail: np.ndarray):
+        """ Atomically write `base` followed by `tail`, streaming through a mapped output file """
+        base_count = len(base) if base is not None else 0
+        with atomic_path(Path(path)) as tmp:
+            out = np.lib.format.open_memmap(tmp, mode='w+', dtype='float32', shape=(base_count + len(tail), tail.shape[1]))
+            if base_count:
+                out[:base_count] = base
+            out[base_count:] = tail
+            out.flush()
+            del out
+
+    def rebase(self, count: int):
+        """ Swap the first `count` rows for the checkpoint just written """
+        if count <= self.base_count or not self.path.exists():
+            return
+        base = np.load(self.path, mmap_mode='r')
+        if len(base) < count:
+            return
+        tail = self._tail_matrix()[count - self.base_count:]
+        self._base = base[:count]
+        self._tail = [tail] if len(tail) else []
+        self._tail_count = len(tail)
@@ -0,0 +1,173 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 11:05
+@Description:  Append-only write-ahead log for long-term vector memory
+"""
+import os
+import json
+import struct
+import threading
+import zlib
+import numpy as np
+
+from pathlib import Path
+from typing import List, NamedTuple, Union, Iterable, Optional
+from puti.db.text_store import TextMeta
+from puti.logs import logger_factory
+from puti.utils.files import atomic_path
+
+lgr = logger_factory.db
+
+# payload length, crc32 of payload, sequence number (vector id), vector dim, text byte length
+_HEADER = struct.Struct('<IIQII')
+
+
+class WalRecord(NamedTuple):
+    seq: int
+    vector: np.ndarray
+    text: str
+    meta: Optional[TextMeta] = None
+
+
+class VectorWAL:
+    """
+    Log of (vector id, vector, text, metadata) records appended since the last checkpoint.
+
+    Each record is length-prefixed and checksummed, so a torn write at the tail is detected
+    and cut off on replay. Records keep their vector id, which lets recovery skip whatever a
+    checkpoint already persisted.
+
+    The log remembers how far it has read, so with several processes appending to one file
+    (serialized by a file lock) `read_new` returns only what the others wrote since.
+    """
+
+    def __init__(self, path: Union[str, Path], fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._fh = None
+        self._offset = 0
+        self._inode = None
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _handle(self):
+        stat = self._stat()
+        if self._fh is not None and (stat is None or stat.st_ino != os.fstat(self._fh.fileno()).st_ino):
+            # replaced by a compaction in another process, the old handle points at an orphan
+            self.close()
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, 'ab')
+        return self._fh
+
+    @staticmethod
+    def _encode(seq: int, vector: np.ndarray, text: str, meta: Optional[TextMeta] = None) -> bytes:
+        vector = np.ascontiguousarray(vector, dtype='float32').reshape(-1)
+        text = text.encode('utf-8')
+        payload = vector.tobytes() + text + (json.dumps(list(meta)).encode('utf-8') if meta else b'')
+        return _HEADER.pack(len(payload), zlib.crc32(payload), seq, vector.shape[0], len(text)) + payload
+
+    def append(self, seq: int, vector: np.ndarray, text: str, meta: Optional[TextMeta] = None):
+        self.append_many(seq, [vector], [text], [meta])
+
+    def append_many(
+            self,
+            start_seq: int,
+            vectors: Iterable[np.ndarray],
+            texts: Iterable[str],
+            metas: Optional[Iterable[Optional[TextMeta]]] = None
+    ):
+        """ Append consecutive records starting at vector id `start_seq` with a single flush """
+        texts = list(texts)
+        metas = list(metas) if metas is not None else [None] * len(texts)
+        data = b''.join(
+            self._encode(start_seq + i, vector, text, meta)
+            for i, (vector, text, meta) in enumerate(zip(vectors, texts, metas))
+        )
+        with self._lock:
+            fh = self._handle()
+            fh.write(data)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+            self._offset, self._inode = fh.tell(), os.fstat(fh.fileno()).st_ino
+
+    def _read(self, start: int = 0) -> List[WalRecord]:
+        records = []
+        stat = self._stat()
+        if stat is None:
+            self._offset, self._inode = 0, None
+            return records
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, crc, seq, dim, text_length = _HEADER.unpack_from(data, offset)
+            payload = data[offset + _HEADER.size: offset + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            vector = np.frombuffer(payload[:dim * 4], dtype='float32')
+            text = payload[dim * 4: dim * 4 + text_length].decode('utf-8')
+            meta = payload[dim * 4 + text_length:]
+            records.append(WalRecord(seq, vector, text, TextMeta(*json.loads(meta)) if meta else None))
+            offset += _HEADER.size + length
+        if offset < len(data):
+            lgr.warning(f'Truncating torn tail of {self.path} at byte {start + offset} of {start + len(data)}')
+            with open(self.path, 'r+b') as f:
+                f.truncate(start + offset)
+        self._offset, self._inode = start + offset, stat.st_ino
+        return records
+
+    def replay(self) -> List[WalRecord]:
+        """ Read every intact record, cutting off a partially written tail """
+        with self._lock:
+            self.close()
+            return self._read()
+
+    def read_new(self) -> List[WalRecord]:
+        """ Records appended by other writers since the last read, everything if the file was replaced """
+        with self._lock:
+            stat = self._stat()
+            if stat is None or stat.st_ino != self._inode or stat.st_size < self._offset:
+                return self._read()
+            if stat.st_size == self._offset:
+                return []
+            return self._read(self._offset)
+
+    def compact(self, keep_from_seq: int):
+        """ Drop records a checkpoint already persisted (vector id < `keep_from_seq`) """
+        with self._lock:
+            self.close()
+            kept = [r for r in self._read() if r.seq >= keep_from_seq]
+            if not kept:
+                self.path.unlink(missing_ok=True)
+                self._offset, self._inode = 0, None
+                return
+            with atomic_path(self.path) as tmp:
+                with open(tmp, 'wb') as f:
+                    f.write(b''.join(self._encode(*r) for r in kept))
+                    f.flush()
+                    os.fsync(f.fileno())
+            stat = self._stat()
+            self._offset, self._inode = stat.st_size, stat.st_ino
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def clear(self):
+        with self._lock:
+            self.close()
+            self.path.unlink(missing_ok=True)
+            self._offset, self._inode = 0, None
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -5,12 +5,17 @@
 """
 from pydantic import BaseModel, Field, ConfigDict
 from puti.llm.roles import Role
-from typing import Union, Callable, Any, Dict, Optional
+from typing import Union, Callable, Any, Dict, Optional, List, Iterable, ClassVar, AsyncIterator
 import re
+import json
+import asyncio
 import jinja2
 from jinja2 import Template
 from puti.logs import logger_factory
 from puti.llm.messages import Message
+from puti.constant.llm import RoleType
+from puti.utils.rate_limit import TokenBucket
+from puti.utils import tracing
 
 lgr = logger_factory.llm
 
@@ -30,6 +35,9 @@ class Action(BaseModel):
         default=None,
         description="The prompt to be sent to the role. Can be a plain string, a Jinja2 Template, or a callable."
     )
+    # actions that read their `previous_result` chunk by chunk (see `puti.llm.stream.iter_chunks`) set this,
+    # any other action fed by a streaming edge gets the assembled result
+    consumes_stream: ClassVar[bool] = False
 
     async def run(self, role: Role, *args, **kwargs) -> Union[str, Message]:
         """
@@ -48,6 +56,33 @@ class Action(BaseModel):
         if role is None:
             raise ValueError("Role must be provided to run an action.")
         
+        # If a 'prompt' is explicitly provided in runtime kwargs, it overrides self.prompt
+        resolved_prompt = self.render_prompt(**kwargs)
+        kwargs.pop('prompt', None)
+
+        resp = await role.run(
+            msg=resolved_prompt,  # Pass the resolved prompt
+            action_name=self.name,
+            action_description=self.description,
+            *args,
+            **kwargs
+        )
+        # postprocessing action here ...
+        return resp
+
+    async def stream(self, role: Role, *args, **kwargs) -> AsyncIterator[str]:
+        """
+        The result of `run` in chunks as it is produced, used when the action's vertex feeds a
+        streaming edge; the chunks joined are the result. Actions that cannot stream yield it whole.
+        """
+        resp = await self.run(role, *args, **kwargs)
+        yield resp.content if isinstance(resp, Message) else str(resp)
+
+    def render_prompt(self, **kwargs) -> Any:
+        """
+        The prompt `run` sends to the role for these runtime kwargs, without running anything.
+        A 'prompt' in kwargs overrides self.prompt; callables get `previous_result`, templates the kwargs.
+        """
         # Determine the effective prompt to pass to the role
         resolved_prompt = self.prompt
 
@@ -74,16 +109,7 @@ class Action(BaseModel):
         elif isinstance(resolved_prompt, str):
             pass
             # lgr.debug(f"Action {self.name}: Using prompt as-is: {resolved_prompt}")
-
-        resp = await role.run(
-            msg=resolved_prompt,  # Pass the resolved prompt
-            action_name=self.name,
-            action_description=self.description,
-            *args,
-            **kwargs
-        )
-        # postprocessing action here ...
-        return resp
+        return resolved_prompt
 
     def __call__(self, prompt, role: Role, *args, **kwargs):
         """
@@ -114,3 +140,115 @@ class Action(BaseModel):
             An Action instance with the template as its prompt
         """
         return cls(name=name, description=description, prompt=template)
+
+
+class ItemResult(BaseModel):
+    """ What one item of a `MapAction` produced, the result or the error it failed with """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    item: Any
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class MapResult(BaseModel):
+    """ Per item results of a `MapAction` in item order, carried as `instruct_content` of its Message """
+    results: List[ItemResult] = Field(default_factory=list)
+
+    @property
+    def succeeded(self) -> List[ItemResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[ItemResult]:
+        return [result for result in self.results if not result.ok]
+
+
+def _as_items(value: Any) -> List[Any]:
+    """ Items of a previous result: a list as is, a Message by its content, a string holding a JSON list """
+    if isinstance(value, Message):
+        if isinstance(value.instruct_content, MapResult):
+            return [result.result for result in value.instruct_content.succeeded]
+        value = value.content
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return [value] if value else []
+        return parsed if isinstance(parsed, list) else [parsed]
+    return [] if value is None else [value]
+
+
+class MapAction(Action):
+    """
+    Fan-out: runs `action` once per item of a list, up to `concurrency` items at a time.
+
+    Items are `items` when set, else taken from `previous_result` by `split` (see `_as_items`).
+    Each item run gets `item` and `previous_result=item` in its kwargs and, with `isolate_role`,
+    its own copy of the role (see `Role.isolated`) so items never see each other's conversation.
+    A shared `rate_limit` bucket is waited on before every item. An item that fails is recorded
+    with its error and the others carry on.
+
+    Returns an assistant Message whose content lists the per item results as JSON and whose
+    `instruct_content` is the `MapResult`.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    name: str = 'map'
+    action: Action = Field(..., description='Run once per item')
+    items: Optional[List[Any]] = Field(default=None, description='Items to map over instead of the previous result')
+    split: Callable[[Any], Iterable[Any]] = Field(default=_as_items, description='Items of the previous result')
+    concurrency: int = Field(default=4, description='Items in flight at once')
+    rate_limit: Optional[TokenBucket] = Field(
+        default=None, exclude=True, description='Token bucket shared with whatever else calls the same api'
+    )
+    isolate_role: bool = Field(default=True, description='Run each item on its own copy of the role')
+
+    async def run(self, role: Role, *args, **kwargs) -> Message:
+        items = list(self.items if self.items is not None else self.split(kwargs.get('previous_result')))
+        results: List[Optional[ItemResult]] = [None] * len(items)
+        queue = enumerate(items)  # shared by the workers, each pulls the next item when it is free
+        lgr.debug(f'`{self.name}` mapping `{self.action.name}` over {len(items)} items')
+
+        async def run_item(item: Any) -> ItemResult:
+            if self.rate_limit is not None:
+                await self.rate_limit.acquire()
+            with tracing.span('map.item', action=self.action.name, item=item) as span:
+                try:
+                    result = await self.action.run(
+                        self._role_for(role), *args, **{**kwargs, 'previous_result': item, 'item': item}
+                    )
+                except Exception as e:
+                    lgr.error(f'`{self.name}` item {item!r} failed: {e}')
+                    span.set(error=str(e))
+                    return ItemResult(item=item, error=f'{type(e).__name__}: {e}')
+            return ItemResult(item=item, result=result.content if isinstance(result, Message) else result)
+
+        async def worker():
+            for position, item in queue:
+                results[position] = await run_item(item)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(min(self.concurrency, len(items)), 1))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        mapped = MapResult(results=results)
+        content = json.dumps(
+            [{'item': r.item, 'result': r.result, 'error': r.error} for r in mapped.results],
+            ensure_ascii=False, default=str,
+        )
+        return Message(content=content, instruct_content=mapped, role=RoleType.ASSISTANT, sender=self.name)
+
+    def _role_for(self, role: Role) -> Role:
+        return role.isolated() if self.isolate_role and role is not None else role
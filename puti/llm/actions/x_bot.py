@@ -6,17 +6,17 @@
 import datetime
 import json
 import re
-import asyncio
 from typing import List, Optional, Literal, Union, Dict, Any
 from pydantic import Field, ConfigDict
 from jinja2 import Template
 
 from puti.logs import logger_factory
-from puti.llm.actions import Action
+from puti.llm.actions import Action, MapAction
 from puti.llm.graph import Graph, Vertex
 from puti.llm.roles.agents import Ethan
 from puti.llm.nodes import OpenAINode
 from puti.llm.messages import UserMessage
+from puti.utils.rate_limit import TokenBucket
 
 lgr = logger_factory.llm
 
@@ -56,25 +56,14 @@ class GenerateTweetAction(Action):
         description="Jinja2 template for the review step."
     )
 
-    async def run(self, *args, **kwargs):
-        """
-        Executes the three-step topic-generation, tweet-creation, and review process.
-        This action uses its own OpenAINode instance, ignoring the role's LLM.
-        
-        Args:
-            *args: Variable length argument list
-            **kwargs: Arbitrary keyword arguments including possible topic parameter
-        """
-        lgr.info(f"Starting tweet generation process with {self.name} action")
-
-        if kwargs.get('topic'):
-            self.topic = kwargs.get('topic')
-
-        llm_node = OpenAINode()
+    async def _review_messages(self, llm_node: OpenAINode, **kwargs) -> List[Dict]:
+        """ Topic and draft, the first two steps, ending in the review request of the third """
+        # a run's topic is not kept on the action, which is shared by every run of a compiled workflow
+        topic = kwargs.get('topic') or self.topic
 
         # 1. Generate a topic (use provided topic if given)
-        if self.topic:
-            generated_topic = self.topic
+        if topic:
+            generated_topic = topic
         else:
             topic_resp = await llm_node.chat([UserMessage(content=self.topic_prompt_template).to_message_dict()])
             generated_topic = topic_resp.content if hasattr(topic_resp, 'content') else str(topic_resp)
@@ -86,13 +75,35 @@ class GenerateTweetAction(Action):
 
         # 3. Review the generated tweet
         review_prompt = self.review_prompt_template.render(generated_tweet=initial_tweet_content)
-        final_tweet_resp = await llm_node.chat([UserMessage(content=review_prompt).to_message_dict()])
+        return [UserMessage(content=review_prompt).to_message_dict()]
+
+    async def run(self, *args, **kwargs):
+        """
+        Executes the three-step topic-generation, tweet-creation, and review process.
+        This action uses its own OpenAINode instance, ignoring the role's LLM.
+        
+        Args:
+            *args: Variable length argument list
+            **kwargs: Arbitrary keyword arguments including possible topic parameter
+        """
+        lgr.info(f"Starting tweet generation process with {self.name} action")
+
+        llm_node = OpenAINode()
+        final_tweet_resp = await llm_node.chat(await self._review_messages(llm_node, **kwargs))
         
         final_content = final_tweet_resp.content if hasattr(final_tweet_resp, 'content') else str(final_tweet_resp)
         lgr.debug(f"Final tweet generated: {final_content}")
 
         return final_tweet_resp
 
+    async def stream(self, *args, **kwargs):
+        """ As `run`, with the reviewed tweet streamed as the model writes it """
+        lgr.info(f"Starting tweet generation process with {self.name} action, streaming the review")
+
+        llm_node = OpenAINode()
+        async for chunk in llm_node.chat_chunks(await self._review_messages(llm_node, **kwargs)):
+            yield chunk
+
 
 class PublishTweetAction(Action):
     """
@@ -146,21 +157,8 @@ class ReplyToRecentUnrepliedTweetsAction(Action):
         return response
 
 
-class ContextAwareReplyAction(Action):
-    """
-    An action to reply to one or more tweets with awareness of the full conversation context.
-    This action retrieves the full conversation thread for each tweet before generating and sending a reply.
-    """
-    model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
-
-    name: str = 'context_aware_reply'
-    description: str = 'Generates and sends context-aware replies to a batch of tweets.'
-    
-    tweet_ids: Optional[List[str]] = Field(default=None, description="A list of tweet IDs to reply to. If not provided, it will be taken from the previous action's result.")
-    max_context_depth: int = Field(default=5, description="Maximum depth for tracing conversation history")
-    
-    prompt: Template = Field(default=Template(
-        """I need to reply to a tweet in a conversation thread. Here's the full context:
+CONTEXT_REPLY_PROMPT = Template(
+    """I need to reply to a tweet in a conversation thread. Here's the full context:
         
 {% if original_tweet %}
 ORIGINAL TWEET ({{ original_tweet.user.name }} @{{ original_tweet.user.screen_name }}):
@@ -182,7 +180,98 @@ TWEET TO REPLY TO ({{ current_tweet.user.name }} @{{ current_tweet.user.screen_n
 Please draft a thoughtful, relevant reply that considers the full conversation context.
 The reply should be concise (under 280 characters), engaging, and directly address the points in the tweet.
 """
-    ), description="Template for generating the reply with context")
+)
+
+
+class ReplyInContextAction(Action):
+    """
+    Replies to a single tweet, `item` or `previous_result` being its id: retrieves the conversation
+    thread, drafts a reply with the thread as context and sends it. The unit `ContextAwareReplyAction`
+    maps over a batch of tweets.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
+
+    name: str = 'reply_in_context'
+    description: str = 'Generates and sends a context-aware reply to one tweet.'
+
+    max_context_depth: int = Field(default=5, description="Maximum depth for tracing conversation history")
+
+    prompt: Template = Field(default=CONTEXT_REPLY_PROMPT, description="Template for generating the reply with context")
+
+    async def run(self, role, previous_result=None, *args, **kwargs):
+        """
+        Args:
+            role: The agent role that will perform the actions, an isolated copy per tweet when mapped
+            previous_result: The id of the tweet to reply to, unless given as `item`
+
+        Returns:
+            The response of the role to the reply request. Raises when a step fails.
+        """
+        tweet_id = str(kwargs.get('item', previous_result))
+        lgr.info(f"Processing tweet ID: {tweet_id}")
+
+        # Step 1: Get the conversation thread
+        get_thread_prompt = f"""Use the twikitt tool with the get_conversation_thread command to retrieve the full conversation thread for tweet ID {tweet_id}. Set max_depth={self.max_context_depth}. The result should be a JSON string."""
+        thread_response = await role.run(get_thread_prompt)
+
+        # Step 2: Parse thread data
+        thread_data = {}
+        try:
+            json_match = re.search(r'```json\n(.*?)\n```', thread_response, re.DOTALL)
+            if not json_match:
+                json_match = re.search(r'{.*}', thread_response, re.DOTALL)
+
+            if json_match:
+                thread_data_str = json_match.group(1) if '```' in json_match.group(0) else json_match.group(0)
+                thread_data = json.loads(thread_data_str)
+            else:
+                lgr.warning(f"Could not extract thread data for tweet {tweet_id} from response: {thread_response}")
+        except Exception as e:
+            lgr.error(f"Error parsing thread data for tweet {tweet_id}: {e}")
+
+        # Step 3: Generate reply
+        generation_prompt = self.prompt.render(
+            original_tweet=thread_data.get("original_tweet"),
+            parent_tweets=thread_data.get("parent_tweets", []),
+            current_tweet=thread_data.get("current_tweet", {"id": tweet_id, "text": "Content not available", "user": {"name": "Unknown", "screen_name": "unknown"}})
+        )
+        reply_text = await role.run(generation_prompt)
+
+        if len(reply_text) > 280:
+            reply_text = reply_text[:277] + "..."
+
+        # Step 4: Send the reply
+        reply_prompt = f"""Use the twikitt tool with the reply_to_tweet command to reply to tweet ID {tweet_id} with the following text:
+                
+"{reply_text}"
+"""
+        reply_response = await role.run(reply_prompt)
+        lgr.info(f"Successfully sent reply to tweet {tweet_id}.")
+        return reply_response
+
+
+class ContextAwareReplyAction(Action):
+    """
+    An action to reply to one or more tweets with awareness of the full conversation context.
+    This action retrieves the full conversation thread for each tweet before generating and sending a reply.
+
+    Tweets are handled `concurrency` at a time, each on its own copy of the role, and their starts
+    are paced by `rate_limit` so a batch goes as fast as the api allows.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
+
+    name: str = 'context_aware_reply'
+    description: str = 'Generates and sends context-aware replies to a batch of tweets.'
+    
+    tweet_ids: Optional[List[str]] = Field(default=None, description="A list of tweet IDs to reply to. If not provided, it will be taken from the previous action's result.")
+    max_context_depth: int = Field(default=5, description="Maximum depth for tracing conversation history")
+    concurrency: int = Field(default=3, description="Tweets replied to at once")
+    rate_limit: TokenBucket = Field(
+        default_factory=lambda: TokenBucket(rate=0.5, capacity=3), exclude=True,
+        description="Paces the replies, one every two seconds on average after a burst of three"
+    )
+    
+    prompt: Template = Field(default=CONTEXT_REPLY_PROMPT, description="Template for generating the reply with context")
     
     async def run(self, role, previous_result=None, *args, **kwargs):
         """
@@ -203,72 +292,25 @@ The reply should be concise (under 280 characters), engaging, and directly addre
                 tweet_ids_to_process = previous_result
             else:
                 lgr.info(f"Previous result is not a list, attempting to parse IDs from string: {previous_result}")
-                tweet_ids_to_process = re.findall(r'\d{18,}', str(previous_result))
+                tweet_ids_to_process = re.findall(r'\d{18,}', str(getattr(previous_result, 'content', previous_result)))
 
         if not tweet_ids_to_process:
             return "No tweet IDs provided or found from previous step. Nothing to do."
 
-        results = []
         lgr.info(f"Starting batch context-aware reply for {len(tweet_ids_to_process)} tweets.")
-
-        for tweet_id in tweet_ids_to_process:
-            try:
-                lgr.info(f"Processing tweet ID: {tweet_id}")
-                
-                # Step 1: Get the conversation thread
-                get_thread_prompt = f"""Use the twikitt tool with the get_conversation_thread command to retrieve the full conversation thread for tweet ID {tweet_id}. Set max_depth={self.max_context_depth}. The result should be a JSON string."""
-                thread_response = await role.run(get_thread_prompt)
-                
-                # Step 2: Parse thread data
-                thread_data = {}
-                try:
-                    json_match = re.search(r'```json\n(.*?)\n```', thread_response, re.DOTALL)
-                    if not json_match:
-                        json_match = re.search(r'{.*}', thread_response, re.DOTALL)
-                    
-                    if json_match:
-                        thread_data_str = json_match.group(1) if '```' in json_match.group(0) else json_match.group(0)
-                        thread_data = json.loads(thread_data_str)
-                    else:
-                        lgr.warning(f"Could not extract thread data for tweet {tweet_id} from response: {thread_response}")
-                except Exception as e:
-                    lgr.error(f"Error parsing thread data for tweet {tweet_id}: {e}")
-
-                # Step 3: Generate reply
-                generation_prompt = self.prompt.render(
-                    original_tweet=thread_data.get("original_tweet"),
-                    parent_tweets=thread_data.get("parent_tweets", []),
-                    current_tweet=thread_data.get("current_tweet", {"id": tweet_id, "text": "Content not available", "user": {"name": "Unknown", "screen_name": "unknown"}})
-                )
-                reply_text = await role.run(generation_prompt)
-                
-                if len(reply_text) > 280:
-                    reply_text = reply_text[:277] + "..."
-
-                # Step 4: Send the reply
-                reply_prompt = f"""Use the twikitt tool with the reply_to_tweet command to reply to tweet ID {tweet_id} with the following text:
-                
-"{reply_text}"
-"""
-                reply_response = await role.run(reply_prompt)
-                
-                results.append({"tweet_id": tweet_id, "status": "success", "response": reply_response})
-                lgr.info(f"Successfully sent reply to tweet {tweet_id}.")
-
-            except Exception as e:
-                error_message = f"Failed to process tweet {tweet_id}: {e}"
-                lgr.error(error_message, exc_info=True)
-                results.append({"tweet_id": tweet_id, "status": "error", "response": error_message})
-            
-            # Add a small delay between replies to avoid rate limiting
-            await asyncio.sleep(2)
+        reply = ReplyInContextAction(max_context_depth=self.max_context_depth, prompt=self.prompt)
+        batch = MapAction(
+            name=self.name, action=reply, items=tweet_ids_to_process,
+            concurrency=self.concurrency, rate_limit=self.rate_limit,
+        )
+        mapped = (await batch.run(role, *args, **kwargs)).instruct_content
 
         # Summarize the results
-        success_count = sum(1 for r in results if r["status"] == "success")
-        error_count = len(results) - success_count
+        success_count = len(mapped.succeeded)
+        error_count = len(mapped.failed)
         summary = f"Batch reply finished. Success: {success_count}, Failed: {error_count}.\n"
-        for res in results:
-            summary += f"- Tweet {res['tweet_id']}: {res['status']}\n"
+        for res in mapped.results:
+            summary += f"- Tweet {res.item}: {'success' if res.ok else 'error'}\n"
             
         return summary
 
@@ -0,0 +1,163 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 10:12
+@Description:  Message bus carrying `Env` messages to member buffers, in-process or across workers
+"""
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, ClassVar, Dict, List, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+from puti.constant.llm import RoleType
+from puti.llm.messages import Message, AssistantMessage, UserMessage, SystemMessage
+from puti.logs import logger_factory
+
+lgr = logger_factory.llm
+
+MessageHandler = Callable[[Message], Any]
+
+_MESSAGE_TYPES = {cls.__name__: cls for cls in (AssistantMessage, UserMessage, SystemMessage)}
+
+
+def encode_message(msg: Message) -> Dict[str, Any]:
+    """ Flatten a message into a json-safe payload, non-standard (tool/image) content is dropped """
+    payload = msg.model_dump(mode='json', exclude={'role', 'instruct_content', 'non_standard', 'reflection_type'})
+    payload['role'] = msg.role.val
+    payload['msg_type'] = msg.__class__.__name__
+    return payload
+
+
+def decode_message(payload: Dict[str, Any]) -> Message:
+    """ Rebuild a message produced by `encode_message` """
+    payload = dict(payload)
+    role = RoleType.elem_from_str(payload.pop('role'))
+    msg_cls = _MESSAGE_TYPES.get(payload.pop('msg_type', ''))
+    payload['receiver'] = set(payload.get('receiver') or [])
+    if msg_cls:
+        return msg_cls(**payload)
+    return Message(role=role, **payload)
+
+
+class MessageBus(BaseModel, ABC):
+    """
+    Transport between `Env.publish_message` and the `Buffer` of each member role.
+
+    Handlers are subscribed per topic (the env name); `publish` fans a message out to every
+    subscriber of that topic, wherever it lives. `drain` pulls pending messages from the
+    transport and hands them to local handlers.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    local: ClassVar[bool] = True  # whether all subscribers of a topic live in this process
+
+    _handlers: Dict[str, List[MessageHandler]] = PrivateAttr(default_factory=lambda: defaultdict(list))
+
+    def subscribe(self, topic: str, handler: MessageHandler):
+        self._handlers[topic].append(handler)
+
+    def _dispatch(self, topic: str, msg: Message):
+        for handler in self._handlers.get(topic, []):
+            handler(msg)
+
+    @abstractmethod
+    def publish(self, topic: str, msg: Message):
+        """ Deliver `msg` to every subscriber of `topic` """
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """ Dispatch messages waiting in the transport, return how many were handled """
+        return 0
+
+    def close(self):
+        pass
+
+
+class InProcessBus(MessageBus):
+    """ Synchronous delivery inside the current process """
+
+    def publish(self, topic: str, msg: Message):
+        self._dispatch(topic, msg)
+
+
+def _celery_broker_url() -> str:
+    from puti.conf.celery_private_conf import CeleryPrivateConfig
+    return CeleryPrivateConfig().BROKER_URL
+
+
+class BrokerBus(MessageBus):
+    """
+    Fan-out over the celery broker, so roles of one env can be spread across workers.
+
+    Every process joins a fanout exchange per topic with its own auto-deleted queue. Messages
+    published here come back through `drain` as well, which keeps `Env.history` identical on
+    every worker. Use `memory://` as url to stand in for redis within a single process.
+    """
+    local: ClassVar[bool] = False
+
+    url: str = Field(default_factory=_celery_broker_url, description='Kombu broker url, defaults to celery BROKER_URL')
+    node_id: str = Field(default_factory=lambda: uuid4().hex[:8], description='Unique id of this process on the bus')
+    exchange_prefix: str = Field(default='puti.env', description='Prefix of fanout exchange names')
+
+    _conn: Any = PrivateAttr(default=None)
+    _producer: Any = PrivateAttr(default=None)
+    _exchanges: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _queues: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def _connection(self):
+        if self._conn is None:
+            from kombu import Connection
+            self._conn = Connection(self.url)
+            self._producer = self._conn.Producer(serializer='json')
+        return self._conn
+
+    def _exchange(self, topic: str):
+        if topic not in self._exchanges:
+            from kombu import Exchange
+            self._exchanges[topic] = Exchange(
+                f'{self.exchange_prefix}.{topic}', type='fanout', durable=False, auto_delete=True
+            )
+        return self._exchanges[topic]
+
+    def subscribe(self, topic: str, handler: MessageHandler):
+        super().subscribe(topic, handler)
+        if topic not in self._queues:
+            from kombu import Queue
+            queue = Queue(
+                f'{self.exchange_prefix}.{topic}.{self.node_id}',
+                exchange=self._exchange(topic),
+                durable=False,
+                auto_delete=True
+            )
+            self._queues[topic] = self._connection().SimpleQueue(queue)
+
+    def publish(self, topic: str, msg: Message):
+        self._connection()
+        exchange = self._exchange(topic)
+        self._producer.publish(encode_message(msg), exchange=exchange, declare=[exchange], retry=True)
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        handled = 0
+        for topic, queue in self._queues.items():
+            while limit is None or handled < limit:
+                try:
+                    raw = queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._dispatch(topic, decode_message(raw.payload))
+                except Exception as e:
+                    lgr.error(f'Dropping undeliverable message on topic `{topic}`: {e}')
+                finally:
+                    raw.ack()
+                handled += 1
+        return handled
+
+    def close(self):
+        for queue in self._queues.values():
+            queue.close()
+        self._queues.clear()
+        if self._conn is not None:
+            self._conn.release()
+            self._conn = None
+            self._producer = None
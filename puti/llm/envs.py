@@ -15,6 +15,7 @@ from collections import defaultdict
 from typing import TYPE_CHECKING
 from puti.constant.llm import MessageRouter
 from puti.capture import Capture
+from puti.llm.bus import MessageBus, InProcessBus
 
 import asyncio
 
@@ -37,6 +38,10 @@ class Env(BaseModel):
     members_addr: Dict['Role', set[str]] = Field(default_factory=lambda: defaultdict(set), description='key is role name, value is role address')
     history: List[Message] = []
     cp: SerializeAsAny[Capture] = Field(default_factory=Capture, validate_default=True, description='Capture exception')
+    bus: SerializeAsAny[MessageBus] = Field(default_factory=InProcessBus, exclude=True, description='Transport delivering published messages to members, `BrokerBus` shares the env across workers')
+
+    def model_post_init(self, __context: Any) -> None:
+        self.bus.subscribe(self.name, self._deliver)
 
     @property
     def env_prompt(self):
@@ -52,19 +57,24 @@ class Env(BaseModel):
     def publish_message(self, msg: Message):
         """ Publish message to all members exclude myself """
         lgr.debug(f'Publishing message: {msg}')
+        self.bus.publish(self.name, msg)
+
+    def _deliver(self, msg: Message):
+        """ Route a message from the bus into the buffers of local members """
         has_receiver = False
         for role, addr in self.members_addr.items():
             if ((MessageRouter.ALL.val in msg.receiver or msg.receiver & role.address)
                     and msg.sender != role.name):
                 role.rc.buffer.put_one_msg(msg)
                 has_receiver = True
-        if not has_receiver:
+        if not has_receiver and self.bus.local:
             lgr.warning(f'No receiver for message: {msg}')
         self.history.append(msg)
 
     async def run(self, run_round: int = 5):
         n = 0
         while n < run_round:
+            self.bus.drain()
             futures = []
             for member in self.members:
                 future = member.run()
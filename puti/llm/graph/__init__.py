@@ -4,17 +4,22 @@
 @Description:  Graph-based workflow system for orchestrating role interactions
 """
 from __future__ import annotations
-from typing import Callable, Any, Dict, List, Optional, Set, Union, Tuple
+from typing import Callable, Any, Dict, List, Optional, Set, Union, Tuple, Iterable
+import uuid
 import asyncio
 import logging
 from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict, model_validator
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr, model_validator
 from puti.llm.roles import Role, GraphRole
 from puti.llm.actions import Action
 from puti.constant.llm import VertexState
 from puti.logs import logger_factory
 from puti.llm.messages import Message
 from puti.constant.llm import RoleType
+from puti.llm.graph.cache import CachePolicy
+from puti.llm.graph.checkpoint import Checkpoint, CheckpointStore
+from puti.llm.stream import ResultStream
+from puti.utils import tracing, deadlines
 
 lgr = logger_factory.llm
 
@@ -34,21 +39,83 @@ class Vertex(BaseModel):
     result: Any = Field(default=None, description="The result of the vertex's action")
     execution_time: Optional[float] = Field(default=None, description="Execution time in seconds")
     error: Optional[Exception] = Field(default=None, description="Error that occurred during execution")
+    cache: Optional[CachePolicy] = Field(
+        default=None, description="Reuse results of earlier runs with the same inputs, for pure actions"
+    )
+    cache_hit: bool = Field(default=False, description="Whether the last result came from the cache")
+    timeout: Optional[float] = Field(
+        default=None, description="Seconds the action may take before the vertex fails with a TimeoutError"
+    )
     
-    async def run(self, *args, **kwargs) -> Union[str, Message]:
-        """Execute the vertex's action and record the result"""
+    async def run(
+            self,
+            *args,
+            timeout: Optional[float] = None,
+            result_stream: Optional[ResultStream] = None,
+            **kwargs
+    ) -> Union[str, Message]:
+        """
+        Execute the vertex's action and record the result.
+        `timeout` overrides the vertex's own; it also bounds the llm calls the action makes.
+        With `result_stream`, the result is also pushed there as it is produced, see `Edge.stream`.
+        """
+        with tracing.span('graph.vertex', vertex=self.id, action=self.action.name) as span:
+            result = await self._run(
+                *args, timeout=timeout if timeout is not None else self.timeout, result_stream=result_stream, **kwargs
+            )
+            span.set(state=self.state.val, cache_hit=self.cache_hit)
+        return result
+
+    async def _run(
+            self,
+            *args,
+            timeout: Optional[float] = None,
+            result_stream: Optional[ResultStream] = None,
+            **kwargs
+    ) -> Union[str, Message]:
         self.state = VertexState.RUNNING
+        self.cache_hit = False
         start_time = datetime.now()
+        cache_key = None
         
         try:
+            previous_result = kwargs.get('previous_result')
+            if isinstance(previous_result, ResultStream) and (self.cache is not None or not self.action.consumes_stream):
+                # the cache key, and actions that need their input whole, wait for all of it
+                kwargs['previous_result'] = await previous_result
+
+            if self.cache is not None:
+                cache_key = self.cache.key(self, kwargs)
+            if cache_key is not None:
+                self.cache_hit, cached = self.cache.lookup(cache_key)
+                if self.cache_hit:
+                    self.result = cached
+                    self.state = VertexState.SUCCESS
+                    lgr.debug(f"Vertex '{self.id}' result served from cache")
+                    return self.result
+
             # If role is a GraphRole, set the vertex_id
             if isinstance(self.role, GraphRole):
                 self.role.set_vertex_id(self.id)
                 
-            # Execute the action with this vertex's role
-            self.result = await self.action.run(role=self.role, *args, **kwargs)
+            # Execute the action with this vertex's role, within the timeout and any deadline of the run
+            with deadlines.scope(timeout):
+                self.result = await asyncio.wait_for(self._act(result_stream, *args, **kwargs), deadlines.remaining())
             self.state = VertexState.SUCCESS
+            if cache_key is not None:
+                self.cache.save(cache_key, self.result)
             lgr.debug(f"Vertex '{self.id}' executed successfully")
+        except asyncio.CancelledError as e:
+            self.state = VertexState.CANCELLED
+            self.result = e
+            self.error = e
+            lgr.warning(f"Vertex '{self.id}' cancelled")
+            raise
+        except asyncio.TimeoutError as e:
+            self.state = VertexState.FAILED
+            self.result = e
+            self.error = e
+            lgr.error(f"Vertex '{self.id}' timed out")
         except Exception as e:
             self.state = VertexState.FAILED
             self.result = e
@@ -57,9 +124,22 @@ class Vertex(BaseModel):
         finally:
             end_time = datetime.now()
             self.execution_time = (end_time - start_time).total_seconds()
+            if result_stream is not None:
+                if self.state == VertexState.SUCCESS:
+                    result_stream.close(self.result)
+                else:
+                    result_stream.fail(self.error)
             
         return self.result
 
+    async def _act(self, result_stream: Optional[ResultStream], *args, **kwargs) -> Union[str, Message]:
+        # actions that do not override `stream` would only yield their whole result, run them as usual
+        if result_stream is None or type(self.action).stream is Action.stream:
+            return await self.action.run(role=self.role, *args, **kwargs)
+        async for chunk in self.action.stream(role=self.role, *args, **kwargs):
+            result_stream.push(chunk)
+        return Message.from_any(result_stream.text, role=RoleType.ASSISTANT)
+
     @property
     def is_successful(self) -> bool:
         """Check if the vertex executed successfully."""
@@ -72,6 +152,11 @@ class Edge(BaseModel):
     target: str
     condition: Optional[Callable[[Any], bool]] = None
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata for the edge")
+    stream: bool = Field(
+        default=False,
+        description="Start the target on the source's result chunks while the source is still running, "
+                    "when this is the source's only edge; `Graph.run` only"
+    )
     
     def matches(self, value: Any) -> bool:
         """Check if the value satisfies the condition"""
@@ -86,6 +171,64 @@ class Edge(BaseModel):
             return False
 
 
+class Adjacency:
+    """
+    Outgoing and incoming edge positions per vertex, compiled once from a graph's edges so that
+    traversal does not scan the edge list at every step. `keep` compiles a view of a subset of
+    the edges, which is how workflows run part of a graph without building another one.
+    """
+
+    def __init__(self, edges: List[Edge], vertex_ids: Iterable[str], keep: Optional[Callable[[Edge], bool]] = None):
+        self.edges = edges
+        self.outgoing: Dict[str, List[int]] = {vertex_id: [] for vertex_id in vertex_ids}
+        self.incoming: Dict[str, List[int]] = {vertex_id: [] for vertex_id in self.outgoing}
+        for position, edge in enumerate(edges):
+            if keep is None or keep(edge):
+                self.outgoing.setdefault(edge.source, []).append(position)
+                self.incoming.setdefault(edge.target, []).append(position)
+        # a lone unconditional edge is followed without evaluating any condition
+        self.direct: Dict[str, str] = {
+            vertex_id: edges[positions[0]].target for vertex_id, positions in self.outgoing.items()
+            if len(positions) == 1 and edges[positions[0]].condition is None
+        }
+        # a lone streaming edge starts its target before its source is done, see `Graph.run`
+        self.streaming: Dict[str, str] = {
+            vertex_id: target for vertex_id, target in self.direct.items() if edges[self.outgoing[vertex_id][0]].stream
+        }
+        self._back_edges: Dict[Tuple[str, ...], Set[int]] = {}
+
+    def outgoing_edges(self, vertex_id: str) -> List[Edge]:
+        return [self.edges[position] for position in self.outgoing.get(vertex_id, [])]
+
+    def back_edges(self, roots: Iterable[str]) -> Set[int]:
+        """Positions of the edges closing a cycle, found by a depth-first walk from `roots`"""
+        roots = tuple(roots)
+        if roots in self._back_edges:
+            return self._back_edges[roots]
+        back, done, path = set(), set(), set()
+
+        def walk(vertex_id: str):
+            path.add(vertex_id)
+            for position in self.outgoing.get(vertex_id, []):
+                target = self.edges[position].target
+                if target in path:
+                    back.add(position)
+                elif target not in done:
+                    walk(target)
+            path.discard(vertex_id)
+            done.add(vertex_id)
+
+        for root in roots:
+            if root not in done:
+                walk(root)
+        self._back_edges[roots] = back
+        return back
+
+    def roots(self) -> List[str]:
+        """Vertices without incoming edges"""
+        return [vertex_id for vertex_id, positions in self.incoming.items() if not positions]
+
+
 class Graph(BaseModel):
     """
     A directed graph representing a workflow of actions and conditions.
@@ -97,10 +240,17 @@ class Graph(BaseModel):
     start_vertex_id: Optional[str] = None
     shared_context: Dict[str, Any] = Field(default_factory=dict, description="Shared context across all vertices")
     execution_history: List[str] = Field(default_factory=list, description="History of vertex execution order")
-    
+    checkpoints: Optional[CheckpointStore] = Field(
+        default=None, description="Persist a checkpoint after every successful vertex so `run` can resume a run id"
+    )
+    run_id: Optional[str] = Field(default=None, description="Id of the current or last checkpointed run")
+
+    _adjacency: Optional[Adjacency] = PrivateAttr(default=None)
+
     def add_vertex(self, vertex: Vertex):
         """Add a vertex to the graph"""
         self.vertices[vertex.id] = vertex
+        self._adjacency = None
         
         # If vertex has a GraphRole, set the shared context
         if isinstance(vertex.role, GraphRole):
@@ -116,14 +266,34 @@ class Graph(BaseModel):
             source_id: str,
             target_id: str,
             condition: Optional[Callable[[Any], bool]] = None,
-            metadata: Optional[Dict[str, Any]] = None
+            metadata: Optional[Dict[str, Any]] = None,
+            stream: bool = False
     ):
-        """Add an edge between two vertices with an optional condition"""
+        """Add an edge between two vertices with an optional condition, or a streaming edge, see `Edge.stream`"""
         if source_id not in self.vertices or target_id not in self.vertices:
             raise ValueError(f"Source vertex '{source_id}' or target vertex '{target_id}' not in graph")
+        if stream and (condition is not None or source_id == target_id):
+            # the target starts before the result a condition would test exists
+            raise ValueError(f"Streaming edge '{source_id}' -> '{target_id}' cannot have a condition or be a loop")
             
         edge_metadata = metadata or {}
-        self.edges.append(Edge(source=source_id, target=target_id, condition=condition, metadata=edge_metadata))
+        self.edges.append(Edge(
+            source=source_id, target=target_id, condition=condition, metadata=edge_metadata, stream=stream
+        ))
+        self._adjacency = None
+
+    def compile(self, keep: Optional[Callable[[Edge], bool]] = None) -> Adjacency:
+        """
+        The adjacency of the graph, built once and rebuilt after `add_vertex` / `add_edge`.
+        With `keep`, a view over only the edges it accepts, which is not cached.
+        """
+        if keep is not None:
+            return Adjacency(self.edges, self.vertices, keep)
+        adjacency = self._adjacency
+        # edges appended to `self.edges` directly bypass `add_edge`, the sizes catch that
+        if adjacency is None or len(adjacency.edges) != len(self.edges) or len(adjacency.outgoing) < len(self.vertices):
+            adjacency = self._adjacency = Adjacency(self.edges, self.vertices)
+        return adjacency
 
     def set_start_vertex(self, vertex_id: str):
         """Set the starting vertex for the workflow"""
@@ -137,13 +307,40 @@ class Graph(BaseModel):
         
     def get_outgoing_edges(self, vertex_id: str) -> List[Edge]:
         """Get all edges leaving from a vertex, or get adjacent edges start from that vertex"""
-        return [edge for edge in self.edges if edge.source == vertex_id]
+        return self.compile().outgoing_edges(vertex_id)
         
     def get_successor_vertices(self, vertex_id: str) -> List[Vertex]:
         """Get all successor vertices for a given vertex"""
         edges = self.get_outgoing_edges(vertex_id)
         return [self.vertices[edge.target] for edge in edges]
         
+    def fork(self) -> 'Graph':
+        """
+        A copy of the graph for one more concurrent run. Vertices carry their own state and an
+        isolated copy of their role (one per distinct role, see `Role.isolated`), so runs never see
+        each other's results or conversations; actions, llm nodes, edges and the compiled adjacency
+        are shared rather than rebuilt.
+        """
+        adjacency = self.compile()
+        roles: Dict[int, Role] = {}
+        vertices = {}
+        for vertex_id, vertex in self.vertices.items():
+            if id(vertex.role) not in roles:
+                roles[id(vertex.role)] = vertex.role.isolated()
+            vertices[vertex_id] = vertex.model_copy(update={
+                'role': roles[id(vertex.role)], 'state': VertexState.PENDING, 'result': None, 'error': None,
+                'execution_time': None, 'cache_hit': False,
+            })
+        graph = self.model_copy(update={
+            'vertices': vertices, 'edges': list(self.edges), 'shared_context': {}, 'execution_history': [],
+            'run_id': None,
+        })
+        graph._adjacency = adjacency
+        for vertex in vertices.values():
+            if isinstance(vertex.role, GraphRole):
+                vertex.role.set_graph_context(graph.shared_context)
+        return graph
+
     def reset(self):
         """Reset the graph to its initial state"""
         for vertex in self.vertices.values():
@@ -151,48 +348,61 @@ class Graph(BaseModel):
             vertex.result = None
             vertex.error = None
             vertex.execution_time = None
+            vertex.cache_hit = False
         self.execution_history = []
         
     @model_validator(mode='after')
     def validate_graph(self):
         """Validate that the graph is properly structured"""
-        # Check for cycles (simple validation)
-        visited = set()
-        
-        def has_cycle(vertex_id: str, path: Set[str]) -> bool:
-            if vertex_id in path:
-                return True
-            if vertex_id in visited:
-                return False
-                
-            visited.add(vertex_id)
-            path.add(vertex_id)
-            
-            for edge in self.get_outgoing_edges(vertex_id):
-                if has_cycle(edge.target, path):
-                    return True
-                    
-            path.remove(vertex_id)
-            return False
-            
-        if self.start_vertex_id and has_cycle(self.start_vertex_id, set()):
+        # Check for cycles, the adjacency is not cached yet while validating
+        if self.start_vertex_id and Adjacency(self.edges, self.vertices).back_edges([self.start_vertex_id]):
             lgr.warning("Graph contains cycles, which may cause infinite loops. Use 'max_steps' in the run method.")
             
         return self
 
-    async def run(self, max_steps: int = 10, *args, **kwargs):
+    @tracing.traced('graph.run', lambda self, *args, **kwargs: {'vertices': len(self.vertices)})
+    async def run(
+            self,
+            max_steps: int = 10,
+            *args,
+            start_vertex_id: Optional[str] = None,
+            adjacency: Optional[Adjacency] = None,
+            run_id: Optional[str] = None,
+            resume: bool = False,
+            **kwargs
+    ):
         """
         Execute the graph workflow starting from the start vertex.
+
+        A vertex whose only edge is a streaming one (see `Edge.stream`) runs together with the edge's
+        target, which gets a `ResultStream` of the vertex's result as `previous_result`.
+
+        With `checkpoints` set, every successful vertex is checkpointed under `run_id` (a new one by
+        default, see `self.run_id`), and `resume=True` continues that run after its last successful
+        vertex with the results, shared context and history it had, instead of starting over.
         
         Args:
             args: Positional arguments to pass to the first vertex
             max_steps: The maximum number of vertices/steps to execute to prevent infinite loops. Defaults to 10.
+            start_vertex_id: Start here instead of at the graph's start vertex
+            adjacency: Traverse this view of the edges, see `compile`, instead of all of them
+            run_id: Checkpoint under this id
+            resume: Continue the checkpointed run `run_id`
             kwargs: Keyword arguments to pass to all vertices
             
         Returns:
             A dictionary mapping vertex IDs to their results
         """
-        if not self.start_vertex_id:
+        checkpoint = None
+        if resume:
+            if self.checkpoints is None or run_id is None:
+                raise ValueError("Resuming needs a checkpoint store and a run id")
+            checkpoint = self.checkpoints.latest(run_id)
+            if checkpoint is None:
+                raise ValueError(f"No checkpoint of run '{run_id}' to resume")
+        self.run_id = run_id or (uuid.uuid4().hex if self.checkpoints is not None else None)
+
+        if not start_vertex_id and not self.start_vertex_id:
             if len(self.vertices) == 1:
                 self.start_vertex_id = next(iter(self.vertices.values())).id
             elif len(self.start_vertex_id) == 0:
@@ -203,76 +413,260 @@ class Graph(BaseModel):
         self.reset()
         self.shared_context.clear()
         
-        current_vertex_id: str = self.start_vertex_id
+        adjacency = adjacency or self.compile()
+        current_vertex_id: str = start_vertex_id or self.start_vertex_id
         # Initial input for the very first vertex, if provided
         initial_prompt: Optional[str] = kwargs.pop('prompt', None)
         last_vertex_result: Message = Message.from_any(initial_prompt) if initial_prompt else None
         results_map: dict = {}
+        if checkpoint is not None:
+            current_vertex_id, last_vertex_result = checkpoint.next_vertex_id, checkpoint.last_result
+            results_map.update(checkpoint.results_map)
+            self.shared_context.update(checkpoint.shared_context)
+            self.execution_history = list(checkpoint.execution_history)
+            for vertex_id, message in checkpoint.shared_context.items():
+                if vertex_id in self.vertices:
+                    self.vertices[vertex_id].state, self.vertices[vertex_id].result = VertexState.SUCCESS, message
+            lgr.info(f"Resuming run '{run_id}' after '{checkpoint.vertex_id}' at step {checkpoint.step}")
 
-        while current_vertex_id and len(self.execution_history) < max_steps:
-            current_vertex = self.vertices[current_vertex_id]
-            self.execution_history.append(current_vertex_id)
-            
-            # Prepare arguments for the vertex
+        # the current vertex when it was already started on the chunks of the previous one, see `Edge.stream`
+        started: Optional[asyncio.Future] = None
+        following: Optional[asyncio.Future] = None
+        try:
+            while current_vertex_id and (started is not None or len(self.execution_history) < max_steps):
+                current_vertex = self.vertices[current_vertex_id]
+                if started is None:
+                    self.execution_history.append(current_vertex_id)
+
+                    # Prepare arguments for the vertex
+                    vertex_kwargs = kwargs.copy()
+                    if last_vertex_result is not None:
+                        # Pass the Message object directly as previous_result
+                        vertex_kwargs['previous_result'] = last_vertex_result
+                    if len(self.execution_history) == 1 and initial_prompt:  # Only for the first vertex receive user prompt
+                        vertex_kwargs['prompt'] = initial_prompt
+
+                    next_vertex_id = adjacency.streaming.get(current_vertex_id)
+                    # the target only enters the history once it is awaited, after the source's checkpoint
+                    if next_vertex_id is not None and len(self.execution_history) < max_steps:
+                        stream = vertex_kwargs['result_stream'] = ResultStream()
+                        following = asyncio.ensure_future(
+                            self.vertices[next_vertex_id].run(*args, **{**kwargs, 'previous_result': stream})
+                        )
+
+                    vertex_result = await current_vertex.run(*args, **vertex_kwargs)
+                else:
+                    self.execution_history.append(current_vertex_id)
+                    vertex_result = await started
+                started, following = following, None
+                results_map[current_vertex_id] = vertex_result
+
+                # If vertex failed, store the exception and stop
+                if not current_vertex.is_successful:
+                    results_map[current_vertex_id] = current_vertex.result
+                    lgr.error(f"Stopping graph execution due to failure in vertex '{current_vertex.id}'.")
+                    break
+
+                last_vertex_result = self._record(current_vertex_id, vertex_result, results_map)
+
+                # Find the next vertex to execute based on conditions
+                next_vertex_id = None
+                outgoing_edges = adjacency.outgoing_edges(current_vertex_id)
+
+                if not outgoing_edges:
+                    lgr.debug(f"Vertex '{current_vertex_id}' is a terminal vertex. Halting execution.")
+                # If there's only one unconditional edge, take it
+                elif current_vertex_id in adjacency.direct:
+                    next_vertex_id = adjacency.direct[current_vertex_id]
+                else:
+                    # Otherwise, evaluate conditions
+                    for edge in outgoing_edges:
+                        if edge.matches(vertex_result):
+                            next_vertex_id = edge.target
+                            lgr.debug(f"Condition for edge '{current_vertex_id}' -> '{next_vertex_id}' met.")
+                            break  # Take the first matching edge
+
+                if self.checkpoints is not None:
+                    self.checkpoints.save(Checkpoint(
+                        run_id=self.run_id, step=len(self.execution_history), vertex_id=current_vertex_id,
+                        next_vertex_id=next_vertex_id, last_result=vertex_result, results_map=results_map,
+                        shared_context=self.shared_context, execution_history=self.execution_history,
+                    ))
+                current_vertex_id = next_vertex_id
+                last_vertex_result = vertex_result
+        finally:
+            # a vertex started on the chunks of one that failed, or of a cancelled run, does not outlive it
+            for task in (started, following):
+                if task is not None and not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+
+        return results_map
+        
+    def _record(self, vertex_id: str, vertex_result: Any, results_map: dict) -> Message:
+        """Store a successful vertex result as content in `results_map` and as a Message in the shared context"""
+        # Store the result, ensuring it's a Message object for consistency
+        if isinstance(vertex_result, Message):
+            message = vertex_result
+        else:
+            # If the result is not already a Message, convert it
+            message = Message.from_any(vertex_result, role=RoleType.ASSISTANT)
+        results_map[vertex_id] = message.content  # Store content for results_map
+        self.shared_context[vertex_id] = message
+        return message
+
+    @tracing.traced('graph.run_dag', lambda self, *args, **kwargs: {'vertices': len(self.vertices)})
+    async def run_dag(
+            self,
+            max_steps: int = 10,
+            max_concurrency: Optional[int] = None,
+            *args,
+            adjacency: Optional[Adjacency] = None,
+            **kwargs
+    ):
+        """
+        Execute the graph concurrently in topological order.
+
+        A vertex runs as soon as every incoming edge is settled and at least one of them was taken,
+        so independent branches overlap. When a vertex finishes, all of its unconditional edges are
+        taken plus the first conditional edge that matches, as in `run`; the others are not, and a
+        vertex none of whose incoming edges are taken is skipped along with what only it feeds.
+        A vertex reached by several taken edges (a join) receives `previous_result` as a dict of
+        upstream vertex id -> Message, otherwise the single upstream Message.
+
+        Edges closing a cycle re-run their target, bounded by `max_steps` in total vertex runs.
+        Streaming edges are followed like any other once their source is done, see `run` for streaming.
+
+        Args:
+            max_steps: The maximum number of vertex runs, guards cycles. Defaults to 10.
+            max_concurrency: At most this many vertices run at once, unbounded by default.
+            adjacency: Traverse this view of the edges, see `compile`, instead of all of them
+            args: Positional arguments to pass to the vertices
+            kwargs: Keyword arguments to pass to all vertices, `prompt` only to the start vertices
+
+        Returns:
+            A dictionary mapping vertex IDs to their results
+        """
+        adjacency = adjacency or self.compile()
+        if self.start_vertex_id:
+            roots = [self.start_vertex_id]
+        else:
+            roots = adjacency.roots()
+            if not roots:
+                raise ValueError("Start vertex not set and every vertex has an incoming edge")
+
+        self.reset()
+        self.shared_context.clear()
+
+        initial_prompt: Optional[str] = kwargs.pop('prompt', None)
+        back = adjacency.back_edges(roots)
+        incoming: Dict[str, List[int]] = {
+            vertex_id: [position for position in positions if position not in back]
+            for vertex_id, positions in adjacency.incoming.items()
+        }
+        # edge position -> upstream Message when taken, None when settled as not taken
+        settled: Dict[int, Optional[Message]] = {}
+        results_map: dict = {}
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        running: Dict[asyncio.Task, str] = {}
+        ready: List[Tuple[str, Any]] = [(root, None) for root in roots]
+        failed = False
+
+        async def execute(vertex_id: str, previous_result: Any):
             vertex_kwargs = kwargs.copy()
-            if last_vertex_result is not None:
-                # Pass the Message object directly as previous_result
-                vertex_kwargs['previous_result'] = last_vertex_result
-            if len(self.execution_history) == 1 and initial_prompt:  # Only for the first vertex receive user prompt
+            if previous_result is not None:
+                vertex_kwargs['previous_result'] = previous_result
+            elif initial_prompt:
+                vertex_kwargs['previous_result'] = Message.from_any(initial_prompt)
                 vertex_kwargs['prompt'] = initial_prompt
-            
-            vertex_result = await current_vertex.run(*args, **vertex_kwargs)
-            results_map[current_vertex_id] = vertex_result
-            
-            # If vertex failed, store the exception and stop
-            if not current_vertex.is_successful:
-                results_map[current_vertex_id] = current_vertex.result
-                lgr.error(f"Stopping graph execution due to failure in vertex '{current_vertex.id}'.")
-                break
-                
-            # Store the result, ensuring it's a Message object for consistency
-            if isinstance(vertex_result, Message):
-                results_map[current_vertex_id] = vertex_result.content  # Store content for results_map
-                last_vertex_result = vertex_result
-            else:
-                # If the result is not already a Message, convert it
-                converted_result_message = Message.from_any(vertex_result, role=RoleType.ASSISTANT)
-                results_map[current_vertex_id] = converted_result_message.content
-                last_vertex_result = converted_result_message
-            
-            # Update shared context
-            self.shared_context[current_vertex_id] = last_vertex_result
+            if semaphore is None:
+                return await self.vertices[vertex_id].run(*args, **vertex_kwargs)
+            async with semaphore:
+                return await self.vertices[vertex_id].run(*args, **vertex_kwargs)
 
-            # Find the next vertex to execute based on conditions
-            next_vertex_id = None
-            outgoing_edges = self.get_outgoing_edges(current_vertex_id)
-            
-            if not outgoing_edges:
-                lgr.debug(f"Vertex '{current_vertex_id}' is a terminal vertex. Halting execution.")
-                break
-            
-            # If there's only one unconditional edge, take it
-            if len(outgoing_edges) == 1 and outgoing_edges[0].condition is None:
-                next_vertex_id = outgoing_edges[0].target
-            else:
-                # Otherwise, evaluate conditions
-                for edge in outgoing_edges:
-                    if edge.matches(vertex_result):
-                        next_vertex_id = edge.target
-                        lgr.debug(f"Condition for edge '{current_vertex_id}' -> '{next_vertex_id}' met.")
-                        break  # Take the first matching edge
-            
-            current_vertex_id = next_vertex_id
-            last_vertex_result = vertex_result
+        def settle(vertex_id: str, taken: Set[int], message: Optional[Message]):
+            """Settle the outgoing edges of `vertex_id` and collect the successors that became runnable"""
+            for position in adjacency.outgoing.get(vertex_id, []):
+                edge = self.edges[position]
+                if position in back:
+                    if position in taken:
+                        ready.append((edge.target, message))
+                    continue
+                settled[position] = message if position in taken else None
+                edges = incoming[edge.target]
+                if all(p in settled for p in edges):
+                    upstream = {self.edges[p].source: settled[p] for p in edges if settled[p] is not None}
+                    for p in edges:
+                        del settled[p]
+                    if not upstream:
+                        self.vertices[edge.target].state = VertexState.SKIPPED
+                        settle(edge.target, set(), None)
+                    else:
+                        ready.append((edge.target, upstream.popitem()[1] if len(upstream) == 1 else upstream))
+
+        try:
+            while ready or running:
+                while ready and not failed and len(self.execution_history) < max_steps:
+                    vertex_id, previous_result = ready.pop(0)
+                    self.execution_history.append(vertex_id)
+                    running[asyncio.ensure_future(execute(vertex_id, previous_result))] = vertex_id
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    vertex_id = running.pop(task)
+                    vertex = self.vertices[vertex_id]
+                    vertex_result = task.result()
+                    if not vertex.is_successful:
+                        results_map[vertex_id] = vertex.result
+                        lgr.error(f"Stopping graph execution due to failure in vertex '{vertex_id}'.")
+                        failed = True
+                        continue
+                    message = self._record(vertex_id, vertex_result, results_map)
+                    taken, branched = set(), False
+                    for position in adjacency.outgoing.get(vertex_id, []):
+                        edge = self.edges[position]
+                        if edge.condition is None:
+                            taken.add(position)
+                        elif not branched and edge.matches(vertex_result):
+                            taken.add(position)
+                            branched = True
+                    settle(vertex_id, taken, message)
+        finally:
+            # also reached when the caller itself is cancelled, nothing is left running behind it
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            for task, vertex_id in running.items():
+                if task.cancelled():
+                    self._cancel(self.vertices[vertex_id], 'graph run cancelled')
 
         return results_map
-        
-    async def run_parallel(self, vertex_ids: List[str], *args, **kwargs) -> Dict[str, Any]:
+
+    async def run_parallel(
+            self,
+            vertex_ids: List[str],
+            *args,
+            max_concurrency: Optional[int] = None,
+            timeout: Optional[float] = None,
+            deadline: Optional[float] = None,
+            fail_fast: bool = False,
+            **kwargs
+    ) -> Dict[str, Any]:
         """
         Execute multiple vertices in parallel and return their results.
+
+        A vertex that runs out of time fails with a TimeoutError like any other failure. The
+        deadline also reaches the llm calls of the vertices, which are cut to the time left.
+        Vertices that are cancelled, by `fail_fast` or because the deadline passed before they
+        got to start, are left CANCELLED with a CancelledError as their result.
         
         Args:
             vertex_ids: List of vertex IDs to execute in parallel
+            max_concurrency: At most this many vertices run at once, unbounded by default
+            timeout: Seconds each vertex may take, overriding `Vertex.timeout`
+            deadline: Seconds the whole call may take
+            fail_fast: Cancel the vertices still running or waiting as soon as one fails
             args: Positional arguments to pass to all vertices
             kwargs: Keyword arguments to pass to all vertices
             
@@ -283,13 +677,53 @@ class Graph(BaseModel):
         invalid_vertices = [vertex_id for vertex_id in vertex_ids if vertex_id not in self.vertices]
         if invalid_vertices:
             raise ValueError(f"Invalid vertex IDs: {invalid_vertices}")
-            
-        # Execute vertices in parallel
-        tasks = [self.vertices[vertex_id].run(*args, **kwargs) for vertex_id in vertex_ids]
-        await asyncio.gather(*tasks)
+
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def execute(vertex: Vertex):
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                if deadlines.remaining() == 0.0:
+                    self._cancel(vertex, 'the run deadline passed before it started')
+                    return vertex.result
+                return await vertex.run(*args, timeout=timeout, **kwargs)
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+
+        # tasks are created inside the scope and so inherit the deadline
+        with deadlines.scope(deadline):
+            running = {asyncio.ensure_future(execute(self.vertices[vertex_id])): vertex_id for vertex_id in vertex_ids}
+        pending = set(running)
+        reason = 'the parallel run was cancelled'
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = [running[task] for task in done if not self.vertices[running[task]].is_successful]
+                if fail_fast and failed and pending:
+                    reason = f"vertex '{failed[0]}' failed"
+                    lgr.error(f"Vertex '{failed[0]}' failed, cancelling {len(pending)} parallel vertices")
+                    break
+        finally:
+            # also reached when the caller itself is cancelled, nothing is left running behind it
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in pending:
+                if task.cancelled():
+                    self._cancel(self.vertices[running[task]], reason)
         
         # Collect results
         return {vertex_id: self.vertices[vertex_id].result for vertex_id in vertex_ids}
+
+    @staticmethod
+    def _cancel(vertex: Vertex, reason: str):
+        """Record `vertex` as cancelled, unless it got to finish"""
+        if vertex.state in (VertexState.SUCCESS, VertexState.FAILED):
+            return
+        vertex.state = VertexState.CANCELLED
+        vertex.error = vertex.result = asyncio.CancelledError(reason)
         
     def get_execution_stats(self) -> Dict[str, Any]:
         """Get statistics about the graph execution"""
@@ -297,12 +731,17 @@ class Graph(BaseModel):
         executed_vertices = [vertex for vertex in self.vertices.values() if vertex.state != VertexState.PENDING]
         success_vertices = [vertex for vertex in executed_vertices if vertex.state == VertexState.SUCCESS]
         failed_vertices = [vertex for vertex in executed_vertices if vertex.state == VertexState.FAILED]
+        cancelled_vertices = [vertex.id for vertex in executed_vertices if vertex.state == VertexState.CANCELLED]
+        cached_vertices = [vertex.id for vertex in executed_vertices if vertex.cache_hit]
         
         return {
             "total_execution_time": total_time,
             "executed_vertex_count": len(executed_vertices),
             "success_vertex_count": len(success_vertices),
             "failed_vertex_count": len(failed_vertices),
+            "cancelled_vertices": cancelled_vertices,
+            "cache_hit_count": len(cached_vertices),
+            "cache_hits": cached_vertices,
             "execution_history": self.execution_history,
             "average_vertex_time": total_time / len(executed_vertices) if executed_vertices else 0
         }
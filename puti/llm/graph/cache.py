@@ -0,0 +1,180 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 19:30
+@Description:  Opt-in memoization of vertex results keyed on the vertex, its action config and its inputs
+"""
+from __future__ import annotations
+
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+
+from abc import ABC, abstractmethod
+from enum import Enum
+from pathlib import Path, PurePath
+from typing import Any, Dict, Optional, Tuple, Union, TYPE_CHECKING
+from pydantic import BaseModel, Field, ConfigDict
+from puti.llm.messages import Message
+from puti.constant.base import Pathh
+from puti.logs import logger_factory
+
+if TYPE_CHECKING:
+    from puti.llm.graph import Vertex
+
+lgr = logger_factory.llm
+
+
+def _stable(value: Any) -> Any:
+    """
+    A JSON-able stand-in for `value` that stays the same across runs and processes, for hashing.
+    Raises TypeError for values without one, e.g. objects whose only text form is their default repr.
+    """
+    if isinstance(value, Message):
+        return value.content
+    if isinstance(value, dict):
+        return {str(k): _stable(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple, set)):
+        return [_stable(v) for v in value]
+    if isinstance(value, BaseModel):
+        return {'type': type(value).__qualname__, **_stable(dict(value))}
+    if callable(value):
+        return f'{getattr(value, "__module__", "")}.{getattr(value, "__qualname__", type(value).__qualname__)}'
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Enum):
+        return f'{type(value).__qualname__}.{value.name}'
+    if isinstance(value, PurePath):
+        return str(value)
+    # the default repr holds a memory address, a key built on it would never match in another process
+    raise TypeError(f'{type(value).__qualname__} has no stable cache key encoding')
+
+
+def _digest(value: Any) -> str:
+    return hashlib.blake2b(json.dumps(_stable(value), ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResultStore(ABC):
+    """ Where cached vertex results live, as (stored at, result) by key """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, result: Any):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+
+class MemoryResultStore(ResultStore):
+    """ Results kept for the life of the process, shared by every graph using this store """
+
+    def __init__(self):
+        self._results: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            return self._results.get(key)
+
+    def set(self, key: str, result: Any):
+        with self._lock:
+            self._results[key] = (time.time(), result)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._results.pop(key, None)
+
+
+class SqliteResultStore(ResultStore):
+    """ Pickled results in a SQLite table, so they survive restarts and are shared between workers """
+
+    def __init__(self, path: Union[str, Path, None] = None):
+        self.path = Path(path or Pathh.GRAPH_DB.val)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS vertex_cache (key TEXT PRIMARY KEY, stored_at REAL, result BLOB)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if getattr(self._local, 'conn', None) is None:
+            self._local.conn = sqlite3.connect(str(self.path), timeout=30)
+        return self._local.conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        row = self._connect().execute(
+            'SELECT stored_at, result FROM vertex_cache WHERE key = ?', (key,)
+        ).fetchone()
+        return (row[0], pickle.loads(row[1])) if row else None
+
+    def set(self, key: str, result: Any):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO vertex_cache (key, stored_at, result) VALUES (?, ?, ?)',
+                (key, time.time(), pickle.dumps(result)),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM vertex_cache WHERE key = ?', (key,))
+
+
+class CachePolicy(BaseModel):
+    """
+    Set on a vertex whose action is pure with respect to its inputs. A run with the same vertex id,
+    action config, rendered prompt, previous result and other run kwargs within `ttl` returns the stored result
+    without running the action; failures are never stored. A run with an input that cannot be keyed the
+    same way in every process (see `_stable`) is not cached.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    ttl: Optional[float] = Field(default=None, description='Seconds a result stays valid, forever when unset')
+    store: ResultStore = Field(default_factory=MemoryResultStore)
+
+    def key(self, vertex: 'Vertex', kwargs: Dict[str, Any]) -> Optional[str]:
+        """ The cache key of running `vertex` with `kwargs`, None when an input has no stable encoding """
+        action = vertex.action
+        # fields excluded from serialization are runtime state, not config
+        config = {'type': f'{type(action).__module__}.{type(action).__qualname__}', **{
+            name: getattr(action, name) for name, field in type(action).model_fields.items()
+            if name != 'prompt' and not field.exclude
+        }}
+        # any other run kwarg (e.g. a `topic`) may change what the action does, so it is an input too
+        others = {name: value for name, value in kwargs.items() if name not in ('prompt', 'previous_result')}
+        try:
+            return ':'.join([
+                vertex.id,
+                _digest(config),
+                _digest([action.render_prompt(**kwargs), kwargs.get('previous_result'), others]),
+            ])
+        except TypeError as e:
+            lgr.debug(f"Vertex '{vertex.id}' not cached: {e}")
+            return None
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        try:
+            found = self.store.get(key)
+            if found is None:
+                return False, None
+            stored_at, result = found
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                self.store.delete(key)
+                return False, None
+        except Exception as e:
+            lgr.warning(f'Vertex cache lookup failed, running the action: {e}')
+            return False, None
+        return True, result
+
+    def save(self, key: str, result: Any):
+        try:
+            self.store.set(key, result)
+        except Exception as e:
+            lgr.warning(f'Vertex result not cached: {e}')
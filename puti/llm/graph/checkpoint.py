@@ -0,0 +1,98 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 20:00
+@Description:  Durable per-vertex checkpoints of graph runs, so a failed run resumes instead of starting over
+"""
+import json
+import time
+import pickle
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field, ConfigDict
+from puti.constant.base import Pathh
+from puti.logs import logger_factory
+
+lgr = logger_factory.llm
+
+
+class Checkpoint(BaseModel):
+    """ Where a graph run stood after its last successful vertex """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    run_id: str
+    step: int = Field(..., description='Vertices executed so far, the position in the execution history')
+    vertex_id: str = Field(..., description='The vertex that just succeeded')
+    next_vertex_id: Optional[str] = Field(default=None, description='Where the run continues, None once it is done')
+    last_result: Any = Field(default=None, description='Result handed to the next vertex as previous_result')
+    results_map: Dict[str, Any] = Field(default_factory=dict)
+    shared_context: Dict[str, Any] = Field(default_factory=dict)
+    execution_history: List[str] = Field(default_factory=list)
+    created_at: float = Field(default_factory=time.time)
+
+
+class CheckpointStore:
+    """ Checkpoints by run id in a SQLite table; only the latest one of a run is needed to resume it """
+
+    def __init__(self, path: Union[str, Path, None] = None):
+        self.path = Path(path or Pathh.GRAPH_DB.val)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS graph_checkpoints ('
+                'run_id TEXT, step INTEGER, vertex_id TEXT, next_vertex_id TEXT, '
+                'execution_history TEXT, state BLOB, created_at REAL, PRIMARY KEY (run_id, step))'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if getattr(self._local, 'conn', None) is None:
+            self._local.conn = sqlite3.connect(str(self.path), timeout=30)
+        return self._local.conn
+
+    def save(self, checkpoint: Checkpoint) -> bool:
+        """ Persist `checkpoint`, False when its results cannot be pickled and the run goes on without it """
+        try:
+            state = pickle.dumps({
+                'last_result': checkpoint.last_result,
+                'results_map': checkpoint.results_map,
+                'shared_context': checkpoint.shared_context,
+            })
+        except Exception as e:
+            lgr.warning(f"Run '{checkpoint.run_id}' not checkpointed after '{checkpoint.vertex_id}': {e}")
+            return False
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO graph_checkpoints VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (checkpoint.run_id, checkpoint.step, checkpoint.vertex_id, checkpoint.next_vertex_id,
+                 json.dumps(checkpoint.execution_history), state, checkpoint.created_at),
+            )
+        return True
+
+    def latest(self, run_id: str) -> Optional[Checkpoint]:
+        row = self._connect().execute(
+            'SELECT step, vertex_id, next_vertex_id, execution_history, state, created_at FROM graph_checkpoints '
+            'WHERE run_id = ? ORDER BY step DESC LIMIT 1', (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        step, vertex_id, next_vertex_id, history, state, created_at = row
+        return Checkpoint(
+            run_id=run_id, step=step, vertex_id=vertex_id, next_vertex_id=next_vertex_id,
+            execution_history=json.loads(history), created_at=created_at, **pickle.loads(state),
+        )
+
+    def delete(self, run_id: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM graph_checkpoints WHERE run_id = ?', (run_id,))
+
+    def prune(self, older_than: float):
+        """ Drop the checkpoints of runs last checkpointed more than `older_than` seconds ago """
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM graph_checkpoints WHERE run_id IN ('
+                'SELECT run_id FROM graph_checkpoints GROUP BY run_id HAVING MAX(created_at) < ?)',
+                (time.time() - older_than,),
+            )
@@ -0,0 +1,279 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 22:30
+@Description:  Declarative (JSON / YAML) workflows compiled once into immutable plans, cached by file hash and mtime
+
+    name: generate_tweet
+    start: generate_tweet
+    checkpoints: true
+    roles:
+      poster: {type: ethan}
+    vertices:
+      generate_tweet: {action: generate_tweet, timeout: 200}
+      post_tweet: {action: publish_tweet, role: poster, timeout: 200}
+    edges:
+      - {source: generate_tweet, target: post_tweet}
+
+Actions, roles and edge conditions are referenced by registered name (see `register_action`,
+`register_role`, `register_condition`) or by dotted path, e.g. `puti.llm.actions.x_bot.PublishTweetAction`.
+"""
+from __future__ import annotations
+
+import json
+import hashlib
+import threading
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type, Union
+from jinja2 import Template
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, ValidationError
+from puti.llm.actions import Action
+from puti.llm.roles import Role
+from puti.llm.graph import Graph, Vertex
+from puti.llm.graph.cache import CachePolicy, MemoryResultStore, SqliteResultStore
+from puti.llm.graph.checkpoint import CheckpointStore
+from puti.utils.common import import_class
+from puti.logs import logger_factory
+
+lgr = logger_factory.llm
+
+WORKFLOW_DIR = Path(__file__).resolve().parents[2] / 'conf' / 'workflows'
+
+# name -> class, or the dotted path of one so built-ins are only imported when a plan uses them
+_ACTIONS: Dict[str, Union[Type[Action], str]] = {
+    'action': Action,
+    'generate_tweet': 'puti.llm.actions.x_bot.GenerateTweetAction',
+    'publish_tweet': 'puti.llm.actions.x_bot.PublishTweetAction',
+    'reply_to_recent_unreplied_tweets': 'puti.llm.actions.x_bot.ReplyToRecentUnrepliedTweetsAction',
+    'context_aware_reply': 'puti.llm.actions.x_bot.ContextAwareReplyAction',
+    'get_unreplied_mentions': 'puti.llm.actions.x_bot.GetUnrepliedMentionsAction',
+}
+# name -> Role subclass or factory returning a role
+_ROLES: Dict[str, Union[Callable[..., Role], str]] = {
+    'role': Role,
+    'alex': 'puti.llm.roles.agents.Alex',
+    'ethan': 'puti.llm.roles.agents.Ethan',
+    'ethan_graph': 'puti.llm.roles.agents.EthanG',
+    'cz': 'puti.llm.roles.agents.CZ',
+    'debater': 'puti.llm.roles.agents.Debater',
+    'twit_whiz': 'puti.llm.roles.x_bot.TwitWhiz',
+}
+# name -> predicate over the source vertex's result content
+_CONDITIONS: Dict[str, Union[Callable[[Any], bool], str]] = {}
+
+
+def _register(registry: Dict[str, Any], name: str, obj: Any):
+    if obj is None:
+        def decorator(target):
+            registry[name] = target
+            return target
+        return decorator
+    registry[name] = obj
+    return obj
+
+
+def register_action(name: str, action: Union[Type[Action], str, None] = None):
+    """ Make an Action subclass available to workflow files as `action: <name>`, usable as a class decorator """
+    return _register(_ACTIONS, name, action)
+
+
+def register_role(name: str, role: Union[Callable[..., Role], str, None] = None):
+    """ Make a Role subclass, or a factory returning a role, available as `type: <name>` in workflow files """
+    return _register(_ROLES, name, role)
+
+
+def register_condition(name: str, condition: Union[Callable[[Any], bool], str, None] = None):
+    """ Make an edge predicate available as `condition: <name>` in workflow files """
+    return _register(_CONDITIONS, name, condition)
+
+
+def _resolve(registry: Dict[str, Any], kind: str, name: str) -> Any:
+    target = registry.get(name, name)
+    if isinstance(target, str):
+        module_name, _, attr = target.rpartition('.')
+        if not module_name:
+            raise ValueError(f"Unknown {kind} '{name}', register it or use a dotted path")
+        try:
+            target = import_class(attr, module_name)
+        except (ImportError, AttributeError) as e:
+            raise ValueError(f"Cannot import {kind} '{name}' from '{target}': {e}") from e
+        if name in registry:
+            registry[name] = target
+    return target
+
+
+class RoleSpec(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    type: str = Field(..., description='Registered role name or dotted path of a Role subclass')
+    args: Dict[str, Any] = Field(default_factory=dict, description='Keyword arguments of the role')
+
+
+class CacheSpec(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    ttl: Optional[float] = Field(default=None, description='Seconds a result stays valid, forever when unset')
+    store: str = Field(default='memory', description="'memory', 'sqlite' or the path of a sqlite file")
+
+
+class VertexSpec(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    action: str = Field(..., description='Registered action name or dotted path of an Action subclass')
+    args: Dict[str, Any] = Field(default_factory=dict, description='Keyword arguments of the action')
+    role: Optional[str] = Field(default=None, description='A role declared under `roles`, or a registered role')
+    timeout: Optional[float] = None
+    cache: Union[bool, CacheSpec] = False
+
+
+class EdgeSpec(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    source: str
+    target: str
+    condition: Optional[str] = Field(default=None, description='Registered condition name or dotted path')
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    stream: bool = Field(default=False, description="Start the target on the source's chunks, see `Edge.stream`")
+
+
+class WorkflowSpec(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    name: str = ''
+    start: Optional[str] = Field(default=None, description='Start vertex, the first declared one when unset')
+    checkpoints: Union[bool, str] = Field(default=False, description='Checkpoint runs, optionally to this sqlite file')
+    roles: Dict[str, RoleSpec] = Field(default_factory=dict)
+    vertices: Dict[str, VertexSpec] = Field(..., min_length=1)
+    edges: List[EdgeSpec] = Field(default_factory=list)
+
+
+class WorkflowPlan(BaseModel):
+    """
+    A compiled workflow. Actions, roles, conditions and cache stores are resolved and the graph is
+    validated once, at compile time; `graph()` then hands out forks of that template, which copies
+    vertex state without validating anything, so a run costs the same however the plan was loaded.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    digest: str = Field(..., description='Hash of the spec the plan was compiled from')
+    source: Optional[str] = Field(default=None, description='File the spec was loaded from')
+    start: str
+    vertices: Tuple[str, ...]
+    edges: Tuple[Tuple[str, str], ...]
+
+    _template: Graph = PrivateAttr()
+
+    def graph(self) -> Graph:
+        """ A fresh graph to run, see `Graph.fork` for what it shares with other runs of the plan """
+        return self._template.fork()
+
+
+def _build_vertex(vertex_id: str, spec: VertexSpec, roles: Dict[str, Role]) -> Vertex:
+    action_cls = _resolve(_ACTIONS, 'action', spec.action)
+    args = dict(spec.args)
+    if action_cls.model_fields['name'].is_required():
+        args.setdefault('name', vertex_id)
+    if isinstance(args.get('prompt'), str):
+        # plain text renders unchanged, `{{ previous_result }}` and run kwargs get substituted
+        args['prompt'] = Template(args['prompt'])
+    fields: Dict[str, Any] = {'id': vertex_id, 'action': action_cls(**args), 'timeout': spec.timeout}
+    if spec.role is not None:
+        if spec.role not in roles:
+            roles[spec.role] = _resolve(_ROLES, 'role', spec.role)()
+        fields['role'] = roles[spec.role]
+    if spec.cache:
+        cache = spec.cache if isinstance(spec.cache, CacheSpec) else CacheSpec()
+        if cache.store == 'memory':
+            store = MemoryResultStore()
+        else:
+            store = SqliteResultStore(None if cache.store == 'sqlite' else cache.store)
+        fields['cache'] = CachePolicy(ttl=cache.ttl, store=store)
+    return Vertex(**fields)
+
+
+def compile_plan(spec: Union[Dict[str, Any], WorkflowSpec], source: Optional[str] = None) -> WorkflowPlan:
+    """ Validate a workflow spec and build the graph every run of the resulting plan is forked from """
+    if not isinstance(spec, WorkflowSpec):
+        try:
+            spec = WorkflowSpec.model_validate(spec)
+        except ValidationError as e:
+            raise ValueError(f'Invalid workflow{f" {source}" if source else ""}: {e}') from e
+
+    roles = {role_id: _resolve(_ROLES, 'role', role.type)(**role.args) for role_id, role in spec.roles.items()}
+    checkpoints = None
+    if spec.checkpoints:
+        checkpoints = CheckpointStore() if spec.checkpoints is True else CheckpointStore(spec.checkpoints)
+
+    graph = Graph(checkpoints=checkpoints)
+    graph.add_vertices(*(_build_vertex(vertex_id, vertex, roles) for vertex_id, vertex in spec.vertices.items()))
+    for edge in spec.edges:
+        condition = _resolve(_CONDITIONS, 'condition', edge.condition) if edge.condition else None
+        graph.add_edge(edge.source, edge.target, condition=condition, metadata=edge.metadata, stream=edge.stream)
+    start = spec.start or next(iter(spec.vertices))
+    graph.set_start_vertex(start)
+    graph.compile()
+
+    plan = WorkflowPlan(
+        name=spec.name or (Path(source).stem if source else ''),
+        digest=hashlib.blake2b(spec.model_dump_json().encode('utf-8'), digest_size=16).hexdigest(),
+        source=source,
+        start=start,
+        vertices=tuple(spec.vertices),
+        edges=tuple((edge.source, edge.target) for edge in spec.edges),
+    )
+    plan._template = graph
+    return plan
+
+
+class _Cached(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+    plan: WorkflowPlan
+
+
+_plans: Dict[str, _Cached] = {}
+_plans_lock = threading.Lock()
+
+
+def _parse(path: Path, data: bytes) -> Dict[str, Any]:
+    try:
+        if path.suffix in ('.yaml', '.yml'):
+            import yaml
+            return yaml.safe_load(data)
+        return json.loads(data)
+    except Exception as e:
+        # yaml errors do not derive from ValueError
+        raise ValueError(f'Cannot parse workflow {path}: {e}') from e
+
+
+def load_plan(path: Union[str, Path]) -> WorkflowPlan:
+    """
+    The compiled plan of a workflow file. Unchanged files (same mtime and size) are served from the
+    cache without being read; touched files are re-read and only recompiled when their content hash
+    changed, so a long lived worker picks up edits but never rebuilds a plan it already has.
+    """
+    path = Path(path).resolve()
+    key = str(path)
+    stat = path.stat()
+    with _plans_lock:
+        cached = _plans.get(key)
+        if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached.plan
+
+        data = path.read_bytes()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if cached and cached.digest == digest:
+            plan = cached.plan
+        else:
+            plan = compile_plan(_parse(path, data), source=key)
+            lgr.debug(f'Compiled workflow plan {plan.name} from {key}')
+        _plans[key] = _Cached(stat.st_mtime_ns, stat.st_size, digest, plan)
+        return plan
+
+
+def clear_plans():
+    """ Forget every cached plan """
+    with _plans_lock:
+        _plans.clear()
@@ -4,11 +4,11 @@
 @Description:  
 """
 import asyncio
-import threading
+import time
+import weakref
 
-from pydantic import BaseModel, Field, ConfigDict, field_validator
-from typing import Optional, List, Iterable, Any
-import faiss
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
+from typing import Optional, List, Iterable, Any, Dict, Union, Tuple
 import numpy as np
 
 from pathlib import Path
@@ -16,7 +16,16 @@ from puti.llm.messages import Message, AssistantMessage, UserMessage
 from puti.llm.nodes import LLMNode, OpenAINode
 from puti.constant.llm import RoleType
 from puti.constant.base import Pathh
-from puti.utils.files import save_texts_to_file, load_texts_from_file
+from puti.db.ann import AnnConfig
+from puti.db.retention import RetentionConfig
+from puti.db.text_store import TextMeta
+from puti.db.memory_shard import (
+    MemoryShard, Metric, DEFAULT_NAMESPACE, namespace_dir, acquire_shard, release_shard, migrate_legacy_store
+)
+from puti.utils import tracing
+from puti.logs import logger_factory
+
+lgr = logger_factory.llm
 
 
 class Memory(BaseModel):
@@ -25,12 +34,32 @@ class Memory(BaseModel):
     # Short-term memory for exact conversation history
     storage: List[Message] = Field(default_factory=list)
 
-    # Long-term memory using Faiss
+    # Long-term memory using Faiss, sharded per namespace
     llm: Optional[LLMNode] = Field(default_factory=OpenAINode, exclude=True)
     top_k: int = 3
-    index: Optional[faiss.Index] = Field(None, exclude=True, validate_default=True)
-    texts: List[str] = Field(default_factory=list, exclude=True)
-    _embedding_dim: Optional[int] = None
+    metric: Metric = Field(default='cosine', description='Similarity of new shards, existing ones keep theirs')
+    min_score: float = Field(default=0.75, description='Results less similar than this are irrelevant')
+    max_score: float = Field(default=1 - 5e-6, description='Results at least this similar are the query itself')
+    overfetch: int = Field(default=2, description='Candidates fetched per wanted result, so filtering still leaves top_k')
+    namespace: Optional[str] = Field(
+        default=None,
+        description='Long-term memory namespace, e.g. a role name or `tenant/role/session`. Unset means `default`'
+    )
+    shared_namespaces: List[str] = Field(
+        default_factory=list,
+        description='Searched along with the own namespace when `search` is given none, e.g. `default` for roles'
+    )
+    data_dir: Path = Field(default_factory=lambda: Path(Pathh.MEMORY_DIR.val), exclude=True, description='Root of the namespace shards')
+    checkpoint_every: int = Field(default=1000, description='Checkpoint once this many records are pending in the WAL')
+    checkpoint_interval: float = Field(default=300, description='Checkpoint pending WAL records older than this many seconds')
+    wal_fsync: bool = Field(default=True, description='fsync the WAL after every append')
+    ann: AnnConfig = Field(default_factory=AnnConfig, exclude=True, description='Index kinds and promotion thresholds')
+    retention: RetentionConfig = Field(
+        default_factory=RetentionConfig,
+        exclude=True,
+        description='Capacity, age and near-duplicate limits of the namespace'
+    )
+    _shards: Dict[str, MemoryShard] = PrivateAttr(default_factory=dict)
 
     def to_dict(self, ample: bool = False):
         """ Returns the short-term memory as a list of dictionaries. """
@@ -51,110 +80,210 @@ class Memory(BaseModel):
         """ Gets the most recent message from short-term memory. """
         return self.storage[-1] if self.storage else None
 
+    @staticmethod
+    def _to_embed(message: Message, role=None) -> Optional[Tuple[str, TextMeta]]:
+        """ Long-term memory text of a message with its metadata, None for messages not remembered """
+        if message.is_user_message():
+            # Image message won't be embedded cause it store in `message.non_standard`
+            content_to_embed = f"User asked: {message.content}"
+        elif message.is_assistant_message():
+            if role:
+                content_to_embed = f"{role} responded: {message.content}"
+            else:
+                content_to_embed = f"You responded: {message.content}"
+        else:
+            return None
+        meta = TextMeta(role=getattr(role, 'name', None) or message.role.val, timestamp=time.time(), msg_id=message.id)
+        return content_to_embed, meta
+
     async def add_one(self, message: Message, *args, **kwargs):
         """ Adds a message to both short-term and long-term memory. """
         self.storage.append(message)
 
         # Also add to long-term vector memory
         if self.llm:
-            if message.is_user_message():
-                # Image message won't be embedded cause it store in `message.non_standard`
-                content_to_embed = f"User asked: {message.content}"
-            elif message.is_assistant_message():
-                if kwargs.get('role'):
-                    content_to_embed = f"{kwargs['role']} responded: {message.content}"
-                else:
-                    content_to_embed = f"You responded: {message.content}"
-            else:
-                content_to_embed = ''
-            if content_to_embed and content_to_embed not in self.texts:
-                await self._add_to_vector_store(content_to_embed)
+            to_embed = self._to_embed(message, kwargs.get('role'))
+            if to_embed:
+                await self._add_to_vector_store(*to_embed)
+
+    def contains(self, text: str) -> bool:
+        """ Whether `text` is already in this namespace's long-term memory, O(1) through the content-hash set """
+        return self.shard.contains(text)
 
-    async def add_batch(self, messages: Iterable[Message]):
-        for msg in messages:
-            await self.add_one(msg)
+    async def add_batch(self, messages: Iterable[Message], role=None) -> int:
+        """
+        Adds messages to short-term memory and the new ones to long-term memory with one chunked
+        embedding call, one `index.add` and one WAL write. Returns how many were stored long-term.
+        """
+        messages = list(messages)
+        self.storage.extend(messages)
+        if not self.llm:
+            return 0
+
+        shard = await self._initialize_index()
+        batch = {}
+        for message in messages:
+            to_embed = self._to_embed(message, role)
+            if to_embed and to_embed[0] not in batch and shard.claim(to_embed[0]):
+                batch[to_embed[0]] = to_embed[1]
+        if not batch:
+            return 0
+
+        texts = list(batch)
+        try:
+            embeddings = await self.llm.embeddings(texts)
+        except Exception:
+            for text in texts:
+                shard.release(text)
+            raise
+        return shard.append(np.array(embeddings, dtype="float32"), texts, list(batch.values()))
 
     # --- Faiss-based Long-Term Memory Methods ---
 
-    async def _initialize_index(self):
-        if self.index is None:
-            index_file_path = Path(Pathh.INDEX_FILE.val)
-            texts_file_path = Path(Pathh.INDEX_TEXT.val)
+    def _acquire(self, namespace: Optional[str] = None) -> MemoryShard:
+        """ Process-wide shard of `namespace` (this memory's own by default), possibly not loaded yet """
+        namespace = namespace or self.namespace or DEFAULT_NAMESPACE
+        shard = self._shards.get(namespace)
+        if shard is None:
+            shard = acquire_shard(
+                namespace_dir(self.data_dir, namespace),
+                namespace=namespace,
+                checkpoint_every=self.checkpoint_every,
+                checkpoint_interval=self.checkpoint_interval,
+                wal_fsync=self.wal_fsync,
+                ann=self.ann,
+                retention=self.retention,
+                metric=self.metric,
+            )
+            self._shards[namespace] = shard
+            # the shard outlives this memory while other memories still use it
+            weakref.finalize(self, release_shard, shard)
+        return shard
 
-            if index_file_path.exists():
-                self.index = faiss.read_index(str(index_file_path))
-                self.texts = load_texts_from_file(texts_file_path)
-            else:
-                if not self.llm:
-                    raise ValueError("LLMNode must be provided for vector memory operations.")
-                dim = await self.llm.get_embedding_dim()
-                self.index = faiss.IndexFlatL2(dim)
-                # Ensure the directory exists before saving
-                index_file_path.parent.mkdir(parents=True, exist_ok=True)
-                faiss.write_index(self.index, str(index_file_path))
-                save_texts_to_file(self.texts, texts_file_path)
-
-    async def _add_to_vector_store(self, text: str):
-        embedding = await self.llm.embedding(text=text)
-        vector = np.array([embedding], dtype="float32")
-        self.index.add(vector)
-        self.texts.append(text)
-
-        # Save index and texts after adding new data
-        faiss.write_index(self.index, Pathh.INDEX_FILE.val)
-        save_texts_to_file(self.texts, Path(Pathh.INDEX_TEXT.val))
-
-    async def search(self, query: str, top_k: Optional[int] = None) -> List[str]:
-        """ Searches long-term memory for texts relevant to the query. """
-        if self.index is None or self.index.ntotal == 0 or not self.llm:
-            return []
+    def _open(self, shard: MemoryShard) -> bool:
+        """ `shard.open()`, importing the memories written before namespaces existed into the default one first """
+        if shard.namespace == DEFAULT_NAMESPACE and self.data_dir == Path(Pathh.MEMORY_DIR.val):
+            migrate_legacy_store(shard, Pathh.INDEX_FILE.val, Pathh.INDEX_TEXT.val)
+        return shard.open()
+
+    def _get_shard(self, namespace: Optional[str] = None) -> MemoryShard:
+        """ Shard of `namespace`, loaded from disk if it exists there """
+        shard = self._acquire(namespace)
+        if shard.index is None:
+            self._open(shard)
+        return shard
+
+    @property
+    def shard(self) -> MemoryShard:
+        return self._get_shard()
+
+    async def _initialize_index(self, namespace: Optional[str] = None, create: bool = True) -> Optional[MemoryShard]:
+        """
+        Own or given shard, loaded on first use off the event loop. With `create` a shard not on disk yet
+        is created with the embedding dim of `llm`, otherwise None is returned for it.
+        """
+        shard = self._acquire(namespace)
+        if shard.index is None and await asyncio.to_thread(self._open, shard):
+            return shard
+        if shard.index is None:
+            if not create:
+                return None
+            if not self.llm:
+                raise ValueError("LLMNode must be provided for vector memory operations.")
+            shard.open(await self.llm.get_embedding_dim())
+        return shard
+
+    async def _add_to_vector_store(self, text: str, meta: Optional[TextMeta] = None):
+        shard = await self._initialize_index()
+        if not shard.claim(text):  # already stored, O(1) through the content-hash set
+            return
+        try:
+            embedding = await self.llm.embedding(text=text)
+        except Exception:
+            shard.release(text)
+            raise
+        shard.append(np.array([embedding], dtype="float32"), [text], [meta])
+
+    def checkpoint(self, wait: bool = False):
+        """ Persist this namespace's index and texts, see `MemoryShard.checkpoint` """
+        self.shard.checkpoint(wait=wait)
+
+    async def search(
+            self,
+            query: str,
+            top_k: Optional[int] = None,
+            namespaces: Optional[Union[str, Iterable[str]]] = None,
+            with_scores: bool = False,
+    ) -> Union[List[str], List[Tuple[str, float]]]:
+        """
+        Searches long-term memory for texts relevant to the query.
+        `namespaces` widens the search to one or several other namespaces, the own one and
+        `shared_namespaces` by default.
+        `with_scores` returns (text, similarity) pairs instead of texts.
+        """
+        return (await self.search_many([query], top_k=top_k, namespaces=namespaces, with_scores=with_scores))[0]
+
+    @tracing.traced('memory.search', lambda self, *args, **kwargs: {'namespace': self.namespace or DEFAULT_NAMESPACE})
+    async def search_many(
+            self,
+            queries: Iterable[str],
+            top_k: Optional[int] = None,
+            namespaces: Optional[Union[str, Iterable[str]]] = None,
+            with_scores: bool = False,
+    ) -> List[Union[List[str], List[Tuple[str, float]]]]:
+        """
+        `search` for several queries at once, e.g. the context of many mentions: the queries are
+        embedded in one request and each namespace is searched once with the whole query matrix.
+        Returns one result list per query, each without repeated texts.
+        """
+        queries = list(queries)
+        tracing.current_span().set(queries=len(queries))
+        results = [[] for _ in queries]
+        if not self.llm or not queries:
+            return results
+        if namespaces is None:
+            namespaces = [self.namespace or DEFAULT_NAMESPACE, *self.shared_namespaces]
+        elif isinstance(namespaces, str):
+            namespaces = [namespaces]
+
+        shards = []
+        for namespace in dict.fromkeys(namespaces):
+            shard = await self._initialize_index(namespace, create=False)
+            if shard is not None:
+                shard.refresh()
+                if shard.ntotal:
+                    shards.append(shard)
 
         num_to_retrieve = top_k if top_k is not None else self.top_k
-        num_to_retrieve = min(num_to_retrieve, self.index.ntotal)
-
-        if num_to_retrieve == 0:
-            return []
-
-        query_embedding = await self.llm.embedding(text=query)  # TODO: Cache same query embedding. Using tool second time
-        vector = np.array([query_embedding], dtype="float32")
-        distances, indices = self.index.search(vector, k=num_to_retrieve)
-
-        # Filter out results that are too similar to the query (i.e., the query itself)
-        # and only include results with a distance less than 0.5 for high relevance.
-        results = []
-        if len(indices) > 0:
-            for i, dist in zip(indices[0], distances[0]):
-                # A very small distance (e.g., < 1e-5) indicates an exact match to the query.
-                # A distance > 0.5 indicates low semantic relevance. [0 - 2 distance]
-                if 1e-5 < dist < 0.5:
-                    results.append(self.texts[i])
+        if not shards or num_to_retrieve <= 0:
+            return results
+
+        vectors = np.array(await self.llm.embeddings(queries), dtype="float32")
+        hits = [[] for _ in queries]
+        for shard in shards:
+            with tracing.span('memory.index_search', namespace=shard.namespace, ntotal=shard.ntotal):
+                scores, indices, texts = shard.search(vectors, k=num_to_retrieve * self.overfetch)
+            # Filter out results that are too similar to the query (i.e., the query itself)
+            # and results below the relevance threshold, before cutting to top_k
+            for query_hits, query_scores, query_ids, query_texts in zip(hits, scores, indices, texts):
+                query_hits.extend(
+                    (float(score), text) for i, score, text in zip(query_ids, query_scores, query_texts)
+                    if i >= 0 and self.min_score <= score < self.max_score
+                )
+
+        for query_hits, found in zip(hits, results):
+            query_hits.sort(key=lambda hit: hit[0], reverse=True)
+            seen = set()
+            for score, text in query_hits:
+                if text in seen:  # the same text stored in several namespaces
+                    continue
+                seen.add(text)
+                found.append((text, score) if with_scores else text)
+                if len(found) == num_to_retrieve:
+                    break
         return results
 
     def clear(self):
-        """ Clears both short-term and long-term memory. """
+        """ Clears short-term memory and this namespace's long-term memory. """
         self.storage.clear()
-        self.index = None
-        self.texts.clear()
-        index_file_path = Path(Pathh.INDEX_FILE.val)
-        texts_file_path = index_file_path.with_suffix('.txt')
-        if index_file_path.exists():
-            index_file_path.unlink()
-        if texts_file_path.exists():
-            texts_file_path.unlink()
-
-    def model_post_init(self, __context: Any) -> None:
-        if not self.index:
-            def _run_async_init():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                try:
-                    new_loop.run_until_complete(self._initialize_index())
-                finally:
-                    new_loop.close()
-                    asyncio.set_event_loop(None)
-
-            thread = threading.Thread(target=_run_async_init)
-            thread.start()
-            thread.join()  # Block the current thread until initialization is complete
-
-
+        self.shard.clear()
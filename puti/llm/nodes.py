@@ -4,11 +4,12 @@
 @Description:  
 """
 import json
+import functools
 
 from ollama._types import Message as OMessage
 from ollama import Client
 from pydantic import BaseModel, Field, ConfigDict, create_model, model_validator
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 from typing import Dict, Tuple, Type, Any, Union, Annotated
 from abc import ABC, abstractmethod
 from openai import AsyncOpenAI, OpenAI
@@ -17,6 +18,7 @@ from openai.types.chat import ChatCompletionChunk
 from openai.types.chat.chat_completion import ChatCompletion
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from puti.utils.files import encode_image
+from puti.utils import tracing, deadlines
 from puti.llm.messages import Message, ToolMessage
 from puti.llm.tools import Toolkit
 from puti.llm.prompts import promptt
@@ -33,6 +35,36 @@ from puti.constant.base import Resp
 lgr = logger_factory.llm
 
 
+def _traced_chat(chat):
+    """ `chat` in a span with the model and, where the node counts them, the tokens of the call """
+    @functools.wraps(chat)
+    async def wrapper(self, *args, **kwargs):
+        if not tracing.is_enabled():
+            return await chat(self, *args, **kwargs)
+        with tracing.span('llm.chat', node=self.llm_name, model=self.conf.MODEL, tools=bool(kwargs.get('tools'))) as span:
+            cost = self.cost
+            before = (cost.total_prompt_tokens, cost.total_completion_tokens) if cost else None
+            resp = await chat(self, *args, **kwargs)
+            if before is not None:
+                span.set(
+                    prompt_tokens=cost.total_prompt_tokens - before[0],
+                    completion_tokens=cost.total_completion_tokens - before[1],
+                )
+            return resp
+    return wrapper
+
+
+def _traced_embeddings(embeddings):
+    @functools.wraps(embeddings)
+    async def wrapper(self, texts, *args, **kwargs):
+        if not tracing.is_enabled():
+            return await embeddings(self, texts, *args, **kwargs)
+        with tracing.span('llm.embeddings', node=self.llm_name, model=getattr(self.conf, 'EMBEDDING_MODEL', None),
+                          texts=len(texts)):
+            return await embeddings(self, texts, *args, **kwargs)
+    return wrapper
+
+
 class LLMNode(BaseModel, ABC):
     model_config = ConfigDict(arbitrary_types_allowed=True, extra="allow")
 
@@ -43,6 +75,16 @@ class LLMNode(BaseModel, ABC):
     cli: Optional[Union[OpenAI, Client]] = Field(None, description='Cli connect with llm.', exclude=True)
     cost: Optional[CostManager] = None
 
+    def __init_subclass__(cls, **kwargs):
+        """ every concrete `chat` and `embeddings` is traced, see `puti.utils.tracing` """
+        super().__init_subclass__(**kwargs)
+        chat = cls.__dict__.get('chat')
+        if chat is not None and not getattr(chat, '__isabstractmethod__', False):
+            cls.chat = _traced_chat(chat)
+        embeddings = cls.__dict__.get('embeddings')
+        if embeddings is not None:
+            cls.embeddings = _traced_embeddings(embeddings)
+
     def __str__(self):
         return self.llm_name
 
@@ -72,6 +114,11 @@ class LLMNode(BaseModel, ABC):
     async def embedding(self, text: str, **kwargs) -> List[float]:
         pass
 
+    @_traced_embeddings
+    async def embeddings(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """ Embeddings of several texts, one by one unless the node has a batch endpoint """
+        return [await self.embedding(text=text, **kwargs) for text in texts]
+
     @abstractmethod
     async def get_embedding_dim(self) -> int:
         pass
@@ -85,6 +132,11 @@ class LLMNode(BaseModel, ABC):
         resp = await self.chat(messages, *args, **kwargs)
         return resp
 
+    async def chat_chunks(self, msg: List[Dict], **kwargs) -> AsyncIterator[str]:
+        """ The reply piece by piece as the model produces it, in one piece from nodes that cannot stream """
+        resp = await self.chat(msg, **kwargs)
+        yield resp.content if hasattr(resp, 'content') else str(resp)
+
     @staticmethod
     async def parse_answer(think: str) -> Tuple[ChatState, str]:
         if is_valid_json(think):
@@ -109,30 +161,12 @@ class OpenAINode(LLMNode):
         if kwargs.get('tools'):
             stream = False
         if stream:
-            resp: AsyncStream[ChatCompletionChunk] = await self.acli.chat.completions.create(
-                messages=msg,
-                timeout=self.conf.LLM_API_TIMEOUT,
-                stream=stream,
-                # max_tokens=self.conf.MAX_TOKEN,
-                temperature=self.conf.TEMPERATURE,
-                model=self.conf.MODEL,
-                **kwargs
-            )
-            collected_messages = []
-            async for chunk in resp:
-                chunk_message = chunk.choices[0].delta.content or '' if chunk.choices else ''
-                # print(chunk_message, end='')
-                collected_messages.append(chunk_message)
-            full_reply = ''.join(collected_messages)
-            # TODO: add cost for image message
-            if not Message.is_image(msg[-1]):
-                self.cost.handle_chat_cost(msg, full_reply, self.conf.MODEL)
-            # lgr.info(f"cost: {self.cost.total_cost}")
-            return full_reply
+            return ''.join([chunk async for chunk in self.chat_chunks(msg, **kwargs)])
         else:
-            resp: ChatCompletion = self.cli.chat.completions.create(
+            # async client, so a timeout or cancellation of the caller stops the request instead of blocking the loop
+            resp: ChatCompletion = await self.acli.chat.completions.create(
                 messages=msg,
-                timeout=self.conf.LLM_API_TIMEOUT,
+                timeout=deadlines.bound(self.conf.LLM_API_TIMEOUT),
                 stream=stream,
                 max_tokens=self.conf.MAX_TOKEN,
                 temperature=self.conf.TEMPERATURE,
@@ -152,6 +186,27 @@ class OpenAINode(LLMNode):
                 # lgr.info(f"cost: {self.cost.total_cost}")
             return full_reply
 
+    async def chat_chunks(self, msg: List[Dict], **kwargs) -> AsyncIterator[str]:
+        resp: AsyncStream[ChatCompletionChunk] = await self.acli.chat.completions.create(
+            messages=msg,
+            timeout=deadlines.bound(self.conf.LLM_API_TIMEOUT),
+            stream=True,
+            # max_tokens=self.conf.MAX_TOKEN,
+            temperature=self.conf.TEMPERATURE,
+            model=self.conf.MODEL,
+            **kwargs
+        )
+        collected_messages = []
+        async for chunk in resp:
+            chunk_message = chunk.choices[0].delta.content or '' if chunk.choices else ''
+            if chunk_message:
+                collected_messages.append(chunk_message)
+                yield chunk_message
+        full_reply = ''.join(collected_messages)
+        # TODO: add cost for image message
+        if not Message.is_image(msg[-1]):
+            self.cost.handle_chat_cost(msg, full_reply, self.conf.MODEL)
+
     async def stream_chat(self, message, **kwargs) -> AsyncStream[ChatCompletionChunk]:
         return await self.acli.chat.completions.create(
             model=self.conf.MODEL_NAME,
@@ -169,6 +224,18 @@ class OpenAINode(LLMNode):
         )
         return response.data[0].embedding
 
+    async def embeddings(self, texts: List[str], chunk_size: int = 512, **kwargs) -> List[List[float]]:
+        """Get the embeddings for many texts, `chunk_size` inputs per request."""
+        vectors = []
+        for start in range(0, len(texts), chunk_size):
+            response = await self.acli.embeddings.create(
+                model=self.conf.EMBEDDING_MODEL,
+                input=texts[start:start + chunk_size],
+                **kwargs
+            )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
     async def get_embedding_dim(self) -> int:
         """Get the embedding dimension for the model."""
         if self.conf.EMBEDDING_DIM:
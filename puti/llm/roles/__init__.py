@@ -29,12 +29,14 @@ from puti.llm.nodes import LLMNode, OpenAINode
 from puti.llm.messages import Message, ToolMessage, AssistantMessage, UserMessage, SystemMessage
 from puti.llm.envs import Env
 from puti.llm.memory import Memory
+from puti.db.memory_shard import DEFAULT_NAMESPACE
 from puti.utils.common import any_to_str, is_valid_json
 from puti.capture import Capture
 from mcp.client.stdio import stdio_client
 from mcp import ClientSession, StdioServerParameters
 from contextlib import AsyncExitStack
 from puti.utils.path import root_dir
+from puti.utils import tracing, deadlines
 from puti.constant.client import McpTransportMethod
 from typing import Annotated, Dict, TypedDict, Any, Required, NotRequired, ClassVar, cast
 from pydantic.fields import FieldInfo
@@ -126,6 +128,12 @@ class Role(BaseModel):
         # Pass the LLM node to the memory for embedding purposes
         self.rc.memory.llm = self.llm
         self.rc.memory.top_k = self.llm.conf.FAISS_SEARCH_TOP_K
+        # Each role remembers in its own namespace unless the memory was given one, and still reads the
+        # default one, where the long-term memory from before namespaces is imported
+        if self.rc.memory.namespace is None:
+            self.rc.memory.namespace = self.name
+            if DEFAULT_NAMESPACE not in self.rc.memory.shared_namespaces:
+                self.rc.memory.shared_namespaces.append(DEFAULT_NAMESPACE)
 
     @model_validator(mode='after')
     def check_address(self):
@@ -196,6 +204,17 @@ class Role(BaseModel):
     def set_tools(self, tools: List[Type[BaseTool]]):
         self.toolkit.add_tools(tools)
 
+    def isolated(self) -> 'Role':
+        """
+        A copy with its own conversation: buffer, short-term memory, todos and answer start empty.
+        The llm node, tools and long-term memory namespace are shared, so copies run concurrently
+        on warm clients without seeing each other's messages.
+        """
+        memory = self.rc.memory.model_copy(update={'storage': []})
+        memory._shards = {}
+        rc = self.rc.model_copy(update={'buffer': Buffer(), 'memory': memory, 'news': None, 'todos': [], 'action_taken': 0})
+        return self.model_copy(update={'rc': rc, 'answer': None, 'tool_calls_one_round': []})
+
     def _correction(self, fix_msg: str):
         """ self-correction mechanism """
         # lgr.debug(f"self correction: {fix_msg}")
@@ -223,6 +242,7 @@ class Role(BaseModel):
 
         return True if len(self.rc.news) > 0 else False
 
+    @tracing.traced('role.think', lambda self: {'role': self.name})
     async def _think(self) -> tuple[Annotated[bool, 'if call tool'], Annotated[Message, 'message to return']]:
         base_system_prompt = self.sys_think_msg
 
@@ -315,6 +335,7 @@ class Role(BaseModel):
             self.rc.todos.append(call_info_message)
             return True, call_info_message
 
+    @tracing.traced('role.react', lambda self: {'role': self.name, 'tools': len(self.rc.todos)})
     async def _react(self) -> Message:
         message = Message.from_any('no tools taken yet')
         for todo in self.rc.todos:
@@ -358,6 +379,7 @@ class Role(BaseModel):
         resp = Message(content='No action taken yet', role=RoleType.SYSTEM)
 
         while self.rc.action_taken < self.rc.max_react_loop:
+            deadlines.check(f'{self} run')  # a vertex timeout or run deadline ends the loop between steps
             perceive = await self._perceive()
             if not perceive:
                 await self.publish_message()
@@ -0,0 +1,115 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 23:00
+@Description:  Results handed on chunk by chunk while they are produced, for streaming graph edges
+"""
+import asyncio
+
+from typing import Any, AsyncIterator, List, Optional
+from puti.constant.llm import RoleType
+from puti.llm.messages import Message
+
+
+class UpstreamError(RuntimeError):
+    """ Raised to the readers of a stream whose producer failed or was cancelled """
+
+
+class ResultStream:
+    """
+    The result of a vertex while it is being produced. Any number of readers get every chunk, those
+    pushed before they started reading included, and awaiting the stream gives the assembled result.
+
+        async for chunk in stream:
+            ...
+        message = await stream
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._result: Optional[Message] = None
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def text(self) -> str:
+        """ The chunks so far, joined """
+        return ''.join(self._chunks)
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def push(self, chunk: str):
+        if self._done:
+            raise RuntimeError('Cannot push to a closed stream')
+        if chunk:
+            self._chunks.append(chunk)
+            self._notify()
+
+    def close(self, result: Any = None):
+        """
+        End the stream with `result`, the joined chunks by default. A result that was never pushed,
+        e.g. from an action that does not stream, reaches the readers as a single chunk.
+        """
+        if self._done:
+            return
+        message = Message.from_any(self.text if result is None else result, role=RoleType.ASSISTANT)
+        if not self._chunks and message.content:
+            self._chunks.append(str(message.content))
+        self._result, self._done = message, True
+        self._notify()
+
+    def fail(self, error: BaseException):
+        if self._done:
+            return
+        self._error, self._done = error, True
+        self._notify()
+
+    def _raise(self):
+        raise UpstreamError(f'Upstream result failed: {self._error!r}') from self._error
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            # taken before reading, so a chunk pushed meanwhile is not waited for
+            changed = self._changed
+            while position < len(self._chunks):
+                yield self._chunks[position]
+                position += 1
+            if self._done:
+                if self._error is not None:
+                    self._raise()
+                return
+            await changed.wait()
+
+    async def result(self) -> Message:
+        while not self._done:
+            await self._changed.wait()
+        if self._error is not None:
+            self._raise()
+        return self._result
+
+    def __await__(self):
+        return self.result().__await__()
+
+    def __repr__(self):
+        return f'ResultStream(chunks={len(self._chunks)}, done={self._done})'
+
+
+async def iter_chunks(value: Any) -> AsyncIterator[str]:
+    """ The chunks of a stream as they arrive, or the content of anything else in one piece """
+    if isinstance(value, ResultStream):
+        async for chunk in value:
+            yield chunk
+    elif value is not None:
+        yield str(getattr(value, 'content', value))
+
+
+async def resolve(value: Any) -> Any:
+    """ The assembled result of a stream, anything else as it is """
+    return await value if isinstance(value, ResultStream) else value
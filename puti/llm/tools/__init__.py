@@ -11,6 +11,7 @@ from typing_extensions import Required, NotRequired
 from pydantic import BaseModel, Field, ConfigDict
 from abc import ABC, abstractmethod
 from puti.logs import logger_factory
+from puti.utils import tracing
 from pydantic.fields import FieldInfo
 
 
@@ -83,6 +84,7 @@ class BaseTool(BaseModel, ABC):
         has_kwargs = any(p.kind == inspect.Parameter.VAR_KEYWORD for p in sig.parameters.values())
         if not (has_args and has_kwargs):
             raise TypeError(f"{cls.__name__}.run must accept *args and **kwargs")
+        cls.run = tracing.traced('tool.run', lambda self, *args, **kwargs: {'tool': self.name})(run_method)
 
 
 class Toolkit(BaseModel, ABC):
@@ -3,10 +3,12 @@
 @Time:  2025-06-18 11:53
 @Description:  Workflow utilities for graph-based execution
 """
-from typing import Dict, Any, List, Optional, Annotated
+from typing import Dict, Any, List, Optional, Annotated, AsyncIterator, Iterable
 import json
+import time
+import asyncio
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 
 from puti.llm.graph import Graph
 from puti.logs import logger_factory
@@ -14,6 +16,22 @@ from puti.logs import logger_factory
 lgr = logger_factory.llm
 
 
+class BatchResult(BaseModel):
+    """ The outcome of one input of `Workflow.run_batch` """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int = Field(..., description="Position of the input in the batch")
+    input: Any = Field(default=None, description="The input as given")
+    results: Dict[str, Any] = Field(default_factory=dict, description="Vertex id -> result, as `run` returns them")
+    error: Optional[Exception] = Field(default=None, description="What the run raised, if it did not get to finish")
+    elapsed: float = Field(default=0, description="Seconds the run took")
+
+    @property
+    def ok(self) -> bool:
+        """Whether the run finished without any vertex failing"""
+        return self.error is None and not any(isinstance(result, Exception) for result in self.results.values())
+
+
 class Workflow(BaseModel):
     """
     Manages the execution of a graph-based workflow.
@@ -42,6 +60,80 @@ class Workflow(BaseModel):
             lgr.error(f"Error running graph: {str(e)}")
             raise
 
+    async def run_batch(
+            self,
+            inputs: Iterable[Any],
+            concurrency: int = 4,
+            max_steps: int = 10,
+            *args,
+            **kwargs
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run the graph once per input, up to `concurrency` runs at a time, yielding each run's
+        `BatchResult` as soon as it finishes, so in completion order rather than input order.
+
+        The graph is compiled once and every run works on a `Graph.fork`, sharing the actions and
+        their warm llm clients and indexes instead of rebuilding them per input. A run that raises
+        is reported through `BatchResult.error` and the others carry on. Leaving the iteration
+        early cancels the runs still in flight.
+
+        Args:
+            inputs: A dict per input is passed to `Graph.run` as keyword arguments, anything else as `prompt`.
+            concurrency: The maximum number of inputs running at once.
+            max_steps: The maximum number of steps of each run.
+            kwargs: Additional keyword arguments to pass to every run.
+        """
+        self.graph.compile()
+        queue = enumerate(inputs)  # shared by the workers, each pulls the next input when it is free
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def run_one(index: int, item: Any) -> BatchResult:
+            run_kwargs = {**kwargs, **(item if isinstance(item, dict) else {'prompt': item})}
+            start = time.perf_counter()
+            try:
+                results = await self.graph.fork().run(max_steps, *args, **run_kwargs)
+            except Exception as e:
+                lgr.error(f"Batch input {index} failed: {e}")
+                return BatchResult(index=index, input=item, error=e, elapsed=time.perf_counter() - start)
+            return BatchResult(index=index, input=item, results=results, elapsed=time.perf_counter() - start)
+
+        async def worker():
+            for index, item in queue:
+                finished.put_nowait(await run_one(index, item))
+
+        async def drain(workers: List[asyncio.Future]):
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                finished.put_nowait(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(concurrency, 1))]
+        closer = asyncio.ensure_future(drain(workers))
+        try:
+            while (result := await finished.get()) is not None:
+                yield result
+            await closer
+        finally:
+            for task in [*workers, closer]:
+                task.cancel()
+            await asyncio.gather(*workers, closer, return_exceptions=True)
+
+    async def resume(self, run_id: str, max_steps: int = 10, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Continue a checkpointed run after its last successful vertex, see `Graph.checkpoints`.
+        Vertices that already succeeded are not run again; a finished run just returns its results.
+
+        Args:
+            run_id: The id the run was checkpointed under.
+            max_steps: The maximum number of steps, including those executed before the resume.
+            kwargs: Additional keyword arguments to pass to the graph's run method.
+
+        Returns:
+            A dictionary mapping vertex IDs to their results, from before and after the resume.
+        """
+        self.results = await self.graph.run(max_steps, *args, run_id=run_id, resume=True, **kwargs)
+        return self.results
+
     async def run_until_vertex(self, target_vertex_id: str, max_steps: int = 10, *args, **kwargs) -> Dict[str, Any]:
         """
         Run the graph until a specific vertex is reached, including the target vertex.
@@ -58,14 +150,9 @@ class Workflow(BaseModel):
         if target_vertex_id not in self.graph.vertices:
             raise ValueError(f"Target vertex '{target_vertex_id}' not in self.graph.vertices")
 
-        modified_graph = Graph(
-            vertices=self.graph.vertices.copy(),  # `vertices` and `graph roles` copy from
-            edges=[edge for edge in self.graph.edges if edge.source != target_vertex_id],
-            start_vertex_id=self.graph.start_vertex_id
-        )
-        
-        workflow = Workflow(graph=modified_graph)
-        self.results = await workflow.run(max_steps=max_steps, *args, **kwargs)
+        # a view without the target's outgoing edges, the graph itself is neither copied nor re-validated
+        adjacency = self.graph.compile(keep=lambda edge: edge.source != target_vertex_id)
+        self.results = await self.graph.run(max_steps, *args, adjacency=adjacency, **kwargs)
         return self.results
 
     async def run_subgraph(self, start_vertex_id: str, end_vertex_ids: List[str], max_steps: int = 10, **kwargs) -> Dict[str, Any]:
@@ -91,14 +178,10 @@ class Workflow(BaseModel):
             if vertex_id not in self.graph.vertices:
                 raise ValueError(f"End vertex '{vertex_id}' not in self.graph.vertices")
 
-        subgraph = Graph(
-            vertices={k: v for k, v in self.graph.vertices.items()},
-            edges=[edge for edge in self.graph.edges if edge.target not in end_vertex_ids],
-            start_vertex_id=start_vertex_id
+        adjacency = self.graph.compile(keep=lambda edge: edge.target not in end_vertex_ids)
+        self.results = await self.graph.run(
+            max_steps, start_vertex_id=start_vertex_id, adjacency=adjacency, **kwargs
         )
-        
-        workflow = Workflow(graph=subgraph)
-        self.results = await workflow.run(max_steps=max_steps, **kwargs)
         return self.results
 
     def save_results(self, file_path: str):
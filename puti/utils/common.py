@@ -158,16 +158,9 @@ def generate_random_15_digit_number():
 
 
 def load_workflow(workflow_path):
-    try:
-        with open(workflow_path, 'r') as file:
-            workflow = json.load(file)
-            return json.dumps(workflow)
-    except FileNotFoundError:
-        lgr.e(f"The file {workflow_path} was not found.")
-        return None
-    except json.JSONDecodeError:
-        lgr.e(f"The file {workflow_path} contains invalid JSON.")
-        return None
+    """ The compiled, cached plan of a JSON / YAML workflow file, see `puti.llm.graph.plan.load_plan` """
+    from puti.llm.graph.plan import load_plan
+    return load_plan(workflow_path)
 
 
 def is_mac():
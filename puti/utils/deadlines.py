@@ -0,0 +1,51 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 21:00
+@Description:  Deadlines carried by the async context, so a vertex or run timeout bounds the llm calls under it
+"""
+import time
+import asyncio
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar('puti_deadline', default=None)
+
+
+@contextmanager
+def scope(seconds: Optional[float]):
+    """
+    Everything awaited inside, and every task created inside, must finish within `seconds`.
+    Nested scopes keep the earlier deadline; `None` adds none.
+    """
+    if seconds is None:
+        yield _deadline.get()
+        return
+    current = _deadline.get()
+    at = time.monotonic() + seconds
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """ Seconds left to the innermost deadline, None without one """
+    at = _deadline.get()
+    return None if at is None else max(at - time.monotonic(), 0.0)
+
+
+def bound(timeout: Optional[float]) -> Optional[float]:
+    """ `timeout` cut to what is left of the deadline, e.g. for the timeout of an http request """
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def check(what: str = 'operation'):
+    """ Raise `asyncio.TimeoutError` once the deadline has passed, between steps of a longer operation """
+    if remaining() == 0.0:
+        raise asyncio.TimeoutError(f'{what} exceeded its deadline')
@@ -1,9 +1,17 @@
+import os
 import base64
 import mimetypes
 import json
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
 
 def encode_image(image_path: str) -> str:
     """
@@ -30,10 +38,41 @@ def encode_image(image_path: str) -> str:
     return f"data:{mime_type};base64,{base64_string}"
 
 
-def save_texts_to_file(texts: List[str], file_path: Path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        for text in texts:
-            f.write(text + '\n')
+@contextmanager
+def atomic_path(file_path: Path):
+    """
+    Yield a temporary sibling of `file_path`, which replaces `file_path` once the block succeeds.
+    Readers never observe a half written file.
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f'.{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+@contextmanager
+def file_lock(lock_path: Path, shared: bool = False):
+    """
+    Advisory inter-process lock held for the duration of the block.
+    Every acquisition opens its own descriptor, so threads of one process exclude each other too.
+    On platforms without `fcntl` the lock is a no-op.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as fh:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
 
 
 def load_texts_from_file(file_path: Path) -> List[str]:
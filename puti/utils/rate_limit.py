@@ -0,0 +1,53 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 21:30
+@Description:  Token bucket shared by concurrent tasks that call the same rate limited api
+"""
+import time
+import asyncio
+
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average and bursts of up to `capacity`.
+    One bucket is meant to be shared by everything hitting the same api, so concurrency
+    can be raised without exceeding the api's limit.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # a lock per event loop, the bucket may outlive the `asyncio.run` it was first used in
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1):
+        """ Wait until `tokens` are available and take them, first come first served """
+        if tokens > self.capacity:
+            raise ValueError(f'cannot acquire {tokens} tokens from a bucket of {self.capacity}')
+        async with self._get_lock():
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def __repr__(self):
+        return f'TokenBucket(rate={self.rate}, capacity={self.capacity})'
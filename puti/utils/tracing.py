@@ -0,0 +1,260 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 20:30
+@Description:  Lightweight spans over graph runs, roles, llm calls, tools and memory, exported as a Chrome trace
+
+Finished spans are kept in a ring buffer of `PUTI_TRACE_MAX_SPANS` (100000 by default, see `set_max_spans`);
+once it is full the oldest spans are dropped, so a long traced process keeps its most recent activity in
+bounded memory. Lanes of finished threads and tasks are forgotten once no buffered span uses them.
+"""
+import os
+import json
+import atexit
+import asyncio
+import inspect
+import functools
+import itertools
+import threading
+import time
+import weakref
+
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+from puti.utils.files import atomic_path
+from puti.logs import logger_factory
+
+lgr = logger_factory.default
+
+MAX_SPANS = int(os.environ.get('PUTI_TRACE_MAX_SPANS', 100_000))
+# lanes kept before those no live owner or buffered span uses are pruned, doubled when pruning frees too few
+MAX_LANES = 1024
+
+_enabled = False
+_spans: Deque['Span'] = deque(maxlen=MAX_SPANS)
+_dropped = 0
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_ids = itertools.count(1)
+_current: ContextVar[Optional['Span']] = ContextVar('puti_span', default=None)
+_task_lanes: 'weakref.WeakKeyDictionary[asyncio.Task, int]' = weakref.WeakKeyDictionary()
+_thread_lanes: Dict[int, int] = {}
+_lane_names: Dict[int, str] = {}
+_lane_ids = itertools.count(1)
+_lane_limit = MAX_LANES
+
+
+def _prune_lanes():
+    """ Forget the lanes of dead threads and collected tasks that no buffered span is drawn on, under `_lock` """
+    global _lane_limit
+    alive = {thread.ident for thread in threading.enumerate()}
+    for ident in [ident for ident in _thread_lanes if ident not in alive]:
+        del _thread_lanes[ident]
+    used = set(_task_lanes.values()) | set(_thread_lanes.values()) | {item.lane for item in _spans}
+    for lane in [lane for lane in _lane_names if lane not in used]:
+        del _lane_names[lane]
+    _lane_limit = max(MAX_LANES, 2 * len(_lane_names))
+
+
+def _lane() -> int:
+    """ A small track number per asyncio task (or thread), so concurrent vertices get their own row """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    lanes, owner = (_task_lanes, task) if task is not None else (_thread_lanes, threading.get_ident())
+    with _lock:
+        lane = lanes.get(owner)
+        if lane is None:
+            if len(_lane_names) >= _lane_limit:
+                _prune_lanes()
+            lane = lanes[owner] = next(_lane_ids)
+            _lane_names[lane] = task.get_name() if task is not None else threading.current_thread().name
+    return lane
+
+
+class Span:
+    """ One timed section; nested spans of the same task know their parent through a context variable """
+    __slots__ = ('id', 'name', 'attrs', 'parent', 'lane', 'start', 'end', '_token')
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.id = next(_ids)
+        self.name = name
+        self.attrs = attrs
+        self.parent: Optional[int] = None
+        self.lane = 0
+        self.start = self.end = 0.0
+        self._token = None
+
+    def set(self, **attrs) -> 'Span':
+        self.attrs.update(attrs)
+        return self
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __enter__(self) -> 'Span':
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self.lane = _lane()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs['error'] = f'{exc_type.__name__}: {exc}'
+        global _dropped
+        with _lock:
+            if len(_spans) == _spans.maxlen:
+                _dropped += 1
+            _spans.append(self)
+        return False
+
+    def to_event(self) -> Dict[str, Any]:
+        """ A Chrome trace complete ("X") event, times in microseconds """
+        args = {key: value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+                for key, value in self.attrs.items()}
+        args['span_id'] = self.id
+        if self.parent is not None:
+            args['parent_id'] = self.parent
+        return {
+            'name': self.name, 'cat': self.name.split('.')[0], 'ph': 'X', 'pid': os.getpid(), 'tid': self.lane,
+            'ts': round((self.start - _origin) * 1e6, 3), 'dur': round(self.duration * 1e6, 3), 'args': args,
+        }
+
+
+class _NoopSpan:
+    """ Handed out while tracing is off: entering, leaving and setting attributes do nothing """
+    __slots__ = ()
+
+    def set(self, **attrs) -> '_NoopSpan':
+        return self
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attrs) -> Union[Span, _NoopSpan]:
+    """ `with span('llm.chat', model=...) as s: ... s.set(tokens=...)`; the shared no-op when tracing is off """
+    if not _enabled:
+        return NOOP_SPAN
+    return Span(name, attrs)
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    return (_current.get() or NOOP_SPAN) if _enabled else NOOP_SPAN
+
+
+def traced(name: str, attrs: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Run a function inside a span, a coroutine function stays one and a plain function stays plain.
+    `attrs` gets the call's arguments and returns the span attributes; it is only called while
+    tracing is on, which is checked on every call.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with Span(name, attrs(*args, **kwargs) if attrs is not None else {}):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return func(*args, **kwargs)
+                with Span(name, attrs(*args, **kwargs) if attrs is not None else {}):
+                    return func(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def spans() -> List[Span]:
+    """ Finished spans in the order they ended, the most recent `MAX_SPANS` of them """
+    with _lock:
+        return list(_spans)
+
+
+def dropped() -> int:
+    """ Spans pushed out of the full buffer since the last `clear()` """
+    return _dropped
+
+
+def set_max_spans(limit: int):
+    """ Resize the span buffer, keeping its most recent spans """
+    global _spans
+    with _lock:
+        _spans = deque(_spans, maxlen=limit)
+
+
+def clear():
+    global _dropped, _lane_ids, _lane_limit
+    with _lock:
+        _spans.clear()
+        _dropped = 0
+        _task_lanes.clear()
+        _thread_lanes.clear()
+        _lane_names.clear()
+        _lane_ids = itertools.count(1)
+        _lane_limit = MAX_LANES
+
+
+def chrome_trace() -> Dict[str, Any]:
+    """ Finished spans as a Chrome trace, for chrome://tracing or https://ui.perfetto.dev """
+    finished = spans()
+    pid = os.getpid()
+    with _lock:
+        names = dict(_lane_names)
+    events = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': lane, 'args': {'name': name}}
+        for lane, name in sorted(names.items())
+    ]
+    events.extend(item.to_event() for item in sorted(finished, key=lambda item: item.start))
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(path) as tmp, open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f, ensure_ascii=False)
+    return path
+
+
+def _export_at_exit(path: str):
+    if _spans:
+        dropped_note = f', {_dropped} older ones dropped (PUTI_TRACE_MAX_SPANS)' if _dropped else ''
+        lgr.info(f'Trace of {len(_spans)} spans written to {export_chrome_trace(path)}{dropped_note}')
+
+
+# PUTI_TRACE=<file> traces the whole process and writes the trace to that file on exit
+if os.environ.get('PUTI_TRACE'):
+    enable()
+    atexit.register(_export_at_exit, os.environ['PUTI_TRACE'])
@@ -25,7 +25,7 @@ setup(
     url="https://github.com/aivoyager/puti",
     packages=find_packages(exclude=["test*", "data", "docs", "api*"]),
     package_data={
-        'puti': ['conf/config.yaml', 'py.typed'],
+        'puti': ['conf/config.yaml', 'conf/workflows/*.yaml', 'py.typed'],
     },
     include_package_data=True,
     install_requires=get_reqs('requirements.txt'),
@@ -0,0 +1,55 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 10:40
+@Description:  Tests for env message buses
+"""
+from puti.llm.bus import InProcessBus, BrokerBus, encode_message, decode_message
+from puti.llm.envs import Env
+from puti.llm.messages import Message, AssistantMessage
+from puti.llm.roles import Role
+
+
+def _role(name: str) -> Role:
+    return Role(name=name)
+
+
+def test_message_round_trip():
+    msg = AssistantMessage(content='hi', sender='alice', receiver={'bob'})
+    restored = decode_message(encode_message(msg))
+    assert isinstance(restored, AssistantMessage)
+    assert restored.content == 'hi'
+    assert restored.receiver == {'bob'}
+    assert restored.id == msg.id
+
+
+def test_in_process_bus_routing():
+    alice, bob = _role('alice'), _role('bob')
+    env = Env(name='room', bus=InProcessBus())
+    env.add_roles([alice, bob])
+
+    env.publish_message(Message(content='hello', sender='alice'))
+
+    assert alice.rc.buffer.pop_all() == []
+    assert [m.content for m in bob.rc.buffer.pop_all()] == ['hello']
+    assert len(env.history) == 1
+
+
+def test_broker_bus_shares_env_across_workers():
+    # Two envs with the same name on separate buses stand in for two celery workers
+    alice, bob = _role('alice'), _role('bob')
+    env1 = Env(name='room', bus=BrokerBus(url='memory://'))
+    env2 = Env(name='room', bus=BrokerBus(url='memory://'))
+    env1.add_roles([alice])
+    env2.add_roles([bob])
+
+    env1.publish_message(Message(content='hello', sender='alice', receiver=bob.address))
+    assert bob.rc.buffer.pop_all() == []  # nothing arrives until the bus is drained
+
+    assert env2.bus.drain() == 1
+    assert env1.bus.drain() == 1
+    assert [m.content for m in bob.rc.buffer.pop_all()] == ['hello']
+    assert alice.rc.buffer.pop_all() == []
+    assert [m.content for m in env1.history] == [m.content for m in env2.history] == ['hello']
+
+    env1.bus.close()
+    env2.bus.close()
@@ -0,0 +1,515 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 19:00
+@Description:  Offline tests for concurrent graph execution, actions stand in for LLM calls
+"""
+import json
+import time
+import contextlib
+import asyncio
+import sqlite3
+import pytest
+
+from typing import Any, Dict, List
+from pydantic import Field
+from puti.llm.graph import Graph, Vertex
+from puti.llm.graph.cache import CachePolicy, MemoryResultStore, SqliteResultStore
+from puti.llm.graph.checkpoint import CheckpointStore
+from puti.llm.workflow import Workflow
+from puti.llm.actions import Action, MapAction
+from puti.llm.messages import Message
+from puti.llm.stream import ResultStream, iter_chunks
+from puti.constant.llm import VertexState
+from puti.utils import deadlines
+from puti.utils.rate_limit import TokenBucket
+
+
+class SleepAction(Action):
+    """ Waits `delay` seconds and reports what it received """
+    delay: float = 0.05
+    calls: List[Any] = Field(default_factory=list, exclude=True)
+    fail: bool = False
+
+    async def run(self, role, *args, **kwargs):
+        previous = kwargs.get('previous_result')
+        self.calls.append(previous)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f'{self.name} failed')
+        if isinstance(previous, dict):
+            return '+'.join(f'{k}:{v.content}' for k, v in sorted(previous.items()))
+        # `run` hands on the raw result, `run_dag` a Message
+        return self.name if previous is None else f'{getattr(previous, "content", previous)}>{self.name}'
+
+
+def _graph(*names: str, **options) -> Graph:
+    graph = Graph()
+    for name in names:
+        graph.add_vertex(Vertex(id=name, action=SleepAction(name=name, calls=[], **options.get(name, {}))))
+    return graph
+
+
+@pytest.mark.asyncio
+async def test_branches_overlap_and_join_receives_dict():
+    graph = _graph('start', 'mentions', 'tweet', 'join')
+    graph.add_edge('start', 'mentions')
+    graph.add_edge('start', 'tweet')
+    graph.add_edge('mentions', 'join')
+    graph.add_edge('tweet', 'join')
+    graph.set_start_vertex('start')
+
+    begin = time.perf_counter()
+    results = await graph.run_dag()
+    assert time.perf_counter() - begin < 0.18  # three levels of 0.05s, not four vertices in a row
+    assert results['join'] == 'mentions:start>mentions+tweet:start>tweet'
+    assert isinstance(graph.vertices['join'].action.calls[0], dict)
+    assert graph.execution_history[0] == 'start' and graph.execution_history[-1] == 'join'
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_caps_running_vertices():
+    graph = _graph('a', 'b', 'c', 'd')
+    begin = time.perf_counter()
+    results = await graph.run_dag(max_concurrency=2)  # no start vertex: every root runs
+    assert set(results) == {'a', 'b', 'c', 'd'}
+    assert time.perf_counter() - begin >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_conditional_edges_skip_the_untaken_branch():
+    graph = _graph('check', 'yes', 'no', 'after_no')
+    graph.add_edge('check', 'yes', condition=lambda value: value == 'check')
+    graph.add_edge('check', 'no', condition=lambda value: True)
+    graph.add_edge('no', 'after_no')
+    graph.set_start_vertex('check')
+
+    results = await graph.run_dag()
+    assert set(results) == {'check', 'yes'}
+    assert graph.vertices['no'].state == VertexState.SKIPPED
+    assert graph.vertices['after_no'].state == VertexState.SKIPPED
+
+
+@pytest.mark.asyncio
+async def test_cycles_are_bounded_by_max_steps():
+    graph = _graph('a', 'b')
+    graph.add_edge('a', 'b')
+    graph.add_edge('b', 'a')
+    graph.set_start_vertex('a')
+
+    await graph.run_dag(max_steps=5)
+    assert graph.execution_history == ['a', 'b', 'a', 'b', 'a']
+
+
+@pytest.mark.asyncio
+async def test_failure_stops_scheduling():
+    graph = _graph('a', 'b', 'c', b={'fail': True})
+    graph.add_edge('a', 'b')
+    graph.add_edge('b', 'c')
+    graph.set_start_vertex('a')
+
+    results = await graph.run_dag()
+    assert isinstance(results['b'], RuntimeError)
+    assert 'c' not in results and graph.vertices['c'].state == VertexState.PENDING
+
+
+@pytest.mark.asyncio
+async def test_prompt_reaches_start_vertex_only():
+    graph = _graph('a', 'b')
+    graph.add_edge('a', 'b')
+    graph.set_start_vertex('a')
+
+    results = await graph.run_dag(prompt='hello')
+    assert results == {'a': 'hello>a', 'b': 'hello>a>b'}
+
+
+def test_adjacency_is_compiled_once_and_invalidated():
+    graph = _graph('a', 'b', 'c')
+    graph.add_edge('a', 'b')
+    adjacency = graph.compile()
+    assert graph.compile() is adjacency
+    assert adjacency.direct == {'a': 'b'}
+
+    graph.add_edge('a', 'c', condition=lambda value: True)
+    assert graph.compile() is not adjacency
+    assert [edge.target for edge in graph.get_outgoing_edges('a')] == ['b', 'c']
+    assert 'a' not in graph.compile().direct
+
+
+@pytest.mark.asyncio
+async def test_workflow_runs_edge_views_of_the_same_graph():
+    graph = _graph('a', 'b', 'c', 'd')
+    graph.add_edge('a', 'b')
+    graph.add_edge('b', 'c')
+    graph.add_edge('c', 'd')
+    graph.set_start_vertex('a')
+    workflow = Workflow(graph=graph)
+
+    assert list(await workflow.run_until_vertex('b')) == ['a', 'b']
+    assert graph.execution_history == ['a', 'b']
+    assert list(await workflow.run_subgraph('b', end_vertex_ids=['d'])) == ['b', 'c']
+    assert list(await workflow.run()) == ['a', 'b', 'c', 'd']
+    assert len(graph.compile().outgoing['c']) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('store', ['memory', 'sqlite'])
+async def test_cached_vertex_skips_repeated_inputs(tmp_path, store):
+    store = MemoryResultStore() if store == 'memory' else SqliteResultStore(tmp_path / 'cache.sqlite')
+    graph = _graph('topic', 'tweet')
+    graph.vertices['topic'].cache = CachePolicy(store=store)
+    graph.add_edge('topic', 'tweet')
+    graph.set_start_vertex('topic')
+
+    first = await graph.run(prompt='crypto')
+    assert graph.get_execution_stats()['cache_hit_count'] == 0
+    assert await graph.run(prompt='crypto') == first
+    stats = graph.get_execution_stats()
+    assert stats['cache_hits'] == ['topic'] and stats['cache_hit_count'] == 1
+    assert len(graph.vertices['topic'].action.calls) == 1
+    assert len(graph.vertices['tweet'].action.calls) == 2
+
+    await graph.run(prompt='ai')  # other input, other key
+    assert len(graph.vertices['topic'].action.calls) == 2
+    graph.vertices['topic'].action.delay = 0.01  # other action config, other key
+    await graph.run(prompt='crypto')
+    assert len(graph.vertices['topic'].action.calls) == 3
+
+
+class TopicAction(Action):
+    """ Reads a run kwarg other than the prompt """
+    calls: List[Any] = Field(default_factory=list, exclude=True)
+
+    async def run(self, role, *args, **kwargs):
+        self.calls.append(kwargs['topic'])
+        return f"tweet about {kwargs['topic']}"
+
+
+@pytest.mark.asyncio
+async def test_cache_key_covers_other_run_kwargs():
+    graph = Graph()
+    graph.add_vertex(Vertex(id='tweet', action=TopicAction(name='tweet'), cache=CachePolicy()))
+
+    assert (await graph.run(topic='cats'))['tweet'] == 'tweet about cats'
+    assert (await graph.run(topic='dogs'))['tweet'] == 'tweet about dogs'
+    assert graph.get_execution_stats()['cache_hit_count'] == 0
+    assert (await graph.run(topic='cats'))['tweet'] == 'tweet about cats'
+    assert graph.get_execution_stats()['cache_hit_count'] == 1
+    assert graph.vertices['tweet'].action.calls == ['cats', 'dogs']
+
+
+class BrokenDeleteStore(MemoryResultStore):
+    def delete(self, key: str):
+        raise sqlite3.OperationalError('database is locked')
+
+
+@pytest.mark.asyncio
+async def test_unkeyable_inputs_and_store_errors_run_uncached():
+    graph = Graph()
+    graph.add_vertex(Vertex(id='tweet', action=TopicAction(name='tweet'), cache=CachePolicy()))
+    # an object known only by its address would never match in another process, so it is not cached
+    topic = object()
+    await graph.run(topic=topic)
+    await graph.run(topic=topic)
+    assert graph.vertices['tweet'].action.calls == [topic, topic] and graph.vertices['tweet'].is_successful
+
+    graph.vertices['tweet'].cache = CachePolicy(ttl=0.01, store=BrokenDeleteStore())
+    await graph.run(topic='cats')
+    await asyncio.sleep(0.02)
+    assert (await graph.run(topic='cats'))['tweet'] == 'tweet about cats'  # the expired entry is a miss
+    assert graph.vertices['tweet'].action.calls[2:] == ['cats', 'cats']
+
+
+@pytest.mark.asyncio
+async def test_cancelled_run_dag_leaves_nothing_running():
+    graph = _graph('a', 'b', a={'delay': 0.3}, b={'delay': 0.3})
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(graph.run_dag(), 0.1)
+    await asyncio.sleep(0.3)
+    assert graph.vertices['a'].state == graph.vertices['b'].state == VertexState.CANCELLED
+
+
+@pytest.mark.asyncio
+async def test_cache_entries_expire_and_failures_are_not_cached():
+    graph = _graph('a', a={'fail': True})
+    graph.vertices['a'].cache = CachePolicy(ttl=0.05)
+    await graph.run()
+    await graph.run()
+    assert len(graph.vertices['a'].action.calls) == 2
+
+    graph.vertices['a'].action.fail = False
+    await graph.run()
+    await graph.run()
+    assert len(graph.vertices['a'].action.calls) == 3
+    await asyncio.sleep(0.06)
+    await graph.run()
+    assert len(graph.vertices['a'].action.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_resume_continues_after_the_last_successful_vertex(tmp_path):
+    store = CheckpointStore(tmp_path / 'graph.sqlite')
+    graph = _graph('generate', 'review', 'post', post={'fail': True})
+    graph.checkpoints = store
+    graph.add_edge('generate', 'review')
+    graph.add_edge('review', 'post')
+    graph.set_start_vertex('generate')
+    workflow = Workflow(graph=graph)
+
+    results = await workflow.run(run_id='task-1', prompt='topic')
+    assert isinstance(results['post'], RuntimeError)
+    assert store.latest('task-1').next_vertex_id == 'post'
+
+    graph.vertices['post'].action.fail = False
+    results = await Workflow(graph=graph).resume('task-1')
+    assert results == {'generate': 'topic>generate', 'review': 'topic>generate>review',
+                       'post': 'topic>generate>review>post'}
+    assert [len(graph.vertices[v].action.calls) for v in ('generate', 'review', 'post')] == [1, 1, 2]
+    assert graph.execution_history == ['generate', 'review', 'post']
+
+    assert await workflow.resume('task-1') == results  # finished, nothing runs again
+    assert len(graph.vertices['post'].action.calls) == 2
+    with pytest.raises(ValueError):
+        await workflow.resume('unknown')
+
+
+@pytest.mark.asyncio
+async def test_run_parallel_caps_concurrency_and_times_out_vertices():
+    graph = _graph('a', 'b', 'c', 'slow', slow={'delay': 1})
+    begin = time.perf_counter()
+    results = await graph.run_parallel(['a', 'b', 'c', 'slow'], max_concurrency=2, timeout=0.2)
+    assert 0.2 <= time.perf_counter() - begin < 0.5  # two slots: a, b | c, slow cut at 0.2s
+    assert results['a'] == 'a' and results['c'] == 'c'
+    assert graph.vertices['slow'].state == VertexState.FAILED
+    assert isinstance(results['slow'], asyncio.TimeoutError)
+
+
+@pytest.mark.asyncio
+async def test_run_parallel_fail_fast_cancels_siblings():
+    graph = _graph('broken', 'slow', 'queued', broken={'fail': True}, slow={'delay': 1}, queued={'delay': 1})
+    begin = time.perf_counter()
+    results = await graph.run_parallel(['broken', 'slow', 'queued'], max_concurrency=2, fail_fast=True)
+    assert time.perf_counter() - begin < 0.5
+    assert graph.vertices['broken'].state == VertexState.FAILED
+    assert graph.vertices['slow'].state == graph.vertices['queued'].state == VertexState.CANCELLED
+    assert isinstance(results['slow'], asyncio.CancelledError)
+    assert graph.get_execution_stats()['cancelled_vertices'] == ['slow', 'queued']
+
+
+@pytest.mark.asyncio
+async def test_run_parallel_deadline_reaches_llm_calls():
+    seen = {}
+
+    class BoundAction(SleepAction):
+        async def run(self, role, *args, **kwargs):
+            seen[self.name] = deadlines.bound(30)  # what an llm request would get as its timeout
+            return await super().run(role, *args, **kwargs)
+
+    graph = Graph()
+    for name in ('first', 'second', 'late'):
+        graph.add_vertex(Vertex(id=name, action=BoundAction(name=name, delay=0.2 if name != 'late' else 0.01)))
+    results = await graph.run_parallel(['first', 'second', 'late'], max_concurrency=2, deadline=0.15)
+    assert 0 < seen['first'] <= 0.15 and 'late' not in seen
+    assert isinstance(results['first'], asyncio.TimeoutError)  # in flight when the deadline passed
+    assert graph.vertices['late'].state == VertexState.CANCELLED  # never started
+    assert deadlines.remaining() is None
+
+
+class EchoAction(Action):
+    async def run(self, role, *args, **kwargs):
+        return kwargs['prompt']
+
+
+class ItemAction(Action):
+    """ Doubles its item after `delay`, fails on negative items """
+    delay: float = 0.05
+    roles: List[Any] = Field(default_factory=list, exclude=True)
+
+    async def run(self, role, *args, **kwargs):
+        self.roles.append(role)
+        role.rc.memory.storage.append(Message.from_any(str(kwargs['item'])))
+        await asyncio.sleep(self.delay)
+        if kwargs['item'] < 0:
+            raise ValueError(f"negative item {kwargs['item']}")
+        return kwargs['item'] * 2
+
+
+@pytest.mark.asyncio
+async def test_map_vertex_fans_out_over_the_previous_result():
+    graph = Graph()
+    items = ItemAction(name='double')
+    graph.add_vertex(Vertex(id='list', action=EchoAction(name='list')))
+    graph.add_vertex(Vertex(id='map', action=MapAction(action=items, concurrency=3)))
+    graph.add_edge('list', 'map')
+    graph.set_start_vertex('list')
+
+    begin = time.perf_counter()
+    results = await graph.run_dag(prompt='[1, 2, -3, 4, 5, 6]')  # a JSON list as an llm would answer
+    assert time.perf_counter() - begin < 0.2  # two rounds of three, not six in a row
+    mapped = graph.shared_context['map'].instruct_content
+    assert [r.result for r in mapped.succeeded] == [2, 4, 8, 10, 12]
+    assert [(r.item, r.error) for r in mapped.failed] == [(-3, 'ValueError: negative item -3')]
+    assert json.loads(results['map'])[2] == {'item': -3, 'result': None, 'error': 'ValueError: negative item -3'}
+    # every item ran on its own copy of the role, sharing the llm node
+    vertex_role = graph.vertices['map'].role
+    assert len({id(role) for role in items.roles}) == 6 and vertex_role not in items.roles
+    assert all(len(role.rc.memory.storage) == 1 and role.llm is vertex_role.llm for role in items.roles)
+    assert vertex_role.rc.memory.storage == []
+
+
+@pytest.mark.asyncio
+async def test_map_items_share_a_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    action = MapAction(action=ItemAction(name='double', delay=0), items=list(range(6)), concurrency=6, rate_limit=bucket)
+    begin = time.perf_counter()
+    message = await action.run(Vertex(id='v', action=action).role)
+    assert 0.18 <= time.perf_counter() - begin < 1  # a burst of two, then one every 0.05s
+    assert [r.result for r in message.instruct_content.results] == [0, 2, 4, 6, 8, 10]
+
+
+class DelayAction(Action):
+    """ Sleeps as many seconds as its prompt says, a negative prompt fails """
+
+    async def run(self, role, *args, **kwargs):
+        delay = float(kwargs['prompt'])
+        role.rc.memory.storage.append(Message.from_any(kwargs['prompt']))
+        if delay < 0:
+            raise ValueError('negative delay')
+        await asyncio.sleep(delay)
+        return f'{delay}:{len(role.rc.memory.storage)}'
+
+
+@pytest.mark.asyncio
+async def test_run_batch_streams_results_in_completion_order():
+    graph = Graph()
+    graph.add_vertex(Vertex(id='wait', action=DelayAction(name='wait')))
+    graph.add_vertex(Vertex(id='after', action=SleepAction(name='after', delay=0)))
+    graph.add_edge('wait', 'after')
+    graph.set_start_vertex('wait')
+    workflow = Workflow(graph=graph)
+
+    begin = time.perf_counter()
+    batch = [result async for result in workflow.run_batch(['0.2', '0.05', '-1', '0.15', '0.02'], concurrency=3)]
+    assert time.perf_counter() - begin < 0.35
+    assert [result.index for result in batch] == [2, 1, 4, 3, 0]
+    assert [result.ok for result in batch] == [False, True, True, True, True]
+    assert isinstance(batch[0].results['wait'], ValueError)
+    # every run had its own vertices and conversation: one message each, the template graph untouched
+    assert batch[-1].results == {'wait': '0.2:1', 'after': '0.2:1>after'}
+    assert graph.vertices['wait'].state == VertexState.PENDING and graph.execution_history == []
+
+
+@pytest.mark.asyncio
+async def test_leaving_run_batch_early_cancels_the_rest():
+    graph = _graph('slow', slow={'delay': 0.3})
+    graph.add_vertex(Vertex(id='wait', action=DelayAction(name='wait')))
+    graph.add_edge('wait', 'slow')
+    graph.set_start_vertex('wait')
+
+    begin = time.perf_counter()
+    async with contextlib.aclosing(Workflow(graph=graph).run_batch(['0'] * 6, concurrency=2)) as batch:
+        async for result in batch:
+            break
+    assert time.perf_counter() - begin < 0.45 and result.index in (0, 1)
+    await asyncio.sleep(0.4)
+    # runs in flight were cancelled and the remaining inputs never started
+    assert len(graph.vertices['slow'].action.calls) <= 4
+
+
+class WordsAction(Action):
+    """ Streams `words` one at a time, `delay` apart """
+    words: List[str] = Field(default_factory=lambda: ['one', 'two', 'three'])
+    delay: float = 0.05
+    fail: bool = False
+
+    async def run(self, role, *args, **kwargs):
+        return ''.join([chunk async for chunk in self.stream(role)])
+
+    async def stream(self, role, *args, **kwargs):
+        for position, word in enumerate(self.words):
+            await asyncio.sleep(self.delay)
+            if self.fail and position == 1:
+                raise RuntimeError(f'{self.name} failed')
+            yield word if position == 0 else f' {word}'
+
+
+class CountingReaderAction(Action):
+    """ Reads its input chunk by chunk, noting when each chunk arrived """
+    consumes_stream = True
+    arrivals: List[float] = Field(default_factory=list, exclude=True)
+    fail: bool = False
+
+    async def run(self, role, *args, **kwargs):
+        words = []
+        async for chunk in iter_chunks(kwargs.get('previous_result')):
+            self.arrivals.append(time.perf_counter())
+            words.append(chunk.strip().upper())
+        if self.fail:
+            raise RuntimeError(f'{self.name} failed')
+        return '-'.join(words)
+
+
+@pytest.mark.asyncio
+async def test_streaming_edge_feeds_chunks_while_the_source_runs():
+    reader = CountingReaderAction(name='read')
+    graph = Graph()
+    graph.add_vertices(Vertex(id='words', action=WordsAction(name='words')), Vertex(id='read', action=reader))
+    graph.add_vertex(Vertex(id='after', action=SleepAction(name='after', delay=0)))
+    graph.add_edge('words', 'read', stream=True)
+    graph.add_edge('read', 'after')
+    graph.set_start_vertex('words')
+
+    begin = time.perf_counter()
+    results = await graph.run()
+    # chunks were read as they were produced, not all at once when the source was done
+    assert reader.arrivals[0] - begin < 0.1 and reader.arrivals[-1] - reader.arrivals[0] > 0.08
+    assert results == {'words': 'one two three', 'read': 'ONE-TWO-THREE', 'after': 'ONE-TWO-THREE>after'}
+    assert graph.shared_context['words'].content == 'one two three'
+    assert graph.execution_history == ['words', 'read', 'after']
+
+    # a target that does not read streams gets the assembled result, and `run_dag` does not stream
+    graph.vertices['read'] = Vertex(id='read', action=SleepAction(name='read', delay=0))
+    assert (await graph.run())['read'] == 'one two three>read'
+    assert (await graph.run_dag())['read'] == 'one two three>read'
+
+
+@pytest.mark.asyncio
+async def test_streaming_edge_failure_cancels_the_target():
+    graph = Graph()
+    graph.add_vertices(
+        Vertex(id='words', action=WordsAction(name='words', fail=True)),
+        Vertex(id='read', action=CountingReaderAction(name='read')),
+    )
+    graph.add_edge('words', 'read', stream=True)
+    graph.set_start_vertex('words')
+
+    results = await graph.run()
+    assert isinstance(results['words'], RuntimeError) and 'read' not in results
+    assert graph.vertices['read'].state in (VertexState.CANCELLED, VertexState.FAILED)
+
+    with pytest.raises(ValueError, match='cannot have a condition'):
+        graph.add_edge('words', 'read', condition=bool, stream=True)
+
+    stream = ResultStream()
+    stream.close('whole result')
+    assert [chunk async for chunk in stream] == ['whole result'] and (await stream).content == 'whole result'
+
+
+@pytest.mark.asyncio
+async def test_streaming_target_resumes_from_the_source_checkpoint(tmp_path):
+    store = CheckpointStore(tmp_path / 'graph.sqlite')
+    graph = Graph(checkpoints=store)
+    graph.add_vertices(
+        Vertex(id='words', action=WordsAction(name='words', delay=0)),
+        Vertex(id='read', action=CountingReaderAction(name='read', fail=True)),
+    )
+    graph.add_edge('words', 'read', stream=True)
+    graph.set_start_vertex('words')
+
+    results = await graph.run(run_id='stream-1')
+    assert isinstance(results['read'], RuntimeError)
+    checkpoint = store.latest('stream-1')
+    assert (checkpoint.step, checkpoint.next_vertex_id, checkpoint.execution_history) == (1, 'read', ['words'])
+
+    graph.vertices['read'].action.fail = False
+    results = await graph.run(run_id='stream-1', resume=True, max_steps=2)
+    assert results['read'] == 'ONE TWO THREE' and graph.execution_history == ['words', 'read']
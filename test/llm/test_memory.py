@@ -0,0 +1,371 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 11:40
+@Description:  Tests for long-term memory persistence, using a deterministic offline embedding node
+"""
+import gc
+import time
+import faiss
+import numpy as np
+import pytest
+
+from typing import List
+from puti.db.memory_shard import MemoryShard, _shards, migrate_legacy_store
+from puti.db.retention import RetentionConfig
+from puti.db.text_store import TextStore, TextMeta
+from puti.db.wal import VectorWAL
+from puti.llm.memory import Memory
+from puti.llm.messages import UserMessage, AssistantMessage
+from benchmarks.fakes import HashEmbeddingNode
+from puti.llm.roles import Role
+
+
+def _memory(tmp_path, **kwargs) -> Memory:
+    return Memory(
+        llm=HashEmbeddingNode(dim=8),
+        data_dir=tmp_path,
+        wal_fsync=False,
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_appends_to_wal_without_rewriting_index(tmp_path):
+    memory = _memory(tmp_path)
+    for i in range(5):
+        await memory.add_one(UserMessage(content=f'question {i}'))
+
+    shard = memory.shard
+    assert shard.index.ntotal == 5
+    assert faiss.read_index(str(shard.index_file)).ntotal == 0
+    assert [r.seq for r in shard.wal.replay()] == [0, 1, 2, 3, 4]
+
+    memory.checkpoint(wait=True)
+    assert faiss.read_index(str(shard.index_file)).ntotal == 5
+    assert not shard.wal_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_size_triggered_checkpoint(tmp_path):
+    memory = _memory(tmp_path, checkpoint_every=3)
+    for i in range(4):
+        await memory.add_one(AssistantMessage(content=f'answer {i}'))
+    memory.shard.join()
+
+    assert faiss.read_index(str(memory.shard.index_file)).ntotal == 3
+    assert [r.seq for r in memory.shard.wal.replay()] == [3]
+
+
+@pytest.mark.asyncio
+async def test_recovery_replays_wal(tmp_path):
+    memory = _memory(tmp_path, checkpoint_every=2)
+    for i in range(3):
+        await memory.add_one(UserMessage(content=f'question {i}'))
+    memory.shard.join()
+
+    # A fresh shard sees the checkpoint plus the WAL tail, as after a crash
+    reloaded = MemoryShard(memory.shard.directory)
+    reloaded.open()
+    assert reloaded.index.ntotal == 3
+    assert reloaded.texts == [f'User asked: question {i}' for i in range(3)]
+
+
+def test_wal_cuts_torn_tail(tmp_path):
+    wal = VectorWAL(tmp_path / 'index.wal', fsync=False)
+    wal.append_many(0, np.ones((2, 4), dtype='float32'), ['a', 'b'])
+    wal.close()
+    with open(wal.path, 'ab') as f:
+        f.write(b'\x10\x00\x00')  # half a header from an interrupted write
+
+    records = wal.replay()
+    assert [r.text for r in records] == ['a', 'b']
+    assert len(wal.replay()) == 2
+
+    wal.compact(keep_from_seq=1)
+    assert [r.seq for r in wal.replay()] == [1]
+
+
+@pytest.mark.asyncio
+async def test_dedup_through_hash_set(tmp_path):
+    memory = _memory(tmp_path)
+    for _ in range(3):
+        await memory.add_one(UserMessage(content='same question'))
+    assert memory.llm.embedding_calls == 1
+    assert memory.contains('User asked: same question')
+
+    memory.checkpoint(wait=True)
+    reloaded = _memory(tmp_path)
+    assert reloaded.contains('User asked: same question')
+    await reloaded.add_one(UserMessage(content='same question'))
+    assert reloaded.llm.embedding_calls == 0
+
+    reloaded.clear()
+    assert not reloaded.contains('User asked: same question')
+    assert not reloaded.shard.hash_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_namespaces_are_isolated(tmp_path):
+    alice = _memory(tmp_path, namespace='acme/alice')
+    bob = _memory(tmp_path, namespace='acme/bob')
+    await alice.add_one(UserMessage(content='alice secret'))
+    await bob.add_one(UserMessage(content='bob secret'))
+
+    assert (tmp_path / 'acme' / 'alice' / 'index.wal').exists()
+    assert alice.shard.texts == ['User asked: alice secret']
+    assert bob.shard.texts == ['User asked: bob secret']
+    assert not bob.contains('User asked: alice secret')
+
+
+@pytest.mark.asyncio
+async def test_search_across_namespaces(tmp_path):
+    alice = _memory(tmp_path, namespace='alice', min_score=0)
+    bob = _memory(tmp_path, namespace='bob')
+    await alice.add_batch([UserMessage(content=f'alice topic {i}') for i in range(3)])
+    await bob.add_batch([UserMessage(content='bob topic'), UserMessage(content='alice topic 1')])
+
+    assert sorted(await alice.search('anything', top_k=10)) == [f'User asked: alice topic {i}' for i in range(3)]
+    # merged by score over both shards, the text stored in both namespaces only once
+    found = await alice.search('anything', top_k=10, namespaces=['alice', 'bob'], with_scores=True)
+    assert sorted(text for text, _ in found) == sorted(
+        [f'User asked: alice topic {i}' for i in range(3)] + ['User asked: bob topic']
+    )
+    assert [score for _, score in found] == sorted((score for _, score in found), reverse=True)
+    assert await alice.search('anything', top_k=2, namespaces=['alice', 'bob']) == [text for text, _ in found[:2]]
+
+    # the query itself is not a result, and neither is anything below min_score
+    assert 'User asked: bob topic' not in await alice.search('User asked: bob topic', namespaces=['bob'], top_k=10)
+    alice.min_score = max(score for _, score in found) + 1e-3
+    assert await alice.search('anything', top_k=10, namespaces=['alice', 'bob']) == []
+    assert await alice.search('anything', namespaces=['missing']) == []
+
+
+@pytest.mark.asyncio
+async def test_role_memory_reads_the_default_namespace(tmp_path):
+    assert Role(name='writer').rc.memory.shared_namespaces == ['default']
+    shared = _memory(tmp_path, min_score=0)
+    await shared.add_one(UserMessage(content='from before namespaces'))
+    own = _memory(tmp_path, namespace='writer', shared_namespaces=['default'], min_score=0)
+    await own.add_one(UserMessage(content='written by the role'))
+
+    found = await own.search('anything', top_k=5)
+    assert sorted(found) == ['User asked: from before namespaces', 'User asked: written by the role']
+    assert await own.search('anything', top_k=5, namespaces='writer') == ['User asked: written by the role']
+
+
+def test_writers_sharing_a_data_dir(tmp_path):
+    # Two shard instances on one directory stand in for two worker processes
+    first = MemoryShard(tmp_path, checkpoint_every=2, wal_fsync=False)
+    second = MemoryShard(tmp_path, checkpoint_every=2, wal_fsync=False)
+    first.open(4)
+    second.open(4)
+    vectors = np.eye(4, dtype='float32')
+
+    for shard, i in ((first, 0), (second, 1)):
+        assert shard.claim(f'text {i}')
+        shard.append(vectors[i:i + 1], [f'text {i}'])
+        shard.join()
+    first.claim('text 2')
+    first.append(vectors[2:3], ['text 2'])
+    assert second.claim('text 2')  # not seen yet
+    assert second.append(vectors[2:3], ['text 2']) == 0  # logged by the other writer meanwhile
+    first.join()
+
+    second.refresh()
+    expected = ['text 0', 'text 1', 'text 2']
+    assert first.texts == second.texts == expected
+    assert first.index.ntotal == second.index.ntotal == 3
+    reloaded = MemoryShard(tmp_path)
+    reloaded.open()
+    assert reloaded.texts == expected
+
+
+@pytest.mark.asyncio
+async def test_lazy_shared_shard(tmp_path):
+    first = _memory(tmp_path, namespace='role')
+    second = _memory(tmp_path, namespace='role')
+    assert not any(tmp_path.iterdir())  # construction touches neither disk nor the embedding model
+
+    await first.add_one(UserMessage(content='hello'))
+    assert second.shard is first.shard
+    assert second.contains('User asked: hello')
+
+    directory = first.shard.directory
+    del first
+    gc.collect()
+    assert directory in _shards
+    del second
+    gc.collect()
+    assert directory not in _shards
+
+
+def test_text_store_round_trip(tmp_path):
+    path = tmp_path / 'index.texts'
+    store = TextStore(path)
+    store.extend(['plain', 'two\nlines', ''], [TextMeta('user', 1.5, 'm1'), None, TextMeta('bob', 2.0, 'm3')])
+    TextStore.write(path, *store.snapshot(2))
+    store.rebase(2)
+    assert store.base_count == 2
+
+    store.append('café ☕')
+    TextStore.write(path, *store.snapshot(len(store)))
+    loaded = TextStore.load(path)
+    assert list(loaded) == ['plain', 'two\nlines', '', 'café ☕']
+    assert loaded.meta(0) == TextMeta('user', 1.5, 'm1')
+    assert loaded.meta(2) == TextMeta('bob', 2.0, 'm3')
+    assert loaded[1:3] == ['two\nlines', '']
+
+
+@pytest.mark.asyncio
+async def test_multi_line_texts_keep_their_vector_ids(tmp_path):
+    memory = _memory(tmp_path, namespace='lines')
+    msg = UserMessage(content='first line\nsecond line')
+    await memory.add_one(msg)
+    await memory.add_one(AssistantMessage(content='ok'))
+    memory.checkpoint(wait=True)
+
+    reloaded = MemoryShard(memory.shard.directory)
+    reloaded.open()
+    assert list(reloaded.texts) == ['User asked: first line\nsecond line', 'You responded: ok']
+    assert reloaded.texts.meta(0).msg_id == msg.id
+    assert reloaded.texts.meta(1).role == 'assistant'
+
+
+def _filled_shard(tmp_path, retention: RetentionConfig, stamps) -> MemoryShard:
+    shard = MemoryShard(tmp_path, retention=retention, wal_fsync=False)
+    shard.open(4)
+    vectors = np.random.default_rng(2).random((len(stamps), 4), dtype='float32')
+    shard.append(vectors, [f'text {i}' for i in range(len(stamps))], [TextMeta(timestamp=t) for t in stamps])
+    return shard
+
+
+def test_retention_hides_then_compacts(tmp_path):
+    now = time.time()
+    shard = _filled_shard(tmp_path, RetentionConfig(ttl=60, max_entries=3), [now - 120, now, now, now, now])
+
+    _, ids, texts = shard.search(np.zeros((1, 4), dtype='float32'), k=5)
+    assert sorted(i for i in ids[0] if i >= 0) == [2, 3, 4]  # 0 expired, 1 over capacity
+    assert sorted(t for t in texts[0] if t is not None) == ['text 2', 'text 3', 'text 4']
+
+    assert shard.compact() == 2
+    assert list(shard.texts) == ['text 2', 'text 3', 'text 4']
+    assert shard.index.ntotal == 3
+    assert not shard.contains('text 0')
+
+    reloaded = MemoryShard(tmp_path)
+    reloaded.open()
+    assert list(reloaded.texts) == ['text 2', 'text 3', 'text 4']
+
+
+def test_other_writer_reloads_after_compaction(tmp_path):
+    now = time.time()
+    shard = _filled_shard(tmp_path, RetentionConfig(max_entries=2), [now] * 4)
+    other = MemoryShard(tmp_path, wal_fsync=False)
+    other.open()
+    assert other.ntotal == 4
+
+    shard.compact()
+    other.claim('new')
+    other.append(np.ones((1, 4), dtype='float32'), ['new'])
+    assert list(other.texts) == ['text 2', 'text 3', 'new']
+    shard.refresh()
+    assert list(shard.texts) == list(other.texts)
+
+
+def test_legacy_store_is_imported_once(tmp_path):
+    legacy = faiss.IndexFlatL2(4)
+    legacy.add(np.eye(4, dtype='float32')[:3])
+    faiss.write_index(legacy, str(tmp_path / 'index.faiss'))
+    (tmp_path / 'index.txt').write_text('User asked: a\nUser asked: b\nUser asked: c\n', encoding='utf-8')
+    shard = MemoryShard(tmp_path / 'default', wal_fsync=False)
+    shard.open(4)
+    shard.claim('User asked: b')
+    shard.append(np.eye(4, dtype='float32')[1:2], ['User asked: b'])
+
+    assert migrate_legacy_store(shard, tmp_path / 'index.faiss', tmp_path / 'index.txt') == 2
+    assert list(shard.texts) == ['User asked: b', 'User asked: a', 'User asked: c']
+    assert shard.search(np.eye(4, dtype='float32')[2:3], k=1)[2] == [['User asked: c']]
+    assert not (tmp_path / 'index.faiss').exists() and (tmp_path / 'index.faiss.migrated').exists()
+    assert migrate_legacy_store(shard, tmp_path / 'index.faiss', tmp_path / 'index.txt') == 0
+
+
+def test_mismatched_legacy_store_is_left_alone(tmp_path):
+    legacy = faiss.IndexFlatL2(4)
+    legacy.add(np.eye(4, dtype='float32')[:3])
+    faiss.write_index(legacy, str(tmp_path / 'index.faiss'))
+    # a text holding a line break, split over two lines: the pairs no longer line up
+    (tmp_path / 'index.txt').write_text('User asked: a\nUser asked: b\ncontinued\nUser asked: c\n', encoding='utf-8')
+    shard = MemoryShard(tmp_path / 'default', wal_fsync=False)
+    shard.open(4)
+
+    assert migrate_legacy_store(shard, tmp_path / 'index.faiss', tmp_path / 'index.txt') == 0
+    assert shard.ntotal == 0 and (tmp_path / 'index.faiss').exists() and (tmp_path / 'index.txt').exists()
+
+
+def test_near_duplicates_collapse_at_insert(tmp_path):
+    shard = MemoryShard(tmp_path, retention=RetentionConfig(dedup_threshold=0.99), wal_fsync=False)
+    shard.open(4)
+    base = np.array([[1, 0, 0, 0]], dtype='float32')
+    assert shard.append(base, ['User asked: status?']) == 1
+    assert shard.append(base * 1.001, ['User asked: status? ']) == 0
+    assert shard.append(np.array([[0, 1, 0, 0]], dtype='float32'), ['User asked: other']) == 1
+
+
+@pytest.mark.asyncio
+async def test_add_batch_embeds_once(tmp_path):
+    memory = _memory(tmp_path, namespace='batch')
+    await memory.add_one(UserMessage(content='q0'))
+    messages = [UserMessage(content=f'q{i % 5}') for i in range(10)] + [AssistantMessage(content='a')]
+
+    assert await memory.add_batch(messages) == 5  # q1..q4 and the answer, q0 and repeats skipped
+    assert memory.llm.batch_calls == 1
+    assert memory.llm.embedding_calls == 1
+    assert len(memory.storage) == 12
+    assert [r.seq for r in memory.shard.wal.replay()] == list(range(6))
+    assert memory.shard.texts[5] == 'You responded: a'
+
+
+class FixedEmbeddingNode(HashEmbeddingNode):
+    """ Returns preset vectors, so scores are known up front """
+    dim: int = 2
+    vectors: dict = {}
+
+    def _vector(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+@pytest.mark.asyncio
+async def test_cosine_search_scores_and_thresholds(tmp_path):
+    angle = {'User asked: q': 0, 'User asked: near': 20, 'User asked: nearer': 10, 'User asked: far': 80}
+    vectors = {text: [np.cos(np.radians(a)) * 3, np.sin(np.radians(a)) * 3] for text, a in angle.items()}
+    vectors['q'] = vectors['User asked: q']
+    memory = Memory(llm=FixedEmbeddingNode(vectors=vectors), data_dir=tmp_path, namespace='cos', wal_fsync=False)
+    await memory.add_batch([UserMessage(content=c) for c in ('q', 'near', 'nearer', 'far')])
+
+    # unnormalized input is stored normalized, so scores are plain cosines
+    results = await memory.search('q', top_k=2, with_scores=True)
+    assert [text for text, _ in results] == ['User asked: nearer', 'User asked: near']
+    assert results[0][1] == pytest.approx(np.cos(np.radians(10)), abs=1e-5)
+
+    # the exact match is skipped without costing a result slot
+    assert await memory.search('q', top_k=1) == ['User asked: nearer']
+    memory.min_score = 0.95
+    assert await memory.search('q', top_k=3) == ['User asked: nearer']
+
+
+@pytest.mark.asyncio
+async def test_search_many_embeds_queries_once(tmp_path):
+    memory = _memory(tmp_path, namespace='many', min_score=0)
+    await memory.add_batch([UserMessage(content=f'q{i}') for i in range(6)])
+    other = _memory(tmp_path, namespace='other')
+    await other.add_one(UserMessage(content='q1'))
+    calls = memory.llm.batch_calls
+
+    queries = ['User asked: q1', 'User asked: q4', 'something else']
+    results = await memory.search_many(queries, top_k=3, namespaces=['many', 'other'])
+    assert memory.llm.batch_calls == calls + 1
+    assert len(results) == 3
+    for query, found in zip(queries, results):
+        assert found == await memory.search(query, top_k=3, namespaces=['many', 'other'])
+        assert len(found) == len(set(found)) == 3
+    assert await memory.search_many([]) == []
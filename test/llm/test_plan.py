@@ -0,0 +1,96 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 22:30
+@Description:  Offline tests for declarative workflows and their compiled-plan cache
+"""
+import os
+import json
+import asyncio
+import pytest
+
+from pydantic import ValidationError
+from puti.llm.actions import Action
+from puti.llm.graph.plan import load_plan, compile_plan, clear_plans, register_action, register_condition
+from puti.constant.llm import VertexState
+
+
+@register_action('plan_echo')
+class EchoAction(Action):
+    """ Returns its rendered prompt, with the role that ran it """
+
+    async def run(self, role, *args, **kwargs):
+        return f'{role.name}:{self.render_prompt(**kwargs)}'
+
+
+register_condition('plan_is_short', lambda value: len(str(value)) < 40)
+
+SPEC = """
+name: echo
+roles:
+  writer: {type: role, args: {name: writer}}
+vertices:
+  draft:
+    action: plan_echo
+    role: writer
+    args: {prompt: "draft about {{ topic }}"}
+  short:
+    action: plan_echo
+    args: {prompt: "short {{ previous_result }}"}
+edges:
+  - {source: draft, target: short, condition: plan_is_short}
+"""
+
+
+@pytest.fixture(autouse=True)
+def plans():
+    clear_plans()
+    yield
+    clear_plans()
+
+
+def test_yaml_compiles_and_forks_run_independently(tmp_path):
+    path = tmp_path / 'echo.yaml'
+    path.write_text(SPEC)
+    plan = load_plan(path)
+    assert plan.name == 'echo' and plan.start == 'draft' and plan.edges == (('draft', 'short'),)
+    with pytest.raises(ValidationError):
+        plan.name = 'changed'
+
+    first, second = plan.graph(), plan.graph()
+    results = asyncio.run(first.run(topic='cats'))
+    assert results['draft'] == 'writer:draft about cats'
+    assert results['short'] == 'Anonymous:short writer:draft about cats'
+    assert first.get_vertex('short').state == VertexState.SUCCESS
+    assert second.get_vertex('short').state == VertexState.PENDING and second.vertices['draft'].result is None
+    # one role instance per declared role, isolated per run
+    assert first.vertices['draft'].role is not second.vertices['draft'].role
+
+
+def test_cache_follows_mtime_and_content(tmp_path):
+    path = tmp_path / 'echo.json'
+    spec = {'vertices': {'only': {'action': 'plan_echo', 'args': {'prompt': 'hi'}}}}
+    path.write_text(json.dumps(spec))
+    plan = load_plan(path)
+    assert load_plan(str(path)) is plan and plan.name == 'echo'
+
+    # touched but unchanged: re-hashed, not recompiled
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    assert load_plan(path) is plan
+
+    spec['vertices']['only']['args']['prompt'] = 'hello'
+    path.write_text(json.dumps(spec))
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 2 * 10 ** 9))
+    changed = load_plan(path)
+    assert changed is not plan and changed.digest != plan.digest
+
+
+def test_invalid_specs_fail_at_compile_time():
+    with pytest.raises(ValueError, match='Cannot import action'):
+        compile_plan({'vertices': {'v': {'action': 'tests.never.Imported'}}})
+    with pytest.raises(ValueError, match='Unknown action'):
+        compile_plan({'vertices': {'v': {'action': 'nope'}}})
+    with pytest.raises(ValueError, match='Invalid workflow'):
+        compile_plan({'vertices': {'v': {'action': 'plan_echo', 'retries': 3}}})
+    with pytest.raises(ValueError, match='not in graph'):
+        compile_plan({'vertices': {'v': {'action': 'plan_echo', 'args': {'name': 'v'}}},
+                      'edges': [{'source': 'v', 'target': 'w'}]})
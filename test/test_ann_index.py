@@ -0,0 +1,100 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 14:30
+@Description:  Tests for the memory index factory and automatic promotion
+"""
+import faiss
+import numpy as np
+import pytest
+
+from puti.db.ann import AnnConfig, index_kind, index_codec, bytes_per_vector
+from puti.db.memory_shard import MemoryShard
+from puti.db.retention import RetentionConfig
+
+
+@pytest.mark.parametrize('kind', ['flat', 'hnsw', 'ivf_flat', 'ivf_pq'])
+def test_build_finds_stored_vectors(kind):
+    vectors = np.random.default_rng(0).random((2000, 16), dtype='float32')
+    index = AnnConfig(nprobe=8).build(kind, vectors)
+
+    assert index_kind(index) == kind
+    assert index.ntotal == 2000
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+
+
+def test_target_kind_follows_thresholds():
+    ann = AnnConfig(promotions=[(100, 'hnsw'), (1000, 'ivf_pq')])
+    assert ann.target_kind(99) is None
+    assert ann.target_kind(100) == 'hnsw'
+    assert ann.target_kind(5000) == 'ivf_pq'
+    assert ann.should_promote(faiss.IndexFlatL2(4)) is None
+
+
+def test_shard_promotes_in_background(tmp_path):
+    shard = MemoryShard(tmp_path, ann=AnnConfig(promotions=[(500, 'hnsw')]), wal_fsync=False)
+    shard.open(8)
+    vectors = np.random.default_rng(1).random((600, 8), dtype='float32')
+    shard.append(vectors[:499], [f'text {i}' for i in range(499)])
+    assert index_kind(shard.index) == 'flat'
+
+    shard.append(vectors[499:], [f'text {i}' for i in range(499, 600)])
+    shard.join()
+    assert index_kind(shard.index) == 'hnsw'
+    assert shard.index.ntotal == 600
+
+    reloaded = MemoryShard(tmp_path)
+    reloaded.open()
+    assert index_kind(reloaded.index) == 'hnsw'
+    assert reloaded.texts[599] == 'text 599'
+
+
+def test_promotion_is_dropped_when_compacted_meanwhile(tmp_path, monkeypatch):
+    shard = MemoryShard(
+        tmp_path, ann=AnnConfig(promotions=[(500, 'hnsw')]), retention=RetentionConfig(max_entries=550), wal_fsync=False
+    )
+    shard.open(8)
+    vectors = np.random.default_rng(1).random((600, 8), dtype='float32')
+    shard.append(vectors[:499], [f'text {i}' for i in range(499)])
+
+    build = AnnConfig.build
+
+    def compacting_build(self, *args, **kwargs):
+        shard.compact()  # a flat index loses the first 50 ids in place while the promotion builds
+        return build(self, *args, **kwargs)
+
+    monkeypatch.setattr(AnnConfig, 'build', compacting_build)
+    shard.append(vectors[499:], [f'text {i}' for i in range(499, 600)])
+    shard.join()
+    assert index_kind(shard.index) == 'flat'
+    assert shard.index.ntotal == len(shard.texts) == 550
+    assert shard.search(vectors[550:551], 1)[2][0][0] == 'text 550'
+
+
+@pytest.mark.parametrize('codec, ratio', [('fp16', 2), ('int8', 4)])
+def test_codec_shrinks_index(codec, ratio):
+    vectors = np.random.default_rng(2).random((2000, 64), dtype='float32')
+    flat = AnnConfig().build('flat', vectors)
+    quantized = AnnConfig(codec=codec).build('flat', vectors)
+
+    assert index_codec(quantized) == codec
+    assert bytes_per_vector(flat) / bytes_per_vector(quantized) >= ratio * 0.9
+
+
+def test_quantized_shard_reranks_with_exact_vectors(tmp_path):
+    ann = AnnConfig(promotions=[(500, 'ivf_pq')], nprobe=32, pq_m=4)
+    shard = MemoryShard(tmp_path, ann=ann, metric='l2', wal_fsync=False)
+    shard.open(16)
+    vectors = np.random.default_rng(3).random((1200, 16), dtype='float32')
+    shard.append(vectors, [f'text {i}' for i in range(1200)])
+    shard.join()
+    assert index_kind(shard.index) == 'ivf_pq'
+
+    _, ids, _ = shard.search(vectors[:50], 1)
+    assert (ids[:, 0] == np.arange(50)).mean() >= 0.95
+    shard.checkpoint(wait=True)
+
+    reloaded = MemoryShard(tmp_path, ann=ann, metric='l2')
+    reloaded.open()
+    assert len(reloaded.vectors) == 1200
+    assert np.array_equal(reloaded.vectors.rows(np.array([7])), vectors[7:8])
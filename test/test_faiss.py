@@ -3,8 +3,43 @@
 @Time:  2025-04-07 18:06
 @Description:  
 """
+import json
+import asyncio
+import faiss
+import numpy as np
+import pytest
+
+from typing import List
+
 from puti.db.faisss import FaissIndex
+from puti.db.index_build import CorpusIndexBuilder
 from puti.utils.path import root_dir
+from benchmarks.fakes import HashEmbeddingNode
+
+
+class HashFaissIndex(FaissIndex):
+    """ Embeds offline so the corpus index can be built in tests """
+
+    def get_embeddings(self, texts) -> np.array:
+        texts = [texts] if isinstance(texts, str) else texts
+        return np.array(asyncio.run(self.node.embeddings(texts)), dtype='float32')
+
+
+class FlakyEmbeddingNode(HashEmbeddingNode):
+    fail_after: int = -1
+    embedded: List[str] = []
+
+    async def embeddings(self, texts, **kwargs):
+        if self.batch_calls == self.fail_after:
+            raise ConnectionError('embedding endpoint unavailable')
+        self.embedded.extend(texts)
+        return await super().embeddings(texts, **kwargs)
+
+
+def _corpus(tmp_path, records):
+    from_file = tmp_path / 'corpus.json'
+    from_file.write_text(json.dumps([{'id': i, 'text': text} for i, text in records]), encoding='utf-8')
+    return from_file
 
 
 def test_faiss_index():
@@ -14,3 +49,93 @@ def test_faiss_index():
     )
     info = f.search('我的愿景是什么')
     print('检索结果:', info)
+
+
+def test_search_looks_up_preloaded_texts(tmp_path):
+    from_file = _corpus(tmp_path, [(10, 'alpha'), (11, 'beta'), (12, 'alpha'), (13, 'gamma')])
+    kw = dict(node=HashEmbeddingNode(), from_file=from_file, to_file=tmp_path / 'corpus.index')
+    HashFaissIndex(**kw)
+
+    db = HashFaissIndex(**kw)  # loaded from `to_file`, the corpus is read once here
+    from_file.unlink()
+    db.conf.FAISS_SEARCH_TOP_K = 4
+    distance, texts = db.search('beta')
+
+    assert texts[0] == 'beta' and distance[0, 0] == 0
+    assert sorted(texts) == ['alpha', 'beta', 'gamma']
+    assert distance.shape == (1, 3)
+    assert db.get_origin_by_ids(np.array([[13, -1, 11]])) == ['gamma', 'beta']
+
+
+def test_jsonl_corpus_builds_and_loads(tmp_path):
+    from_file = tmp_path / 'corpus.jsonl'
+    from_file.write_text(
+        '\n'.join(json.dumps({'id': i, 'text': text}) for i, text in [(1, 'alpha'), (2, 'beta')]) + '\n',
+        encoding='utf-8',
+    )
+    db = HashFaissIndex(node=HashEmbeddingNode(), from_file=from_file, to_file=tmp_path / 'corpus.index')
+    db.conf.FAISS_SEARCH_TOP_K = 2
+    distance, texts = db.search('beta')
+    assert texts[0] == 'beta' and sorted(texts) == ['alpha', 'beta']
+
+
+def test_build_resumes_from_checkpoints(tmp_path):
+    from_file = _corpus(tmp_path, [(i, f'tweet {i}') for i in range(100)])
+    to_file = tmp_path / 'corpus.index'
+    options = dict(from_file=from_file, to_file=to_file, batch_size=10, concurrency=1, retries=1)
+
+    builder = CorpusIndexBuilder(node=FlakyEmbeddingNode(fail_after=6), **options)
+    with pytest.raises(ConnectionError):
+        asyncio.run(builder.run())
+    assert not to_file.exists()
+    assert len(list(builder.checkpoint_dir.iterdir())) == 6
+
+    node = FlakyEmbeddingNode()
+    seen = []
+    index = asyncio.run(CorpusIndexBuilder(node=node, **options).run(progress=lambda done, total: seen.append(done)))
+    assert node.batch_calls == 4
+    assert seen[-1] == 100
+    assert index.ntotal == 100 and to_file.exists()
+    assert not builder.checkpoint_dir.exists()
+
+    db = HashFaissIndex(node=node, from_file=from_file, to_file=to_file)
+    assert db.search('tweet 42')[1][0] == 'tweet 42'
+
+
+def test_refresh_embeds_only_the_delta(tmp_path):
+    from_file = _corpus(tmp_path, [(i, f'tweet {i}') for i in range(50)])
+    node = FlakyEmbeddingNode()
+    db = HashFaissIndex(node=node, from_file=from_file, to_file=tmp_path / 'corpus.index', codec='int8')
+
+    records = [(i, f'tweet {i}') for i in range(50) if i != 3]
+    records[10] = (11, 'tweet 11, edited')
+    _corpus(tmp_path, records + [(50, 'tweet 50'), (51, 'tweet 51')])
+    node.embedded.clear()
+    stats = db.refresh()
+
+    assert stats == (2, 1, 1, 48)
+    assert sorted(node.embedded) == ['tweet 11, edited', 'tweet 50', 'tweet 51']
+    assert db.index.ntotal == 51
+    assert db.search('tweet 11, edited')[1][0] == 'tweet 11, edited'
+    ids = faiss.vector_to_array(db.index.id_map)
+    texts = [db._texts[int(i)] for i in ids]
+    assert np.allclose(db._vectors.range(), db.get_embeddings(texts))
+
+    node.embedded.clear()
+    assert db.refresh() == (0, 0, 0, 51)
+    assert node.embedded == []
+
+
+def test_search_many_matches_single_searches(tmp_path):
+    from_file = _corpus(tmp_path, [(i, f'tweet {i % 7}') for i in range(30)])
+    node = FlakyEmbeddingNode()
+    db = HashFaissIndex(node=node, from_file=from_file, to_file=tmp_path / 'corpus.index')
+    node.embedded.clear()
+
+    queries = ['tweet 1', 'tweet 5', 'unrelated']
+    results = db.search_many(queries)
+    assert node.embedded == queries
+    for query, (distance, texts) in zip(queries, results):
+        single_distance, single_texts = db.search(query)
+        assert list(texts) == list(single_texts) and np.allclose(distance, single_distance)
+        assert len(set(texts)) == len(texts) == distance.shape[1]
@@ -0,0 +1,159 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 20:30
+@Description:  Spans of graph runs, llm calls and tools, and their Chrome trace export
+"""
+import json
+import asyncio
+import pytest
+
+from puti.utils import tracing
+from puti.llm.nodes import LLMNode
+from puti.llm.tools import BaseTool
+from puti.llm.tools.common import GetTodayDate
+from puti.llm.graph import Graph, Vertex
+from puti.llm.actions import Action
+
+
+class CountingNode(LLMNode):
+    """ Answers with the prompt and counts tokens as one per word """
+    llm_name: str = 'counting'
+
+    async def chat(self, msg, *args, **kwargs):
+        reply = msg[-1]['content'].upper()
+        self.cost.update_cost(len(msg[-1]['content'].split()), len(reply.split()), 'gpt-3.5-turbo')
+        return reply
+
+    async def stream_chat(self, message, **kwargs):
+        raise NotImplementedError
+
+    async def embedding(self, text: str, **kwargs):
+        return [float(len(text))]
+
+    async def get_embedding_dim(self) -> int:
+        return 1
+
+    async def parse_chat_result(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class EchoTool(BaseTool):
+    name: str = 'echo'
+
+    async def run(self, text, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return text
+
+
+class ChatAction(Action):
+    node: CountingNode
+
+    async def run(self, role, *args, **kwargs):
+        tool_result = await EchoTool().run(self.prompt)
+        return await self.node.chat([{'role': 'user', 'content': tool_result}])
+
+
+@pytest.fixture
+def trace():
+    tracing.clear()
+    tracing.enable()
+    yield
+    tracing.disable()
+    tracing.clear()
+
+
+def _graph() -> Graph:
+    node = CountingNode()
+    graph = Graph()
+    for name in ('start', 'left', 'right'):
+        graph.add_vertex(Vertex(id=name, action=ChatAction(name=name, prompt=f'hello {name}', node=node)))
+    graph.add_edge('start', 'left')
+    graph.add_edge('start', 'right')
+    graph.set_start_vertex('start')
+    return graph
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_and_carry_attributes(trace):
+    await _graph().run_dag()
+
+    spans = {(span.name, span.attrs.get('vertex')): span for span in tracing.spans()}
+    by_id = {span.id: span for span in tracing.spans()}
+    vertex = spans[('graph.vertex', 'left')]
+    assert vertex.attrs['action'] == 'left' and vertex.attrs['state'] == 'SUCCESS'
+    assert by_id[vertex.parent].name == 'graph.run_dag'
+
+    chats = [span for span in tracing.spans() if span.name == 'llm.chat']
+    tools = [span for span in tracing.spans() if span.name == 'tool.run']
+    assert len(chats) == len(tools) == 3
+    assert all(span.attrs['prompt_tokens'] == 2 and span.attrs['completion_tokens'] == 2 for span in chats)
+    assert all(span.attrs['tool'] == 'echo' and by_id[span.parent].name == 'graph.vertex' for span in tools)
+    # the two branches ran concurrently, each on its own track
+    assert spans[('graph.vertex', 'left')].lane != spans[('graph.vertex', 'right')].lane
+
+
+@pytest.mark.asyncio
+async def test_chrome_trace_export(trace, tmp_path):
+    await _graph().run_dag()
+
+    path = tracing.export_chrome_trace(tmp_path / 'trace.json')
+    events = json.loads(path.read_text())['traceEvents']
+    complete = [event for event in events if event['ph'] == 'X']
+    assert len(complete) == len(tracing.spans())
+    assert all(event['dur'] >= 0 and isinstance(event['ts'], float) for event in complete)
+    assert {event['tid'] for event in events if event['ph'] == 'M'} >= {event['tid'] for event in complete}
+
+
+def test_sync_tool_stays_sync(trace):
+    result = GetTodayDate().run()
+    assert set(result) == {'today'}
+    (tool_span,) = tracing.spans()
+    assert tool_span.name == 'tool.run' and tool_span.attrs == {'tool': 'get_today_date'}
+
+    tracing.disable()
+    assert set(GetTodayDate().run()) == {'today'}
+
+
+@pytest.mark.asyncio
+async def test_disabled_records_nothing():
+    tracing.clear()
+    assert not tracing.is_enabled()
+    await _graph().run_dag()
+    assert tracing.spans() == []
+    assert tracing.span('anything', key='value') is tracing.NOOP_SPAN
+
+
+@pytest.mark.asyncio
+async def test_failed_span_records_error(trace):
+    with pytest.raises(ValueError):
+        with tracing.span('outer'):
+            with tracing.span('inner') as inner:
+                inner.set(step=1)
+                raise ValueError('boom')
+    inner, outer = tracing.spans()
+    assert inner.parent == outer.id and inner.attrs == {'step': 1, 'error': 'ValueError: boom'}
+
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_the_most_recent_spans(trace, monkeypatch):
+    tracing.set_max_spans(3)
+    try:
+        for step in range(5):
+            with tracing.span('step', step=step):
+                pass
+        assert [span.attrs['step'] for span in tracing.spans()] == [2, 3, 4] and tracing.dropped() == 2
+
+        # every task gets a lane, those of finished tasks go once their spans left the buffer
+        monkeypatch.setattr(tracing, 'MAX_LANES', 4)
+        monkeypatch.setattr(tracing, '_lane_limit', 4)
+
+        async def traced_task():
+            with tracing.span('task'):
+                pass
+
+        for _ in range(20):
+            await asyncio.create_task(traced_task())
+        assert len(tracing._lane_names) <= 8
+        assert {span.lane for span in tracing.spans()} <= set(tracing._lane_names)
+    finally:
+        tracing.set_max_spans(tracing.MAX_SPANS)
@@ -0,0 +1,77 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 23:30
+@Description:  A failed generate_tweet_task is retried under its task id and resumes from its checkpoint
+"""
+import pytest
+
+from typing import List
+from pydantic import Field
+from puti.llm.actions import Action
+from puti.llm.graph.plan import compile_plan, register_action
+from puti.celery_queue import tasks
+
+
+@register_action('retry_generate')
+class CountingGenerateAction(Action):
+    calls: List[str] = Field(default_factory=list, exclude=True)
+
+    async def run(self, role, *args, **kwargs):
+        self.calls.append(kwargs.get('topic'))
+        return f"tweet about {kwargs.get('topic')}"
+
+
+@register_action('retry_post')
+class FlakyPostAction(Action):
+    """ Fails its first `failures` calls """
+    failures: int = 1
+    calls: List[str] = Field(default_factory=list, exclude=True)
+
+    async def run(self, role, *args, **kwargs):
+        self.calls.append(str(kwargs.get('previous_result')))
+        if len(self.calls) <= self.failures:
+            raise RuntimeError('post failed')
+        return 'posted'
+
+
+class NoSchedules:
+    def get_all(self, *args, **kwargs):
+        return []
+
+
+@pytest.fixture
+def plan(tmp_path, monkeypatch):
+    plan = compile_plan({
+        'checkpoints': str(tmp_path / 'graph.sqlite'),
+        'vertices': {
+            'generate_tweet': {'action': 'retry_generate', 'args': {'name': 'generate_tweet'}},
+            'post_tweet': {'action': 'retry_post', 'args': {'name': 'post_tweet'}},
+        },
+        'edges': [{'source': 'generate_tweet', 'target': 'post_tweet'}],
+    })
+    monkeypatch.setattr(tasks, 'load_plan', lambda path: plan)
+    monkeypatch.setattr('puti.db.schedule_manager.ScheduleManager', NoSchedules)
+    monkeypatch.setattr(tasks.generate_tweet_task, 'default_retry_delay', 0)
+    return plan
+
+
+def test_retry_resumes_without_regenerating(plan):
+    # forks share their actions, so the calls of every attempt add up on the template's
+    generate = plan._template.vertices['generate_tweet'].action
+    post = plan._template.vertices['post_tweet'].action
+
+    tasks.generate_tweet_task.apply(kwargs={'topic': 'cats'}, task_id='tweet-1')
+    assert generate.calls == ['cats']
+    assert post.calls == ['tweet about cats', 'tweet about cats']
+    # posted, so the run's checkpoints are gone
+    assert plan._template.checkpoints.latest('tweet-1') is None
+
+
+def test_gives_up_after_max_retries(plan):
+    post = plan._template.vertices['post_tweet'].action
+    post.failures = 10
+
+    tasks.generate_tweet_task.apply(kwargs={'topic': 'dogs'}, task_id='tweet-2')
+    assert len(post.calls) == tasks.TWEET_MAX_RETRIES + 1
+    assert len(plan._template.vertices['generate_tweet'].action.calls) == 1
+    assert plan._template.checkpoints.latest('tweet-2') is None
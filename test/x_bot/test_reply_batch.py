@@ -0,0 +1,45 @@
+"""
+@Author: obstacles
+@Time:  2026-10-19 21:30
+@Description:  Batch context-aware replies run tweets concurrently, offline with a scripted role
+"""
+import time
+import asyncio
+import pytest
+
+from typing import List
+from pydantic import Field
+from puti.llm.roles import Role
+from puti.llm.actions.x_bot import ContextAwareReplyAction
+from puti.utils.rate_limit import TokenBucket
+
+
+class ScriptedRole(Role):
+    """ Answers each of the three reply steps after a simulated llm round trip """
+    prompts: List[str] = Field(default_factory=list, exclude=True)
+
+    async def run(self, msg=None, *args, **kwargs):
+        self.prompts.append(msg)
+        await asyncio.sleep(0.05)
+        if 'get_conversation_thread' in msg:
+            return '{"current_tweet": {"text": "hi", "user": {"name": "A", "screen_name": "a"}}}'
+        if 'reply_to_tweet' in msg:
+            if '111111111111111113' in msg:
+                raise RuntimeError('rate limited by x')
+            return 'sent'
+        return 'a reply'
+
+
+@pytest.mark.asyncio
+async def test_replies_run_concurrently_and_failures_stay_per_tweet():
+    role = ScriptedRole(name='ethan')
+    tweet_ids = [f'11111111111111111{i}' for i in range(1, 7)]
+    action = ContextAwareReplyAction(concurrency=3, rate_limit=TokenBucket(rate=100, capacity=3))
+
+    begin = time.perf_counter()
+    summary = await action.run(role, previous_result=f'mentions: {tweet_ids}')
+    # six tweets of three 0.05s steps, three at a time: two rounds instead of 0.9s plus six two-second sleeps
+    assert time.perf_counter() - begin < 0.6
+    assert summary.startswith('Batch reply finished. Success: 5, Failed: 1.')
+    assert '- Tweet 111111111111111113: error' in summary
+    assert len(role.prompts) == 18  # copies of the role share its fields, only the conversation is their own